@@ -15,6 +15,13 @@ parser.add_argument(
     default=False,
     help="Run an instance of worker",
 )
+parser.add_argument(
+    "-p",
+    "--worker-pool",
+    action="store_true",
+    default=False,
+    help="Run a pool of workers that use all browsers in parallel",
+)
 parser.add_argument(
     "-a",
     "--analyzer",
@@ -52,6 +59,9 @@ cm = CaptchaMonitor()
 if args.worker:
     logger.info("Intializing CAPTCHA Monitor in worker mode")
     cm.worker()
+elif args.worker_pool:
+    logger.info("Intializing CAPTCHA Monitor in worker pool mode")
+    cm.worker_pool()
 elif args.analyzer:
     logger.info("Intializing CAPTCHA Monitor in data analysis mode")
     cm.analyzer()
@@ -10,6 +10,7 @@ from captchamonitor.utils.config import Config
 from captchamonitor.utils.models import MetaData
 from captchamonitor.core.analyzer import Analyzer
 from captchamonitor.utils.database import Database
+from captchamonitor.core.worker_pool import WorkerPool
 from captchamonitor.utils.exceptions import ConfigInitError, DatabaseInitError
 from captchamonitor.core.schedule_jobs import ScheduleJobs
 from captchamonitor.core.update_relays import UpdateRelays
@@ -17,6 +18,7 @@ from captchamonitor.core.update_domains import UpdateDomains
 from captchamonitor.core.update_proxies import UpdateProxies
 from captchamonitor.utils.small_scripts import node_id, hasattr_private, insert_fixtures
 from captchamonitor.core.update_fetchers import UpdateFetchers
+from captchamonitor.core.update_analyze_rollup import UpdateAnalyzeRollup
 from captchamonitor.dashboard.render_dashboard import RenderDashboard
 
 
@@ -116,6 +118,9 @@ class CaptchaMonitor:
         """
         self.__logger.info("Rendering the dashboard")
 
+        # Bring the statistics up to date with the latest analyses first
+        UpdateAnalyzeRollup(config=self.__config, db_session=self.__db_session)
+
         RenderDashboard(config=self.__config, db_session=self.__db_session)
 
         self.__logger.info("Done with rendering the dashboard")
@@ -145,6 +150,19 @@ class CaptchaMonitor:
             db_session=self.__db_session,
         )
 
+    def worker_pool(self) -> None:
+        """
+        Runs a pool of workers that process jobs with all available browsers in
+        parallel, one slot per browser container
+        """
+        self.__logger.info("Running worker pool %s", self.__node_id)
+
+        WorkerPool(
+            worker_id=self.__node_id,
+            config=self.__config,
+            db_session=self.__db_session,
+        )
+
     def analyzer(self) -> None:
         """
         Analyzes the data recorded in the database
@@ -2,20 +2,79 @@ import sys
 import json
 import time
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Tuple, Optional
+from datetime import datetime, timedelta
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
 
-from bs4 import BeautifulSoup
-from sqlalchemy import func
-from sqlalchemy.orm import sessionmaker
+import pytz
+import zstandard
+from sqlalchemy import or_, func
+from sqlalchemy.orm import Query, aliased, selectinload, sessionmaker
 
 from captchamonitor.utils.config import Config
 from captchamonitor.utils.models import (
-    Domain,
     Fetcher,
     MetaData,
     FetchCompleted,
     AnalyzeCompleted,
 )
+from captchamonitor.utils.small_scripts import hasattr_private
+from captchamonitor.utils.dom_feature_extractor import DomFeatures, DomFeatureExtractor
+
+
+@dataclass
+class ComparisonGroup:
+    """
+    Stores a Tor fetch together with the fetches it is compared against
+
+    :param fetch_completed_id: ID of the Tor fetch in the FetchCompleted table
+    :type fetch_completed_id: int
+    :param tor_html_data: Tor HTML data, None if it wasn't stored
+    :type tor_html_data: Optional[str]
+    :param tor_http_requests: Tor HAR in JSON format, None if it wasn't stored
+    :type tor_http_requests: Optional[str]
+    :param non_tor_html_data: Non-Tor HTML data, None if it wasn't stored
+    :type non_tor_html_data: Optional[str]
+    :param non_tor_http_requests: Non-Tor HAR in JSON format, None if it wasn't stored
+    :type non_tor_http_requests: Optional[str]
+    :param proxy_countries_html_data: HTML data of the matching proxy fetches
+    :type proxy_countries_html_data: List[Optional[str]]
+    """
+
+    fetch_completed_id: int
+    tor_html_data: Optional[str]
+    tor_http_requests: Optional[str]
+    non_tor_html_data: Optional[str]
+    non_tor_http_requests: Optional[str]
+    proxy_countries_html_data: List[Optional[str]]
+
+
+@dataclass
+class AnalysisResult:
+    """
+    Stores the results of analyzing a comparison group
+
+    :param fetch_completed_id: ID of the Tor fetch in the FetchCompleted table
+    :type fetch_completed_id: int
+    :param captcha_checker: Result of the captcha checker
+    :type captcha_checker: Optional[int]
+    :param status_check: Result of the status checker
+    :type status_check: Optional[int]
+    :param dom_analyze: Result of the DOM analyzer
+    :type dom_analyze: Optional[int]
+    :param consensus_lite_dom: Result of the DOM consensus lite module
+    :type consensus_lite_dom: Optional[int]
+    :param consensus_lite_captcha: Result of the captcha consensus lite module
+    :type consensus_lite_captcha: Optional[int]
+    """
+
+    fetch_completed_id: int
+    captcha_checker: Optional[int] = None
+    status_check: Optional[int] = None
+    dom_analyze: Optional[int] = None
+    consensus_lite_dom: Optional[int] = None
+    consensus_lite_captcha: Optional[int] = None
 
 
 class Analyzer:
@@ -29,6 +88,8 @@ class Analyzer:
         config: Config,
         db_session: sessionmaker,
         loop: Optional[bool] = True,
+        batch_size: int = 100,
+        non_tor_fetch_max_wait: float = 86400,
     ) -> None:
         """
         Initializes a new analyzer
@@ -41,6 +102,10 @@ class Analyzer:
         :type db_session: sessionmaker
         :param loop: Should I process a batch of domains or keep looping, defaults to True
         :type loop: bool, optional
+        :param batch_size: Maximum number of Tor fetches to analyze in a batch, defaults to 100
+        :type batch_size: int
+        :param non_tor_fetch_max_wait: Seconds a Tor fetch waits for a non-Tor fetch of the same domain before it is skipped, defaults to 86400
+        :type non_tor_fetch_max_wait: float
         """
         # Private class attributes
         self.__logger = logging.getLogger(__name__)
@@ -48,96 +113,399 @@ class Analyzer:
         self.__db_session: sessionmaker = db_session
         self.__analyzer_id: str = analyzer_id  # pylint: disable=W0238
         self.__job_queue_delay: float = float(self.__config["job_queue_delay"])
+        self.__batch_size: int = batch_size
+        self.__non_tor_fetch_max_wait: float = non_tor_fetch_max_wait
+        self.__watermark_key: str = "analyzer_last_fetch_completed_id"
+        self.__worker_count: int = int(self.__config["analyzer_worker_count"])
+        self.__executor: Optional[ProcessPoolExecutor] = None
 
         # Public class attributes
-        self.soup_tor: BeautifulSoup = BeautifulSoup("", "html.parser")
-        self.soup_non_tor: BeautifulSoup = BeautifulSoup("", "html.parser")
-        self.max_threshold_value: int = 150
-        self.min_threshold_value: int = 20
-        self.match_list: List[str] = (
+        self.tor_features: DomFeatures
+        self.non_tor_features: DomFeatures
+        self.feature_extractor: DomFeatureExtractor
+        self.max_threshold_value: int
+        self.min_threshold_value: int
+        self.match_list: List[str]
+        self.tor_store: Dict[str, Any]
+        self.non_store: Dict[str, Any]
+        self.captcha_checker_value: Optional[int]
+        self.dom_analyze_value: Optional[int]
+        self.status_check_value: Optional[int]
+        self.consensus_lite_dom_value: Optional[int]
+        self.captcha_proxy_val: List[int]
+        self.consensus_lite_captcha_value: Optional[int]
+        self.__setup_analysis_state(
             self.__db_session.query(MetaData)
             .filter(MetaData.key == "analyzer_match_list")
             .one()
             .value
         )
-        self.tor_store: Dict[str, Any] = {}
-        self.non_store: Dict[str, Any] = {}
-        self.captcha_checker_value: Optional[int] = None
-        self.dom_analyze_value: Optional[int] = None
-        self.status_check_value: Optional[int] = None
-        self.consensus_lite_dom_value: Optional[int] = None
-        self.captcha_proxy_val: List[int]
-        self.consensus_lite_captcha_value: Optional[int] = None
+
+        # Analyze the comparison groups on multiple cores
+        if self.__worker_count > 1:
+            self.__executor = ProcessPoolExecutor(max_workers=self.__worker_count)
 
         # Loop over the jobs
         while loop:
             self.process_next_batch_of_domains()
             time.sleep(self.__job_queue_delay)
 
-    # pylint: disable=R0914
-    def process_next_batch_of_domains(self) -> None:
+    def __setup_analysis_state(self, match_list: List[str]) -> None:
+        """
+        Sets up the attributes used while analyzing a comparison group
+
+        :param match_list: List of keywords that hint Tor was blocked
+        :type match_list: List[str]
+        """
+        self.__logger = logging.getLogger(__name__)
+        self.tor_features = DomFeatures()
+        self.non_tor_features = DomFeatures()
+        self.max_threshold_value = 150
+        self.min_threshold_value = 20
+        self.match_list = match_list
+        self.feature_extractor = DomFeatureExtractor(["captcha"] + self.match_list)
+        self.tor_store = {}
+        self.non_store = {}
+        self.captcha_checker_value = None
+        self.dom_analyze_value = None
+        self.status_check_value = None
+        self.consensus_lite_dom_value = None
+        self.captcha_proxy_val = []
+        self.consensus_lite_captcha_value = None
+
+    @classmethod
+    def analyze_comparison_group(
+        cls, match_list: List[str], group: ComparisonGroup
+    ) -> AnalysisResult:
+        """
+        Analyzes a single comparison group without touching the database, so
+        that it can be run in a worker process. A group that can't be analyzed,
+        for example because a payload is missing or the HAR isn't valid, gets
+        a result without any values, so that it doesn't fail the whole batch.
+
+        :param match_list: List of keywords that hint Tor was blocked
+        :type match_list: List[str]
+        :param group: The comparison group to analyze
+        :type group: ComparisonGroup
+        :return: The analysis results
+        :rtype: AnalysisResult
+        """
+        analyzer = cls.__new__(cls)
+        analyzer.__setup_analysis_state(match_list)
+
+        if (
+            group.tor_html_data is None
+            or group.tor_http_requests is None
+            or group.non_tor_html_data is None
+            or group.non_tor_http_requests is None
+        ):
+            analyzer.__logger.warning(
+                "Could not analyze Tor fetch %s: some of the payloads weren't stored",
+                group.fetch_completed_id,
+            )
+            return AnalysisResult(fetch_completed_id=group.fetch_completed_id)
+
+        try:
+            analyzer.status_check(
+                group.tor_html_data,
+                json.loads(group.tor_http_requests),
+                group.non_tor_html_data,
+                json.loads(group.non_tor_http_requests),
+                [html for html in group.proxy_countries_html_data if html is not None],
+            )
+
+        # pylint: disable=W0703
+        except Exception as exception:
+            analyzer.__logger.warning(
+                "Could not analyze Tor fetch %s: %s",
+                group.fetch_completed_id,
+                exception,
+            )
+            return AnalysisResult(fetch_completed_id=group.fetch_completed_id)
+
+        return AnalysisResult(
+            fetch_completed_id=group.fetch_completed_id,
+            captcha_checker=analyzer.captcha_checker_value,
+            status_check=analyzer.status_check_value,
+            dom_analyze=analyzer.dom_analyze_value,
+            consensus_lite_dom=analyzer.consensus_lite_dom_value,
+            consensus_lite_captcha=analyzer.consensus_lite_captcha_value,
+        )
+
+    def __analyze_comparison_groups(
+        self, groups: List[ComparisonGroup]
+    ) -> List[AnalysisResult]:
+        """
+        Analyzes the given comparison groups, in parallel if there are multiple
+        worker processes
+
+        :param groups: List of comparison groups
+        :type groups: List[ComparisonGroup]
+        :return: The analysis results in the same order as the groups
+        :rtype: List[AnalysisResult]
+        """
+        if self.__executor is None:
+            return [
+                self.analyze_comparison_group(self.match_list, group)
+                for group in groups
+            ]
+
+        return list(
+            self.__executor.map(
+                Analyzer.analyze_comparison_group,
+                [self.match_list] * len(groups),
+                groups,
+            )
+        )
+
+    def __get_watermark(self) -> int:
+        """
+        Gets the ID of the FetchCompleted row up to which all Tor fetches were
+        analyzed, creates the metadata entry if it doesn't exist yet
+
+        :return: The watermark
+        :rtype: int
+        """
+        metadata = (
+            self.__db_session.query(MetaData)
+            .filter(MetaData.key == self.__watermark_key)
+            .one_or_none()
+        )
+
+        if metadata is None:
+            self.__db_session.add(MetaData(key=self.__watermark_key, value=0))
+            self.__db_session.commit()
+            return 0
+
+        return int(metadata.value)
+
+    def __set_watermark(self, watermark: int) -> None:
+        """
+        Updates the ID of the FetchCompleted row up to which all Tor fetches were
+        analyzed
+
+        :param watermark: The new watermark
+        :type watermark: int
+        """
+        self.__db_session.query(MetaData).filter(
+            MetaData.key == self.__watermark_key
+        ).update({MetaData.value: watermark}, synchronize_session=False)
+
+    def __query_unanalyzed_fetches(self, watermark: int) -> Tuple[Query, Any]:
         """
-        Loop over the domain list and get corresponding website data from the database
+        Builds the query of the Tor fetches that weren't analyzed yet, paired with
+        the latest non-Tor fetch of the same domain. The latest one is used even
+        if it was fetched after the Tor fetch, as it is the best known state of
+        the website without Tor.
+
+        :param watermark: Only the fetches newer than this are considered
+        :type watermark: int
+        :return: Query of the Tor fetches and the matching non-Tor fetches, and the alias of the non-Tor fetches
+        :rtype: Tuple[Query, Any]
         """
-        # pylint: disable=C0121,W0104
-        domains = self.__db_session.query(Domain)
-        for domain in domains:
-            query_by_domain = (
-                self.__db_session.query(FetchCompleted)
-                .join(Fetcher)
-                .filter(FetchCompleted.ref_domain == domain)
+        # pylint: disable=C0121,W0143
+        latest_non_tor_fetches = (
+            self.__db_session.query(
+                FetchCompleted.domain_id,
+                func.max(FetchCompleted.id).label("fetch_completed_id"),
+            )
+            .join(Fetcher, FetchCompleted.fetcher_id == Fetcher.id)
+            .filter(Fetcher.uses_proxy_type == None)
+            .group_by(FetchCompleted.domain_id)
+            .subquery()
+        )
+        non_tor_fetch = aliased(FetchCompleted, name="non_tor_fetch")
+
+        query = (
+            self.__db_session.query(FetchCompleted, non_tor_fetch)
+            .join(Fetcher, FetchCompleted.fetcher_id == Fetcher.id)
+            .outerjoin(
+                AnalyzeCompleted,
+                AnalyzeCompleted.fetch_completed_id == FetchCompleted.id,
             )
+            .outerjoin(
+                latest_non_tor_fetches,
+                latest_non_tor_fetches.c.domain_id == FetchCompleted.domain_id,
+            )
+            .outerjoin(
+                non_tor_fetch,
+                non_tor_fetch.id == latest_non_tor_fetches.c.fetch_completed_id,
+            )
+            .filter(Fetcher.uses_proxy_type == "tor")
+            .filter(FetchCompleted.id > watermark)
+            .filter(AnalyzeCompleted.id == None)
+        )
 
-            tor = query_by_domain.filter(Fetcher.uses_proxy_type == "tor").first()
-            non_tor = query_by_domain.filter(Fetcher.uses_proxy_type == None).first()
-            proxies = query_by_domain.filter(Fetcher.uses_proxy_type == "http").all()
-
-            if tor is not None and non_tor is not None:
-                proxy_countries_html_data = []
-                for proxy in proxies:
-                    if proxy.url == tor.url:
-                        proxy_countries_html_data.append(proxy.html_data)
-
-                # Loads JSON
-                HAR_json_tor = json.loads(tor.http_requests)
-                HAR_json_non_tor = json.loads(non_tor.http_requests)
-                self.captcha_checker_value = None
-                self.dom_analyze_value = None
-                self.status_check_value = None
-                self.consensus_lite_dom_value = None
-                self.consensus_lite_captcha_value = None
-                self.tor_store = {}
-                self.non_store = {}
-
-                self.status_check(
-                    tor.html_data,
-                    HAR_json_tor,
-                    non_tor.html_data,
-                    HAR_json_non_tor,
-                    proxy_countries_html_data,
+        return query, non_tor_fetch
+
+    def __get_unanalyzed_fetches(
+        self, watermark: int, waiting_since: datetime
+    ) -> List[Tuple[FetchCompleted, Optional[FetchCompleted]]]:
+        """
+        Gets the next batch of Tor fetches that weren't analyzed yet, paired with
+        the latest non-Tor fetch of the same domain, using a single query. The
+        Tor fetches still waiting for a non-Tor fetch are left out, so that they
+        don't fill up the batch. The payloads of the whole batch are loaded
+        together with a query per payload type.
+
+        :param watermark: Only the fetches newer than this are considered
+        :type watermark: int
+        :param waiting_since: Tor fetches without a non-Tor fetch created after this are still waiting
+        :type waiting_since: datetime
+        :return: Tor fetches and the matching non-Tor fetches, None if the Tor fetch waited too long
+        :rtype: List[Tuple[FetchCompleted, Optional[FetchCompleted]]]
+        """
+        # pylint: disable=C0121
+        query, non_tor_fetch = self.__query_unanalyzed_fetches(watermark)
+
+        return (
+            query.filter(
+                or_(
+                    non_tor_fetch.id != None,
+                    FetchCompleted.created_at < waiting_since,
                 )
+            )
+            .options(
+                selectinload(FetchCompleted.ref_html_data),
+                selectinload(FetchCompleted.ref_http_requests),
+                selectinload(non_tor_fetch.ref_html_data),
+                selectinload(non_tor_fetch.ref_http_requests),
+            )
+            .order_by(FetchCompleted.id)
+            .limit(self.__batch_size)
+            .all()
+        )
 
-                fetch_completed_present = (
-                    self.__db_session.query(
-                        func.count(AnalyzeCompleted.fetch_completed_id)
-                    ).filter(
-                        AnalyzeCompleted.fetch_completed_id  # pylint: disable=W0143
-                        == tor.id
-                    )
-                ).all()
-                if fetch_completed_present[0][0] == 0:
-                    # Tor from the FetchCompleted
-                    analyzer_val_t = AnalyzeCompleted(
-                        captcha_checker=self.captcha_checker_value,
-                        status_check=self.status_check_value,
-                        dom_analyze=self.dom_analyze_value,
-                        consensus_lite_dom=self.consensus_lite_dom_value,
-                        consensus_lite_captcha=self.consensus_lite_captcha_value,
+    def __get_first_waiting_fetch_id(
+        self, watermark: int, waiting_since: datetime
+    ) -> Optional[int]:
+        """
+        Gets the ID of the oldest Tor fetch that is still waiting for a non-Tor
+        fetch of the same domain
+
+        :param watermark: Only the fetches newer than this are considered
+        :type watermark: int
+        :param waiting_since: Tor fetches without a non-Tor fetch created after this are still waiting
+        :type waiting_since: datetime
+        :return: ID of the Tor fetch, None if no fetch is waiting
+        :rtype: Optional[int]
+        """
+        # pylint: disable=C0121
+        query, non_tor_fetch = self.__query_unanalyzed_fetches(watermark)
+
+        return (
+            query.filter(non_tor_fetch.id == None)
+            .filter(FetchCompleted.created_at >= waiting_since)
+            .with_entities(func.min(FetchCompleted.id))
+            .scalar()
+        )
+
+    def __get_proxy_fetches(
+        self, tor_fetches: List[FetchCompleted]
+    ) -> Dict[Tuple[int, str], List[FetchCompleted]]:
+        """
+        Gets the proxy fetches of the same domains and URLs as the given Tor
+        fetches together with their HTML data, using two queries
+
+        :param tor_fetches: List of Tor fetches
+        :type tor_fetches: List[FetchCompleted]
+        :return: Proxy fetches grouped by domain ID and URL
+        :rtype: Dict[Tuple[int, str], List[FetchCompleted]]
+        """
+        # pylint: disable=W0143
+        proxy_fetches: Dict[Tuple[int, str], List[FetchCompleted]] = {}
+        domain_ids = {tor.domain_id for tor in tor_fetches}
+
+        if len(domain_ids) == 0:
+            return proxy_fetches
+
+        query = (
+            self.__db_session.query(FetchCompleted)
+            .join(Fetcher, FetchCompleted.fetcher_id == Fetcher.id)
+            .filter(Fetcher.uses_proxy_type == "http")
+            .filter(FetchCompleted.domain_id.in_(domain_ids))
+            .options(selectinload(FetchCompleted.ref_html_data))
+        )
+
+        for proxy in query:
+            proxy_fetches.setdefault((proxy.domain_id, proxy.url), []).append(proxy)
+
+        return proxy_fetches
+
+    def process_next_batch_of_domains(self) -> None:
+        """
+        Analyzes the next batch of Tor fetches that weren't analyzed yet, together
+        with the matching non-Tor and proxy fetches. Keeps a watermark, so the
+        cost depends on the amount of new fetches instead of the whole history.
+        The watermark doesn't move past the Tor fetches waiting for a non-Tor
+        fetch, which are skipped once they waited longer than the maximum wait.
+        Fetches that can't be analyzed get a result without any values, so that
+        the watermark moves past them instead of retrying them forever.
+        """
+        watermark = self.__get_watermark()
+        waiting_since = datetime.now(pytz.utc) - timedelta(
+            seconds=self.__non_tor_fetch_max_wait
+        )
+        fetches = self.__get_unanalyzed_fetches(watermark, waiting_since)
+        proxy_fetches = self.__get_proxy_fetches([tor for tor, _ in fetches])
+
+        groups = []
+        results = []
+
+        for tor, non_tor in fetches:
+            if non_tor is None:
+                self.__logger.debug(
+                    "Skipping Tor fetch %s, there is no non-Tor fetch to compare",
+                    tor.id,
+                )
+                continue
+
+            try:
+                groups.append(
+                    ComparisonGroup(
                         fetch_completed_id=tor.id,
+                        tor_html_data=tor.html_data,
+                        tor_http_requests=tor.http_requests,
+                        non_tor_html_data=non_tor.html_data,
+                        non_tor_http_requests=non_tor.http_requests,
+                        proxy_countries_html_data=[
+                            proxy.html_data
+                            for proxy in proxy_fetches.get((tor.domain_id, tor.url), [])
+                        ],
                     )
+                )
 
-                    self.__db_session.add(analyzer_val_t)
-                    self.__db_session.commit()
+            # The stored payloads are broken, retrying won't help
+            except (zstandard.ZstdError, UnicodeDecodeError) as exception:
+                self.__logger.warning(
+                    "Could not load the payloads of Tor fetch %s: %s", tor.id, exception
+                )
+                results.append(AnalysisResult(fetch_completed_id=tor.id))
+
+        # Retry the Tor fetches still waiting for a non-Tor fetch later
+        new_watermark = max([watermark] + [tor.id for tor, _ in fetches])
+        first_waiting_fetch_id = self.__get_first_waiting_fetch_id(
+            watermark, waiting_since
+        )
+        if first_waiting_fetch_id is not None:
+            new_watermark = min(new_watermark, first_waiting_fetch_id - 1)
+
+        results.extend(self.__analyze_comparison_groups(groups))
+
+        for result in results:
+            self.__db_session.add(
+                AnalyzeCompleted(
+                    captcha_checker=result.captcha_checker,
+                    status_check=result.status_check,
+                    dom_analyze=result.dom_analyze,
+                    consensus_lite_dom=result.consensus_lite_dom,
+                    consensus_lite_captcha=result.consensus_lite_captcha,
+                    fetch_completed_id=result.fetch_completed_id,
+                )
+            )
+
+        self.__set_watermark(new_watermark)
+        self.__db_session.commit()
 
     def consensus_lite_captcha(self) -> None:
         """
@@ -176,18 +544,24 @@ class Analyzer:
             self.consensus_lite_captcha_value = 6
 
     def consensus_lite_dom(
-        self, tor_dom: int, non_tor_dom: int, proxy_dom: List[int]
+        self,
+        tor_features: DomFeatures,
+        non_tor_features: DomFeatures,
+        proxy_features: List[DomFeatures],
     ) -> None:
         """
         Consensus Lite Module for the dom checker
 
-        :param tor_dom: Tor HTML dom nodes
-        :type tor_dom: int
-        :param non_tor_dom: Non-Tor HTML dom nodes
-        :type non_tor_dom: int
-        :param proxy_dom: List of Proxy dom nodes
-        :type proxy_dom: List[int]
+        :param tor_features: Tor HTML dom features
+        :type tor_features: DomFeatures
+        :param non_tor_features: Non-Tor HTML dom features
+        :type non_tor_features: DomFeatures
+        :param proxy_features: List of Proxy dom features
+        :type proxy_features: List[DomFeatures]
         """
+        tor_dom = tor_features.tag_count
+        non_tor_dom = non_tor_features.tag_count
+        proxy_dom = [features.tag_count for features in proxy_features]
         mn_difference_nt_and_t = abs(tor_dom - non_tor_dom)
         mn_difference_nt_and_proxy = int(sys.float_info.max)
         sum_proxy = 0
@@ -275,8 +649,10 @@ class Analyzer:
         # Assuming no captcha
         tor_c = 0
         tor = 0
+        tor_html_captcha = self.tor_features.contains("captcha")
+        non_tor_html_captcha = self.non_tor_features.contains("captcha")
         # If captcha in html of tor:
-        if "captcha" in self.soup_tor and "captcha" not in self.soup_non_tor:
+        if tor_html_captcha and not non_tor_html_captcha:
             tor_c = 1
         # If captcha in both, tor_html and non_tor html, or not anywhere:
         else:
@@ -314,30 +690,25 @@ class Analyzer:
         :param proxy_countries_html_data: List of Proxy html data
         :type proxy_countries_html_data: List[str]
         """
-        self.soup_tor = BeautifulSoup(tor_html_data, "html.parser")
         # Count the number of nodes in tor
-        tor_node_count = len(self.soup_tor.find_all(True))
+        self.tor_features = self.feature_extractor.extract(tor_html_data)
+        tor_node_count = self.tor_features.tag_count
 
-        self.soup_non_tor = BeautifulSoup(non_tor_html_data, "html.parser")
         # Count the number of nodes in non-tor
-        non_tor_node_count = len(self.soup_non_tor.find_all(True))
+        self.non_tor_features = self.feature_extractor.extract(non_tor_html_data)
+        non_tor_node_count = self.non_tor_features.tag_count
 
         # Count the number of nodes returned by the proxies
-        proxy_node_count = []
-        proxy_node_detail = []
-        self.captcha_proxy_val = []
+        proxy_features = [
+            self.feature_extractor.extract(proxy_html)
+            for proxy_html in proxy_countries_html_data
+        ]
+        proxy_node_count = [features.tag_count for features in proxy_features]
 
-        for proxy_html in proxy_countries_html_data:
-            node_proxy = []
-            soup_proxy = BeautifulSoup(proxy_html, "html.parser")
-            # Check for captcha here itself, thereby reducing the space of the list ass well as execution later
-            captcha_proxy = str(soup_proxy).lower()
-            # Contains captcha or not in forms of 0(No captcha) and 1(Captcha), so that it can be accessed via another class
-            self.captcha_proxy_val.append(int("captcha" in captcha_proxy))
-            for tag in soup_proxy.find_all(True):
-                node_proxy.append(tag)
-            proxy_node_detail.append(node_proxy)
-            proxy_node_count.append(len(node_proxy))
+        # Contains captcha or not in forms of 0(No captcha) and 1(Captcha), so that it can be accessed via another class
+        self.captcha_proxy_val = [
+            int(features.contains("captcha")) for features in proxy_features
+        ]
 
         self.__logger.info(
             "Nodes by tor: %f, non-tor: %f and proxies: %s",
@@ -354,9 +725,6 @@ class Analyzer:
 
         self.__logger.info("DOM Score : %s", dom_score)
 
-        self.soup_tor = str(self.soup_tor).lower()
-        self.soup_non_tor = str(self.soup_non_tor).lower()
-
         if self.captcha_checker() is False:
             if dom_score > 0:
                 if dom_score > self.max_threshold_value:
@@ -366,7 +734,7 @@ class Analyzer:
                     self.dom_analyze_value = 0
                     # Call Consensus lite
                     self.consensus_lite_dom(
-                        tor_node_count, non_tor_node_count, proxy_node_count
+                        self.tor_features, self.non_tor_features, proxy_features
                     )
                 elif dom_score < self.min_threshold_value:
                     # Random value to check the performance.
@@ -379,7 +747,9 @@ class Analyzer:
                     self.__logger.info("checking for keywords...")
                     #   checks for keywords to help in this case
                     for _ in self.match_list:
-                        if _ in self.soup_tor and _ not in self.soup_non_tor:
+                        in_tor = self.tor_features.contains(_)
+                        in_non_tor = self.non_tor_features.contains(_)
+                        if in_tor and not in_non_tor:
                             self.__logger.info("Tor Blocked : checklist!! ")
                             self.dom_analyze_value = 3
                         else:
@@ -389,7 +759,7 @@ class Analyzer:
                             self.dom_analyze_value = 2
                     # Call Consensus lite
                     self.consensus_lite_dom(
-                        tor_node_count, non_tor_node_count, proxy_node_count
+                        self.tor_features, self.non_tor_features, proxy_features
                     )
             else:
                 # When DOM is equal
@@ -405,7 +775,6 @@ class Analyzer:
         non_tor_http_requests: Dict[str, Any],
         proxy_countries_html_data: List[str],
     ) -> None:
-
         """
         HTTP Status code Checker
 
@@ -424,9 +793,9 @@ class Analyzer:
         non_tor_HAR = {}
         try:
             for i in range(0, len(tor_http_requests["log"]["entries"])):
-                tor_HAR[
-                    tor_http_requests["log"]["entries"][i]["request"]["url"]
-                ] = tor_http_requests["log"]["entries"][i]["response"]["status"]
+                tor_HAR[tor_http_requests["log"]["entries"][i]["request"]["url"]] = (
+                    tor_http_requests["log"]["entries"][i]["response"]["status"]
+                )
             # pylint: disable=C0206
             for i in tor_HAR:
                 if tor_HAR[i] != 0 or tor_HAR != "" or tor_HAR is not None:
@@ -493,3 +862,10 @@ class Analyzer:
             self.__logger.debug(
                 "Check for the HARExport. Might have no entries and is out of indexes"
             )
+
+    def __del__(self) -> None:
+        """
+        Perform cleanup before going out of scope
+        """
+        if hasattr_private(self, "__executor") and self.__executor is not None:
+            self.__executor.shutdown(wait=False)
@@ -0,0 +1,177 @@
+import logging
+from typing import Any, List, Tuple
+
+from sqlalchemy import Date, cast, func, insert, tuple_
+from sqlalchemy.orm import sessionmaker
+
+from captchamonitor.utils.config import Config
+from captchamonitor.utils.models import (
+    MetaData,
+    FetchCompleted,
+    AnalyzeCompleted,
+    AnalyzeDailyRollup,
+)
+
+
+class UpdateAnalyzeRollup:
+    """
+    Keeps the daily rollup of the analyzed fetches up to date. Only the days and
+    relays that got new analyses since the last refresh are recomputed.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        db_session: sessionmaker,
+    ) -> None:
+        """
+        Initializes UpdateAnalyzeRollup
+
+        :param config: The config class instance that contains global configuration values
+        :type config: Config
+        :param db_session: Database session used to connect to the database
+        :type db_session: sessionmaker
+        """
+        # Private class attributes
+        self.__logger = logging.getLogger(__name__)
+        self.__config: Config = config  # pylint: disable=W0238
+        self.__db_session: sessionmaker = db_session
+        self.__watermark_key: str = "analyze_rollup_last_analyze_completed_id"
+
+        # Calls to the class methods
+        self.update()
+
+    def __get_watermark(self) -> int:
+        """
+        Gets the ID of the last AnalyzeCompleted row included in the rollup,
+        creates the metadata entry if it doesn't exist yet
+
+        :return: The watermark
+        :rtype: int
+        """
+        metadata = (
+            self.__db_session.query(MetaData)
+            .filter(MetaData.key == self.__watermark_key)
+            .one_or_none()
+        )
+
+        if metadata is None:
+            self.__db_session.add(MetaData(key=self.__watermark_key, value=0))
+            self.__db_session.commit()
+            return 0
+
+        return int(metadata.value)
+
+    def __get_changed_groups(
+        self, watermark: int, latest_id: int
+    ) -> List[Tuple[Any, int]]:
+        """
+        Finds the days and relays that got new analyses since the last refresh
+
+        :param watermark: ID of the last AnalyzeCompleted row included in the rollup
+        :type watermark: int
+        :param latest_id: ID of the latest AnalyzeCompleted row
+        :type latest_id: int
+        :return: List of days and relay IDs, 0 stands for fetches without a relay
+        :rtype: List[Tuple[Any, int]]
+        """
+        # pylint: disable=W0143
+        query = (
+            self.__db_session.query(
+                cast(AnalyzeCompleted.created_at, Date),
+                func.coalesce(FetchCompleted.relay_id, 0),
+            )
+            .select_from(AnalyzeCompleted)
+            .join(
+                FetchCompleted,
+                AnalyzeCompleted.fetch_completed_id == FetchCompleted.id,
+            )
+            .filter(AnalyzeCompleted.id > watermark)
+            .filter(AnalyzeCompleted.id <= latest_id)
+            .distinct()
+        )
+
+        return query.all()
+
+    def update(self) -> None:
+        """
+        Recomputes the rollup rows of the days and relays that got new analyses
+        """
+        # pylint: disable=W0143
+        watermark = self.__get_watermark()
+        latest_id = self.__db_session.query(func.max(AnalyzeCompleted.id)).scalar()
+
+        if latest_id is None or latest_id <= watermark:
+            self.__logger.debug("Analyze rollup is already up to date")
+            return
+
+        changed_groups = self.__get_changed_groups(watermark, latest_id)
+
+        self.__logger.info(
+            "Updating the analyze rollup for %s changed days and relays",
+            len(changed_groups),
+        )
+
+        # Remove the outdated rows of the changed groups
+        self.__db_session.query(AnalyzeDailyRollup).filter(
+            tuple_(
+                AnalyzeDailyRollup.day,
+                func.coalesce(AnalyzeDailyRollup.relay_id, 0),
+            ).in_(changed_groups)
+        ).delete(synchronize_session=False)
+
+        # Count the analyses of the changed groups again
+        day = cast(AnalyzeCompleted.created_at, Date)
+        counts = (
+            self.__db_session.query(
+                func.now(),
+                day,
+                FetchCompleted.relay_id,
+                FetchCompleted.fetcher_id,
+                AnalyzeCompleted.status_check,
+                AnalyzeCompleted.dom_analyze,
+                AnalyzeCompleted.captcha_checker,
+                func.count(AnalyzeCompleted.id),
+            )
+            .select_from(AnalyzeCompleted)
+            .join(
+                FetchCompleted,
+                AnalyzeCompleted.fetch_completed_id == FetchCompleted.id,
+            )
+            .filter(AnalyzeCompleted.id <= latest_id)
+            .filter(
+                tuple_(day, func.coalesce(FetchCompleted.relay_id, 0)).in_(
+                    changed_groups
+                )
+            )
+            .group_by(
+                day,
+                FetchCompleted.relay_id,
+                FetchCompleted.fetcher_id,
+                AnalyzeCompleted.status_check,
+                AnalyzeCompleted.dom_analyze,
+                AnalyzeCompleted.captcha_checker,
+            )
+        )
+
+        self.__db_session.execute(
+            insert(AnalyzeDailyRollup).from_select(
+                [
+                    AnalyzeDailyRollup.created_at,
+                    AnalyzeDailyRollup.day,
+                    AnalyzeDailyRollup.relay_id,
+                    AnalyzeDailyRollup.fetcher_id,
+                    AnalyzeDailyRollup.status_check,
+                    AnalyzeDailyRollup.dom_analyze,
+                    AnalyzeDailyRollup.captcha_checker,
+                    AnalyzeDailyRollup.count,
+                ],
+                counts,
+            )
+        )
+
+        self.__db_session.query(MetaData).filter(
+            MetaData.key == self.__watermark_key
+        ).update({MetaData.value: latest_id}, synchronize_session=False)
+
+        self.__db_session.commit()
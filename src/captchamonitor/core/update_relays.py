@@ -4,18 +4,22 @@ from datetime import datetime
 
 import pytz
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects.postgresql import insert
 
 from captchamonitor.utils.config import Config
 from captchamonitor.utils.models import Relay, MetaData
-from captchamonitor.utils.onionoo import Onionoo, OnionooRelayEntry
+from captchamonitor.utils.onionoo import Onionoo, OnionooClient, OnionooRelayEntry
 from captchamonitor.utils.collector import Collector
+from captchamonitor.utils.consensus_differ import ConsensusDiffer
 from captchamonitor.utils.consensus_parser import ConsensusV3Parser, ConsensusRelayEntry
 
 
 class UpdateRelays:
     """
     Fetches the latest consensus and inserts the relays listed there into the
-    database
+    database. Only the relays that were added or changed since the previous
+    update are looked up on Onionoo and written to the database. All changes
+    of an update are committed in a single transaction.
     """
 
     def __init__(
@@ -39,7 +43,26 @@ class UpdateRelays:
         self.__config: Config = config  # pylint: disable=W0238
         self.__db_session: sessionmaker = db_session
         self.__collector: Collector = Collector()
+        self.__onionoo_client: OnionooClient = OnionooClient()
         self.__datetime_format: str = "%Y-%m-%d-%H-00-00"
+        self.__signatures_key: str = "last_relay_update_signatures"
+        self.__updated_columns: List[str] = [
+            "ipv4_address",
+            "ipv6_address",
+            "ipv4_exiting_allowed",
+            "ipv6_exiting_allowed",
+            "country",
+            "country_name",
+            "continent",
+            "status",
+            "nickname",
+            "first_seen",
+            "last_seen",
+            "version",
+            "asn",
+            "asn_name",
+            "platform",
+        ]
 
         if auto_update:
             if self.__hours_since_last_update() >= 1:
@@ -84,111 +107,213 @@ class UpdateRelays:
 
         return datetime.strptime(date_from_db, self.__datetime_format)
 
+    def __get_previous_signatures(self) -> Dict[str, str]:
+        """
+        Gets the signatures of the relays that were up to date after the
+        previous update
+
+        :return: Signatures by fingerprint
+        :rtype: Dict[str, str]
+        """
+        metadata = (
+            self.__db_session.query(MetaData)
+            .filter(MetaData.key == self.__signatures_key)
+            .one_or_none()
+        )
+
+        if metadata is None or not isinstance(metadata.value, dict):
+            return {}
+
+        return dict(metadata.value)
+
+    def __save_signatures(self, signatures: Dict[str, str]) -> None:
+        """
+        Saves the signatures of the relays that are up to date in the database
+
+        :param signatures: Signatures by fingerprint
+        :type signatures: Dict[str, str]
+        """
+        updated = (
+            self.__db_session.query(MetaData)
+            .filter(MetaData.key == self.__signatures_key)
+            .update({MetaData.value: signatures}, synchronize_session=False)
+        )
+
+        if updated == 0:
+            self.__db_session.add(MetaData(key=self.__signatures_key, value=signatures))
+
     def __insert_batch_into_db(
         self,
         onionoo_relay_data: List[OnionooRelayEntry],
         parsed_consensus: Dict[str, ConsensusRelayEntry],
-    ) -> None:
+    ) -> List[str]:
         """
-        Inserts given batch of data into the database
+        Inserts given batch of data into the database, updates the relays that
+        already exist
 
         :param onionoo_relay_data: List of OnionooRelayEntry objects
         :type onionoo_relay_data: List[OnionooRelayEntry]
         :param parsed_consensus: Dictionary of ConsensusRelayEntry
         :type parsed_consensus: Dict[str, ConsensusRelayEntry]
+        :return: Fingerprints of the inserted or updated relays
+        :rtype: List[str]
         """
-        # Iterate over the relays in consensus file
-        for onionoo_relay in onionoo_relay_data:
-            # Check if the relay already exists
-            query = self.__db_session.query(Relay).filter(
-                Relay.fingerprint == onionoo_relay.fingerprint
-            )
-
-            if query.count() == 0:
-                # Add new relay
-                db_relay = Relay(
-                    fingerprint=onionoo_relay.fingerprint,
-                    ipv4_address=parsed_consensus[onionoo_relay.fingerprint].IP,
-                    ipv6_address=parsed_consensus[onionoo_relay.fingerprint].IPv6,
-                    ipv4_exiting_allowed=onionoo_relay.ipv4_exiting_allowed,
-                    ipv6_exiting_allowed=onionoo_relay.ipv6_exiting_allowed,
-                    country=onionoo_relay.country,
-                    country_name=onionoo_relay.country_name,
-                    continent=onionoo_relay.continent,
-                    status=True,
-                    nickname=onionoo_relay.nickname,
-                    first_seen=onionoo_relay.first_seen,
-                    last_seen=onionoo_relay.last_seen,
-                    version=onionoo_relay.version,
-                    asn=onionoo_relay.asn,
-                    asn_name=onionoo_relay.asn_name,
-                    platform=onionoo_relay.platform,
-                )
+        # Keyed by fingerprint, since a single upsert can't touch a row twice
+        relays = {
+            onionoo_relay.fingerprint: {
+                "created_at": datetime.now(pytz.utc),
+                "fingerprint": onionoo_relay.fingerprint,
+                "ipv4_address": parsed_consensus[onionoo_relay.fingerprint].IP,
+                "ipv6_address": parsed_consensus[onionoo_relay.fingerprint].IPv6,
+                "ipv4_exiting_allowed": onionoo_relay.ipv4_exiting_allowed,
+                "ipv6_exiting_allowed": onionoo_relay.ipv6_exiting_allowed,
+                "country": onionoo_relay.country,
+                "country_name": onionoo_relay.country_name,
+                "continent": onionoo_relay.continent,
+                "status": True,
+                "nickname": onionoo_relay.nickname,
+                "first_seen": onionoo_relay.first_seen,
+                "last_seen": onionoo_relay.last_seen,
+                "version": onionoo_relay.version,
+                "asn": onionoo_relay.asn,
+                "asn_name": onionoo_relay.asn_name,
+                "platform": onionoo_relay.platform,
+            }
+            for onionoo_relay in onionoo_relay_data
+        }
 
-                # Add to the database
-                self.__db_session.add(db_relay)
+        if len(relays) == 0:
+            return []
 
-            else:
-                # Update the existing relay
-                db_relay = query.first()
-                db_relay.updated_at = datetime.now(pytz.utc)
-                db_relay.ipv4_address = parsed_consensus[onionoo_relay.fingerprint].IP
-                db_relay.ipv6_address = parsed_consensus[onionoo_relay.fingerprint].IPv6
-                db_relay.ipv4_exiting_allowed = onionoo_relay.ipv4_exiting_allowed
-                db_relay.ipv6_exiting_allowed = onionoo_relay.ipv6_exiting_allowed
-                db_relay.country = onionoo_relay.country
-                db_relay.country_name = onionoo_relay.country_name
-                db_relay.continent = onionoo_relay.continent
-                db_relay.status = True
-                db_relay.nickname = onionoo_relay.nickname
-                db_relay.first_seen = onionoo_relay.first_seen
-                db_relay.last_seen = onionoo_relay.last_seen
-                db_relay.version = onionoo_relay.version
-                db_relay.asn = onionoo_relay.asn
-                db_relay.asn_name = onionoo_relay.asn_name
-                db_relay.platform = onionoo_relay.platform
-
-        # Commit changes to the database
-        self.__db_session.commit()
+        # Insert the new relays and update the existing ones in a single query
+        query = insert(Relay).values(list(relays.values()))
+        updated_columns = {
+            column: getattr(query.excluded, column) for column in self.__updated_columns
+        }
+        updated_columns["updated_at"] = datetime.now(pytz.utc)
+        query = query.on_conflict_do_update(
+            index_elements=[Relay.fingerprint], set_=updated_columns
+        )
+        self.__db_session.execute(query)
 
         self.__logger.debug("Inserted a batch of relays into the database")
 
-    def update(self, batch_size: int = 40) -> None:
+        return list(relays.keys())
+
+    def __update_relay_statuses(self, online_fingerprints: List[str]) -> None:
         """
-        Gets the latest consensus and parses the list of relays in the consensus.
-        Later, adds the relays to the database. Performs this operation in batches
-        to not to overwhelm the Onionoo API.
+        Marks the given relays as online and all others as offline with a single
+        statement, so that the relays never appear to be offline all at once
 
-        :param batch_size: Number of relays to process in a single batch, defaults to 40
+        :param online_fingerprints: Fingerprints of the relays that are online
+        :type online_fingerprints: List[str]
+        """
+        # pylint: disable=W0143
+        status = Relay.fingerprint.in_(online_fingerprints)
+
+        self.__db_session.query(Relay).filter(
+            Relay.status.is_distinct_from(status)
+        ).update(
+            {Relay.status: status, Relay.updated_at: datetime.now(pytz.utc)},
+            synchronize_session=False,
+        )
+
+    def __update_last_seen(self, fingerprints: List[str], last_seen: datetime) -> None:
+        """
+        Sets the last seen date of the given relays, which is the valid-after
+        date of the latest consensus they are listed in
+
+        :param fingerprints: Fingerprints of the relays
+        :type fingerprints: List[str]
+        :param last_seen: Valid-after date of the consensus, in UTC
+        :type last_seen: datetime
+        """
+        if len(fingerprints) == 0:
+            return
+
+        self.__db_session.query(Relay).filter(
+            Relay.fingerprint.in_(fingerprints)
+        ).update(
+            {Relay.last_seen: pytz.utc.localize(last_seen)},
+            synchronize_session=False,
+        )
+
+    def update(self, batch_size: int = 500) -> None:
+        """
+        Gets the latest consensus and compares its relays with the ones of the
+        previous update. Later, gets the details of the added and changed
+        relays from Onionoo and adds them to the database in batches.
+
+        :param batch_size: Number of relays to insert in a single batch, defaults to 500
         :type batch_size: int
+        :raises Exception: If the changes couldn't be written, after rolling them back
         """
         # Download the latest consensus
         current_datetime = datetime.now()
         consensus_file = self.__collector.get_consensus(current_datetime)
 
         # Parse the consensus file
+        consensus = ConsensusV3Parser(consensus_file)
         parsed_consensus = {
-            str(relay.fingerprint): relay
-            for relay in ConsensusV3Parser(consensus_file).relay_entries
+            str(relay.fingerprint): relay for relay in consensus.relay_entries
         }
 
-        relay_fingerprints = list(parsed_consensus.keys())
+        # Find the relays that changed since the previous update
+        previous_signatures = self.__get_previous_signatures()
+        current_signatures = ConsensusDiffer.get_signatures(parsed_consensus.values())
+        consensus_diff = ConsensusDiffer.diff(previous_signatures, current_signatures)
 
-        # Set all relays as offline
-        # TODO: Yes, the following is a bad practice, please use an ORM statement instead
-        table = Relay.__tablename__.lower()
-        query = f"UPDATE {table} SET status = false"
-        self.__db_session.execute(query)
-        self.__db_session.commit()
+        self.__logger.info(
+            "Since the previous update %s relays were added, %s were removed and %s changed",
+            len(consensus_diff.added),
+            len(consensus_diff.removed),
+            len(consensus_diff.changed),
+        )
+
+        relay_fingerprints = consensus_diff.added + consensus_diff.changed
+
+        unchanged_fingerprints = [
+            fingerprint
+            for fingerprint, signature in current_signatures.items()
+            if previous_signatures.get(fingerprint) == signature
+        ]
+
+        online_fingerprints: List[str] = list(unchanged_fingerprints)
 
-        # Get relay information in chunks to not overwhelm Onionoo API
-        for i in range(0, len(relay_fingerprints), batch_size):
-            relay_batch = relay_fingerprints[i : i + batch_size]
+        # Get changed relays' details from Onionoo
+        onionoo_relay_data = Onionoo(
+            relay_fingerprints, client=self.__onionoo_client
+        ).relay_entries
+
+        # Apply all changes in a single transaction, so that readers never see
+        # a partially updated relay list
+        try:
+            for i in range(0, len(onionoo_relay_data), batch_size):
+                online_fingerprints.extend(
+                    self.__insert_batch_into_db(
+                        onionoo_relay_data[i : i + batch_size], parsed_consensus
+                    )
+                )
+
+            # Unchanged relays were seen in this consensus too
+            self.__update_last_seen(unchanged_fingerprints, consensus.valid_after)
+
+            # Set the relays that aren't in the consensus anymore as offline
+            self.__update_relay_statuses(online_fingerprints)
+
+            # Relays that Onionoo didn't know about yet are retried next time
+            self.__save_signatures(
+                {
+                    fingerprint: current_signatures[fingerprint]
+                    for fingerprint in online_fingerprints
+                }
+            )
 
-            # Get relays' details from Onionoo
-            onionoo_relay_data = Onionoo(relay_batch).relay_entries
+            self.__db_session.commit()
 
-            self.__insert_batch_into_db(onionoo_relay_data, parsed_consensus)
+        except Exception:
+            self.__db_session.rollback()
+            raise
 
         self.__logger.info(
             "Done with updating the relay list using the latest consensus"
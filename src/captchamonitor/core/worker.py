@@ -1,12 +1,20 @@
 import time
 import logging
-from typing import Union, Optional
+from typing import List, Union, Optional
+from datetime import timedelta
 
-from sqlalchemy import text
+from sqlalchemy import or_, func, select, update
 from sqlalchemy.orm import sessionmaker
 
 from captchamonitor.utils.config import Config
-from captchamonitor.utils.models import FetchQueue, FetchFailed, FetchCompleted
+from captchamonitor.utils.models import (
+    Relay,
+    Fetcher,
+    FetchQueue,
+    FetchFailed,
+    FetchCompleted,
+)
+from captchamonitor.utils.blob_store import BlobStore
 from captchamonitor.utils.exceptions import FetcherNotFound
 from captchamonitor.utils.tor_launcher import TorLauncher
 from captchamonitor.utils.small_scripts import (
@@ -33,6 +41,8 @@ class Worker:
         config: Config,
         db_session: sessionmaker,
         loop: Optional[bool] = True,
+        fetcher_method: Optional[str] = None,
+        tor_launcher: Optional[TorLauncher] = None,
     ) -> None:
         """
         Initializes a new worker
@@ -45,14 +55,26 @@ class Worker:
         :type db_session: sessionmaker
         :param loop: Should I process a single job or loop over all jobs, defaults to True
         :type loop: bool, optional
+        :param fetcher_method: Only claim jobs that use this fetcher method, defaults to None
+        :type fetcher_method: Optional[str], optional
+        :param tor_launcher: Tor launcher dedicated to this worker, launches a new one if None, defaults to None
+        :type tor_launcher: Optional[TorLauncher], optional
         """
         # Private class attributes
         self.__logger = logging.getLogger(__name__)
         self.__config: Config = config
         self.__db_session: sessionmaker = db_session
         self.__worker_id: str = worker_id
-        self.__tor_launcher: TorLauncher = TorLauncher(self.__config)
+        self.__fetcher_method: Optional[str] = fetcher_method
+        self.__owns_tor_launcher: bool = tor_launcher is None
+        self.__tor_launcher: TorLauncher = (
+            TorLauncher(self.__config) if tor_launcher is None else tor_launcher
+        )
         self.__job_queue_delay: float = float(self.__config["job_queue_delay"])
+        self.__job_claim_batch_size: int = int(self.__config["job_claim_batch_size"])
+        self.__job_lease_duration: int = int(self.__config["job_lease_duration"])
+        self.__claimed_job_ids: List[int] = []
+        self.__blob_store: BlobStore = BlobStore(self.__db_session)
         self.__fetcher: Union[TorBrowser, FirefoxBrowser, ChromeBrowser, OperaBrowser]
 
         # Loop over the jobs
@@ -60,6 +82,108 @@ class Worker:
             self.process_next_job()
             time.sleep(self.__job_queue_delay)
 
+    def claim_jobs(self, batch_size: Optional[int] = None) -> List[int]:
+        """
+        Leases a batch of jobs from the job queue using a single statement. Rows
+        that are locked by other workers are skipped instead of waited on, so
+        concurrent workers never compete for the same jobs. Jobs whose lease
+        expired, for example because the worker that claimed them crashed, are
+        put back into circulation.
+
+        :param batch_size: Maximum number of jobs to lease, defaults to the configured batch size
+        :type batch_size: Optional[int], optional
+        :return: IDs of the leased jobs in queue order
+        :rtype: List[int]
+        """
+        # pylint: disable=C0121
+        if batch_size is None:
+            batch_size = self.__job_claim_batch_size
+
+        lease_expired_at = func.now() - timedelta(seconds=self.__job_lease_duration)
+
+        # Unclaimed jobs and jobs with expired leases
+        claimable_jobs = (
+            select([FetchQueue.id])
+            .where(
+                or_(
+                    FetchQueue.claimed_at == None,
+                    FetchQueue.claimed_at < lease_expired_at,
+                )
+            )
+            .order_by(FetchQueue.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+
+        # Only pick the jobs meant for our fetcher, if we are dedicated to one
+        if self.__fetcher_method is not None:
+            claimable_jobs = claimable_jobs.where(
+                FetchQueue.fetcher_id.in_(
+                    select([Fetcher.id]).where(Fetcher.method == self.__fetcher_method)
+                )
+            )
+
+        query = (
+            update(FetchQueue)
+            .where(FetchQueue.id.in_(claimable_jobs))
+            .values(claimed_by=self.__worker_id, claimed_at=func.now())
+            .returning(FetchQueue.id)
+        )
+
+        job_ids = sorted(row[0] for row in self.__db_session.execute(query))
+        self.__db_session.commit()
+
+        return job_ids
+
+    def __renew_lease(self, job_id: int) -> bool:
+        """
+        Renews the lease of the given job using a single statement, only if the
+        job is still leased by this worker
+
+        :param job_id: ID of the job
+        :type job_id: int
+        :return: True if the lease was renewed, False if the job was lost
+        :rtype: bool
+        """
+        # pylint: disable=W0143
+        query = (
+            update(FetchQueue)
+            .where(FetchQueue.id == job_id)
+            .where(FetchQueue.claimed_by == self.__worker_id)
+            .values(claimed_at=func.now())
+            .returning(FetchQueue.id)
+        )
+
+        renewed = self.__db_session.execute(query).first() is not None
+        self.__db_session.commit()
+
+        return renewed
+
+    def prebuild_circuits_for(self, job_ids: List[int]) -> None:
+        """
+        Starts building the Tor circuits needed by the given jobs in the
+        background, so that they are ready by the time the jobs are processed
+
+        :param job_ids: IDs of the jobs to build circuits for
+        :type job_ids: List[int]
+        """
+        # pylint: disable=W0143
+        if len(job_ids) == 0:
+            return
+
+        query = (
+            self.__db_session.query(Relay.fingerprint)
+            .join(FetchQueue, FetchQueue.relay_id == Relay.id)
+            .join(Fetcher, FetchQueue.fetcher_id == Fetcher.id)
+            .filter(FetchQueue.id.in_(job_ids))
+            .filter(Fetcher.uses_proxy_type == "tor")
+            .order_by(FetchQueue.id)
+        )
+        exit_relays = [row[0] for row in query]
+
+        if len(exit_relays) > 0:
+            self.__tor_launcher.prebuild_circuits_to(exit_relays)
+
     def process_next_job(self) -> None:
         """
         Processes the next available job in the job queue. Claims the job, tries
@@ -71,27 +195,29 @@ class Worker:
         :raises FetcherNotFound: If requested fetcher is not available
         """
         # pylint: disable=R0912,R0915
-        # Get claimed jobs by this worker
-        db_job = self.__db_session.query(FetchQueue).filter(
-            FetchQueue.claimed_by == self.__worker_id
-        )
+        # Lease a new batch of jobs if we are done with the previous batch
+        if len(self.__claimed_job_ids) == 0:
+            self.__claimed_job_ids = self.claim_jobs()
+            self.prebuild_circuits_for(self.__claimed_job_ids)
 
-        # Claim a new job if not already claimed
-        if db_job.count() == 0:
-            # TODO: Yes, the following is a bad practice, please use an ORM statement instead
-            table = FetchQueue.__tablename__.lower()
-            query = f"UPDATE {table} SET claimed_by = :worker_id WHERE id = (SELECT min(id) FROM {table} WHERE claimed_by IS NULL)"
-            params = {"worker_id": self.__worker_id}
-            self.__db_session.execute(text(query), params)
-            self.__db_session.commit()
+        # Don't do anything if there is no job in the queue
+        if len(self.__claimed_job_ids) == 0:
+            return
 
-        # Get the claimed job
-        job = db_job.first()
+        job_id = self.__claimed_job_ids.pop(0)
 
-        # Don't do anything if there is no job in the queue
-        if job is None:
+        # Skip the job if our lease expired and someone else processed or claimed it
+        if not self.__renew_lease(job_id):
+            self.__logger.debug(
+                "Worker %s lost the lease of job %s, skipping it",
+                self.__worker_id,
+                job_id,
+            )
             return
 
+        # Get the claimed job
+        job = self.__db_session.query(FetchQueue).get(job_id)
+
         try:
             # Create the options based on the ones described within the job
             options_dict = {}
@@ -100,8 +226,10 @@ class Worker:
 
             # Create a new circuit if we will be using Tor
             proxy = None
+            exit_relay = None
             if job.ref_fetcher.uses_proxy_type == "tor":
-                self.__tor_launcher.create_new_circuit_to(job.ref_relay.fingerprint)
+                exit_relay = job.ref_relay.fingerprint
+                self.__tor_launcher.create_new_circuit_to(exit_relay)
                 proxy = (
                     self.__tor_launcher.ip_address,
                     self.__tor_launcher.socks_port,
@@ -120,6 +248,8 @@ class Worker:
                     proxy=proxy,
                     options=options_dict,
                     use_proxy_type=job.ref_fetcher.uses_proxy_type,
+                    reuse_session=True,
+                    exit_relay=exit_relay,
                 )
 
             elif job.ref_fetcher.method == FirefoxBrowser.method_name_in_db:
@@ -129,6 +259,8 @@ class Worker:
                     proxy=proxy,
                     options=options_dict,
                     use_proxy_type=job.ref_fetcher.uses_proxy_type,
+                    reuse_session=True,
+                    exit_relay=exit_relay,
                 )
 
             elif job.ref_fetcher.method == ChromeBrowser.method_name_in_db:
@@ -138,6 +270,8 @@ class Worker:
                     proxy=proxy,
                     options=options_dict,
                     use_proxy_type=job.ref_fetcher.uses_proxy_type,
+                    reuse_session=True,
+                    exit_relay=exit_relay,
                 )
 
             elif job.ref_fetcher.method == OperaBrowser.method_name_in_db:
@@ -147,6 +281,8 @@ class Worker:
                     proxy=proxy,
                     options=options_dict,
                     use_proxy_type=job.ref_fetcher.uses_proxy_type,
+                    reuse_session=True,
+                    exit_relay=exit_relay,
                 )
 
             else:
@@ -190,14 +326,24 @@ class Worker:
                 ).restart_browser_container_if_unhealthy()
 
         else:
+            # Store the payloads separately, identical ones are stored only once
+            html_data_hash, html_data_size = self.__blob_store.put(
+                self.__fetcher.page_source
+            )
+            http_requests_hash, http_requests_size = self.__blob_store.put(
+                self.__fetcher.page_har
+            )
+
             # If successful, put into the completed table
             completed = FetchCompleted(
                 url=job.url,
                 options=options_dict,
                 tbb_security_level=job.tbb_security_level,
                 captcha_monitor_version=self.__config["version"],
-                html_data=self.__fetcher.page_source,
-                http_requests=self.__fetcher.page_har,
+                html_data_hash=html_data_hash,
+                html_data_size=html_data_size,
+                http_requests_hash=http_requests_hash,
+                http_requests_size=http_requests_size,
                 fetcher_id=job.fetcher_id,
                 domain_id=job.domain_id,
                 relay_id=job.relay_id,
@@ -219,8 +365,10 @@ class Worker:
             # Reset the changes
             self.__tor_launcher.reset_configuration()
 
-            # Delete job from the job queue
-            self.__db_session.delete(job)
+            # Delete job from the job queue, unless someone else took it over
+            self.__db_session.query(FetchQueue).filter(
+                FetchQueue.id == job.id, FetchQueue.claimed_by == self.__worker_id
+            ).delete(synchronize_session=False)
 
             # Commit changes to the database
             self.__db_session.commit()
@@ -229,6 +377,10 @@ class Worker:
         """
         Perform cleanup before going out of scope
         """
-        if hasattr_private(self, "__tor_launcher"):
+        if hasattr_private(self, "__fetcher"):
+            # Close the browser session kept warm between jobs
+            self.__fetcher.discard_pooled_session()
+
+        if hasattr_private(self, "__tor_launcher") and self.__owns_tor_launcher:
             # Stop the containers
             self.__tor_launcher.close()
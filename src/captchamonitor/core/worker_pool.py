@@ -0,0 +1,173 @@
+import time
+import logging
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.orm import sessionmaker
+
+from captchamonitor.core.worker import Worker
+from captchamonitor.utils.config import Config
+from captchamonitor.utils.tor_launcher import TorLauncher
+from captchamonitor.utils.small_scripts import (
+    hasattr_private,
+    get_traceback_information,
+)
+from captchamonitor.fetchers.tor_browser import TorBrowser
+from captchamonitor.fetchers.opera_browser import OperaBrowser
+from captchamonitor.fetchers.chrome_browser import ChromeBrowser
+from captchamonitor.fetchers.firefox_browser import FirefoxBrowser
+
+
+class WorkerPool:
+    """
+    Runs one worker slot per browser container within a single process, so
+    that all browser containers can be kept busy at the same time. Each slot
+    only claims the jobs meant for its own fetcher and has its own Tor
+    container, so parallel Tor fetches never share a circuit or a socks port.
+    """
+
+    def __init__(
+        self,
+        worker_id: str,
+        config: Config,
+        db_session: sessionmaker,
+        fetcher_methods: Optional[List[str]] = None,
+        loop: Optional[bool] = True,
+    ) -> None:
+        """
+        Initializes a new worker pool
+
+        :param worker_id: Worker ID assigned for this worker pool, slot IDs are derived from it
+        :type worker_id: str
+        :param config: The config class instance that contains global configuration values
+        :type config: Config
+        :param db_session: Database session used to connect to the database
+        :type db_session: sessionmaker
+        :param fetcher_methods: Fetcher methods to create slots for, defaults to all available fetchers
+        :type fetcher_methods: Optional[List[str]], optional
+        :param loop: Should I process a single round of jobs or keep looping, defaults to True
+        :type loop: bool, optional
+        """
+        # Private class attributes
+        self.__logger = logging.getLogger(__name__)
+        self.__config: Config = config
+        self.__db_session: sessionmaker = db_session
+        self.__worker_id: str = worker_id
+        self.__job_queue_delay: float = float(self.__config["job_queue_delay"])
+        self.__fetcher_methods: List[str] = fetcher_methods or [
+            TorBrowser.method_name_in_db,
+            FirefoxBrowser.method_name_in_db,
+            ChromeBrowser.method_name_in_db,
+            OperaBrowser.method_name_in_db,
+        ]
+        self.__tor_launchers: List[TorLauncher] = []
+        self.__slot_sessions: List[sessionmaker] = []
+        self.__slots: List[Worker] = []
+        self.__executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=len(self.__fetcher_methods),
+            thread_name_prefix="cm-worker-slot",
+        )
+
+        self.__create_slots()
+
+        # Keep every slot busy on its own thread
+        if loop:
+            futures = [
+                self.__executor.submit(self.__run_slot, slot, slot_session)
+                for slot, slot_session in zip(self.__slots, self.__slot_sessions)
+            ]
+            for future in futures:
+                future.result()
+
+    def __launch_tor_launchers(self) -> None:
+        """
+        Launches one Tor container per slot. The containers are started
+        concurrently since each of them takes a while to bootstrap.
+        """
+        self.__tor_launchers = list(
+            self.__executor.map(
+                lambda _: TorLauncher(self.__config), self.__fetcher_methods
+            )
+        )
+
+    def __create_slots(self) -> None:
+        """
+        Creates one worker per fetcher method. Database sessions cannot be shared
+        between threads, so every slot gets its own session bound to the same
+        engine.
+        """
+        engine = self.__db_session.get_bind()
+
+        self.__launch_tor_launchers()
+
+        for fetcher_method, tor_launcher in zip(
+            self.__fetcher_methods, self.__tor_launchers
+        ):
+            slot_session = sessionmaker(bind=engine)()
+            self.__slot_sessions.append(slot_session)
+            self.__slots.append(
+                Worker(
+                    worker_id=f"{self.__worker_id}-{fetcher_method}",
+                    config=self.__config,
+                    db_session=slot_session,
+                    loop=False,
+                    fetcher_method=fetcher_method,
+                    tor_launcher=tor_launcher,
+                )
+            )
+
+            self.__logger.debug(
+                "Created a worker slot for %s in worker pool %s",
+                fetcher_method,
+                self.__worker_id,
+            )
+
+    def __run_slot(self, slot: Worker, slot_session: sessionmaker) -> None:
+        """
+        Keeps processing the jobs of a single slot
+
+        :param slot: The worker that belongs to the slot
+        :type slot: Worker
+        :param slot_session: Database session used by the slot
+        :type slot_session: sessionmaker
+        """
+        while True:
+            try:
+                slot.process_next_job()
+
+            # pylint: disable=W0703
+            except Exception:
+                # Don't let a single slot take down the rest of the pool
+                self.__logger.warning(
+                    "Worker slot crashed while processing a job: %s",
+                    get_traceback_information(),
+                )
+                slot_session.rollback()
+
+            time.sleep(self.__job_queue_delay)
+
+    def process_next_jobs(self) -> None:
+        """
+        Lets every slot process its next available job concurrently and waits
+        until all of them are done
+        """
+        for _ in self.__executor.map(
+            lambda slot: slot.process_next_job(), self.__slots
+        ):
+            pass
+
+    def __del__(self) -> None:
+        """
+        Perform cleanup before going out of scope
+        """
+        if hasattr_private(self, "__executor"):
+            self.__executor.shutdown(wait=False)
+
+        if hasattr_private(self, "__slot_sessions"):
+            for slot_session in self.__slot_sessions:
+                slot_session.close()
+
+        if hasattr_private(self, "__tor_launchers"):
+            # Stop the containers
+            for tor_launcher in self.__tor_launchers:
+                tor_launcher.close()
@@ -0,0 +1,128 @@
+import io
+import json
+from typing import Any, List
+from dataclasses import dataclass
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+
+@dataclass
+class Graph:
+    """
+    Stores everything needed to render a single graph
+
+    :param name: Name of the graph, used as the file name without the extension
+    :type name: str
+    :param data_for_graph: Scores for y axis, Timestamps for x axis, Total query, Obtained Query, Relay Fingerprint
+    :type data_for_graph: List[List[Any]]
+    :param ylabel: Label of the y axis
+    :type ylabel: str
+    :param title: Title of the graph
+    :type title: str
+    :param color: Color of the bars
+    :type color: str
+    """
+
+    name: str
+    data_for_graph: List[List[Any]]
+    ylabel: str
+    title: str
+    color: str
+
+
+class GraphRenderer:
+    """
+    Renders graphs without touching the global pyplot state, so that graphs can
+    be rendered in parallel and no figures are left behind in long running
+    processes. Graphs are either rendered as PNG or SVG images, or exported as
+    JSON series for client-side charts.
+    """
+
+    # Supported output formats
+    graph_formats = ("png", "svg", "json")
+
+    @classmethod
+    def render(cls, graph: Graph, graph_format: str) -> bytes:
+        """
+        Renders the given graph in the given format
+
+        :param graph: The graph to render
+        :type graph: Graph
+        :param graph_format: One of graph_formats
+        :type graph_format: str
+        :raises ValueError: If the format is not supported
+        :return: Contents of the rendered file
+        :rtype: bytes
+        """
+        if graph_format not in cls.graph_formats:
+            raise ValueError(f"Unsupported graph format: {graph_format}")
+
+        if graph_format == "json":
+            return cls.__render_json(graph)
+
+        return cls.__render_image(graph, graph_format)
+
+    @staticmethod
+    def __render_json(graph: Graph) -> bytes:
+        """
+        Exports the series of the given graph as JSON
+
+        :param graph: The graph to export
+        :type graph: Graph
+        :return: JSON encoded series
+        :rtype: bytes
+        """
+        data_for_graph = graph.data_for_graph
+        series = {
+            "title": graph.title,
+            "ylabel": graph.ylabel,
+            "color": graph.color,
+            "relay": data_for_graph[4],
+            "scores": data_for_graph[0],
+            "timestamps": data_for_graph[1],
+            "total_query": data_for_graph[2],
+            "obtained_query": data_for_graph[3],
+        }
+
+        return json.dumps(series).encode("utf-8")
+
+    @staticmethod
+    def __render_image(graph: Graph, graph_format: str) -> bytes:
+        """
+        Draws the given graph using the Agg canvas
+
+        :param graph: The graph to draw
+        :type graph: Graph
+        :param graph_format: Either png or svg
+        :type graph_format: str
+        :return: Contents of the image
+        :rtype: bytes
+        """
+        data_for_graph = graph.data_for_graph
+
+        # The figure is not registered with pyplot, it is freed once it goes
+        # out of scope
+        fig = Figure(figsize=(20, 10))
+        FigureCanvasAgg(fig)
+        axes = fig.add_subplot()
+
+        axes.set_ylim(top=100)
+        axes.bar(data_for_graph[1], data_for_graph[0], width=0.25, color=graph.color)
+        axes.set_xlabel("Timestamp in days")
+
+        axes.set_ylabel(graph.ylabel)
+        axes.set_title(graph.title)
+
+        # Counts of the latest day, series of relays seen only briefly are short
+        obtained_query = data_for_graph[3][-1] if data_for_graph[3] else 0
+        total_query = data_for_graph[2][-1] if data_for_graph[2] else 0
+        txt_str = f"No of websites that has been evaluated: {obtained_query}"
+        fig.text(0.02, 0.035, txt_str)
+        txt_str = f"total websites: {total_query}"
+        fig.text(0.02, 0.005, txt_str)
+
+        image = io.BytesIO()
+        fig.savefig(image, format=graph_format)
+
+        return image.getvalue()
@@ -1,15 +1,53 @@
 import os
-import shutil
+import json
+import math
+import filecmp
+import hashlib
 import logging
-from typing import Any, List, Tuple, Optional
+import tempfile
+from typing import Any, Dict, List, Tuple, Callable, Iterator, Optional
+from itertools import groupby
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
 
-import matplotlib.pyplot as plt
 from jinja2 import Environment, FileSystemLoader
-from sqlalchemy import Date, or_, cast
+from sqlalchemy import or_, case, func, inspect
 from sqlalchemy.orm import sessionmaker
 
 from captchamonitor.utils.config import Config
-from captchamonitor.utils.models import Relay, Domain, FetchCompleted, AnalyzeCompleted
+from captchamonitor.utils.models import Relay, Domain, AnalyzeDailyRollup
+from captchamonitor.dashboard.graph_renderer import Graph, GraphRenderer
+
+
+@dataclass
+class RelaySummary:
+    """
+    Stores the totals of a relay listed on the relay index
+
+    :param fingerprint: Fingerprint of the relay
+    :type fingerprint: str
+    :param total: Number of analyzed fetches made through the relay
+    :type total: int
+    :param tor_blocked: Number of analyzed fetches that were blocked
+    :type tor_blocked: int
+    """
+
+    fingerprint: str
+    total: int
+    tor_blocked: int
+
+    @property
+    def block_rate(self) -> float:
+        """
+        Percentage of the analyzed fetches that were blocked
+
+        :return: The block rate
+        :rtype: float
+        """
+        if self.total == 0:
+            return 0.0
+
+        return self.tor_blocked / self.total * 100
 
 
 class RenderDashboard:
@@ -18,6 +56,26 @@ class RenderDashboard:
     www folder
     """
 
+    # Number of relays listed on each page of the relay index
+    relays_per_page = 100
+
+    # Number of relays whose graphs are drawn together
+    relays_per_graph_batch = 25
+
+    # Number of rows fetched from the database at once
+    relay_rows_per_fetch = 1000
+
+    # Filters used for counting the analyzed fetches of each graph
+    graph_filters = {
+        "tor_blocked": [AnalyzeDailyRollup.status_check == 0],
+        "partially_blocked": [AnalyzeDailyRollup.dom_analyze == 0],
+        "both_blocked": [AnalyzeDailyRollup.status_check == 1],
+        "none_blocked": [
+            AnalyzeDailyRollup.dom_analyze == 1,
+            AnalyzeDailyRollup.dom_analyze == 4,
+        ],
+    }
+
     def __init__(self, config: Config, db_session: sessionmaker) -> None:
         """
         Initializes the dashboard renderer
@@ -37,28 +95,144 @@ class RenderDashboard:
         self.__jinja_environment = Environment(
             loader=FileSystemLoader(self.__template_location)
         )
+        self.__www_location: str = self.__config["dashboard_www_location"]
+        self.__manifest_location: str = os.path.join(
+            self.__www_location, ".render_manifest.json"
+        )
+        self.__manifest: Dict[str, str] = self.__load_manifest()
+        self.__new_manifest: Dict[str, str] = {}
+        self.__templates_hash: str = self.__hash_templates()
         self.graph_name: List[str] = []
         self.graph_string: Optional[Any] = []
-        # Clean the www directory
-        self.cleanup_www_folder()
-        # Get hold of the docstrings
-        self.graph_string.append(self.graph_for_tor_block.__doc__)
-        self.graph_string.append(self.graph_for_tor_partial_block.__doc__)
-        self.graph_string.append(self.graph_for_both_block.__doc__)
-        self.graph_string.append(self.graph_for_tor_none_block.__doc__)
+        self.__days: Optional[List[Any]] = None
+        self.__graph_format: str = self.__config["dashboard_graph_format"]
+        self.__graph_worker_count: int = int(
+            self.__config["dashboard_graph_worker_count"]
+        )
+        self.__pending_graphs: List[Graph] = []
+        # Bring the static files in the www directory up to date
+        self.sync_static_folder()
+        # Get hold of the descriptions in the docstrings
+        self.graph_string.append(self.__get_description(self.graph_for_tor_block))
+        self.graph_string.append(
+            self.__get_description(self.graph_for_tor_partial_block)
+        )
+        self.graph_string.append(self.__get_description(self.graph_for_both_block))
+        self.graph_string.append(self.__get_description(self.graph_for_tor_none_block))
         # Render all pages
         self.render_index()
         self.render_domain_list()
-        # Render graph: blocked websites for Tor
-        self.graph_for_tor_block()
-        # Render graph: partially blocked websites for Tor
-        self.graph_for_tor_partial_block()
-        # Render graph: blocked websites for both Tor and non-Tor nodes
-        self.graph_for_both_block()
-        # Render graph: accessible websites for Tor
-        self.graph_for_tor_none_block()
-        # Export graph to the website
-        self.export_graph()
+        # Render the graphs of every relay and the index of the relays
+        self.render_relay_reports()
+        # Remove the files that are not part of the dashboard anymore
+        self.cleanup_www_folder()
+        self.__save_manifest()
+
+    @staticmethod
+    def __get_description(method: Callable) -> str:
+        """
+        Gets the description of the given method from its docstring, without
+        the parameter list
+
+        :param method: The method
+        :type method: Callable
+        :return: First paragraph of the docstring
+        :rtype: str
+        """
+        description = str(method.__doc__).split("\n\n", maxsplit=1)[0]
+
+        # Keep the indentation of the docstring, like the rest of the page
+        return f"{description}\n        "
+
+    def __load_manifest(self) -> Dict[str, str]:
+        """
+        Loads the hashes of the inputs the files in the www folder were rendered
+        from during the previous run
+
+        :return: Dictionary of relative file paths and input hashes
+        :rtype: Dict[str, str]
+        """
+        try:
+            with open(self.__manifest_location, "r", encoding="utf-8") as file:
+                return dict(json.load(file))
+
+        except (OSError, ValueError):
+            return {}
+
+    def __save_manifest(self) -> None:
+        """
+        Saves the hashes of the inputs the files in the www folder were rendered
+        from, so that the next run can skip the unchanged ones
+        """
+        if self.__new_manifest == self.__manifest:
+            return
+
+        self.__write_atomically(
+            self.__manifest_location,
+            json.dumps(self.__new_manifest, sort_keys=True).encode("utf-8"),
+        )
+
+    def __hash_templates(self) -> str:
+        """
+        Hashes all templates, since pages depend on the templates they extend
+
+        :return: SHA-256 hash of the templates
+        :rtype: str
+        """
+        sha256 = hashlib.sha256()
+
+        for root, _, filenames in sorted(os.walk(self.__template_location)):
+            for filename in sorted(filenames):
+                sha256.update(filename.encode("utf-8"))
+                with open(os.path.join(root, filename), "rb") as file:
+                    sha256.update(file.read())
+
+        return sha256.hexdigest()
+
+    def __is_up_to_date(self, filename: str, *inputs: Any) -> bool:
+        """
+        Checks if the given file in the www folder was rendered from the same
+        inputs before, and records the inputs for the next run
+
+        :param filename: Path of the file relative to the www folder
+        :type filename: str
+        :param inputs: Everything the file is rendered from
+        :type inputs: Any
+        :return: True if the file doesn't need to be rendered again
+        :rtype: bool
+        """
+        input_hash = hashlib.sha256(repr(inputs).encode("utf-8")).hexdigest()
+        self.__new_manifest[filename] = input_hash
+
+        return self.__manifest.get(filename) == input_hash and os.path.isfile(
+            os.path.join(self.__www_location, filename)
+        )
+
+    @staticmethod
+    def __write_atomically(file_path: str, data: bytes) -> None:
+        """
+        Writes given data to a temporary file and renames it to the given path,
+        so that the web server never serves a half written file
+
+        :param file_path: Path of the file to write
+        :type file_path: str
+        :param data: Data to write to the file
+        :type data: bytes
+        :raises OSError: If the file cannot be written
+        """
+        directory = os.path.dirname(file_path)
+        os.makedirs(directory, exist_ok=True)
+
+        file_descriptor, temp_file_path = tempfile.mkstemp(dir=directory, prefix=".")
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                file.write(data)
+            os.chmod(temp_file_path, 0o644)
+            os.replace(temp_file_path, file_path)
+
+        except OSError:
+            os.unlink(temp_file_path)
+            raise
 
     def __write_to_file(self, filename: str, html_data: str) -> None:
         """
@@ -69,31 +243,54 @@ class RenderDashboard:
         :param html_data: HTML data to write to the file
         :type html_data: str
         """
-        html_file_path = os.path.join(self.__config["dashboard_www_location"], filename)
-        with open(html_file_path, "w") as file:
-            file.write(html_data)
+        html_file_path = os.path.join(self.__www_location, filename)
+        self.__write_atomically(html_file_path, html_data.encode("utf-8"))
+
+    def sync_static_folder(self) -> None:
+        """
+        Copies the static files that are missing or different in the www folder
+        """
+        self.__logger.debug("Syncing the static files to the www folder")
+
+        static_location = os.path.join(self.__config["dashboard_location"], "static")
+
+        for root, _, filenames in os.walk(static_location):
+            for filename in filenames:
+                source = os.path.join(root, filename)
+                relative_path = os.path.relpath(source, static_location)
+                destination = os.path.join(self.__www_location, relative_path)
+                self.__new_manifest[relative_path] = "static"
+
+                if os.path.isfile(destination) and filecmp.cmp(
+                    source, destination, shallow=False
+                ):
+                    continue
+
+                with open(source, "rb") as file:
+                    self.__write_atomically(destination, file.read())
 
     def cleanup_www_folder(self) -> None:
         """
-        Remove contents of the www folder and copy the static folder again
+        Remove the files in the www folder that weren't rendered or synced
+        during this run
         """
         self.__logger.debug("Cleaning up the www folder")
 
-        www_location = self.__config["dashboard_www_location"]
-        static_location = os.path.join(self.__config["dashboard_location"], "static")
+        keep = {".gitignore", os.path.basename(self.__manifest_location)}
 
-        # Remove folders and files inside the www folder
-        for filename in os.listdir(www_location):
-            file_path = os.path.join(www_location, filename)
-            if (os.path.isfile(file_path) or os.path.islink(file_path)) and (
-                filename != ".gitignore"
-            ):
-                os.unlink(file_path)
-            elif os.path.isdir(file_path):
-                shutil.rmtree(file_path)
+        for root, _, filenames in os.walk(self.__www_location, topdown=False):
+            for filename in filenames:
+                file_path = os.path.join(root, filename)
+                relative_path = os.path.relpath(file_path, self.__www_location)
+                if (
+                    relative_path not in self.__new_manifest
+                    and relative_path not in keep
+                ):
+                    os.unlink(file_path)
 
-        # Copy static files
-        shutil.copytree(static_location, www_location, dirs_exist_ok=True)
+            # Remove the folders left empty
+            if root != self.__www_location and len(os.listdir(root)) == 0:
+                os.rmdir(root)
 
     def render_index(self, filename: str = "index.html") -> None:
         """
@@ -102,6 +299,9 @@ class RenderDashboard:
         :param filename: Name of the HTML file to export, defaults to "index.html"
         :type filename: str
         """
+        if self.__is_up_to_date(filename, self.__templates_hash):
+            return
+
         self.__logger.debug("Rendering %s", filename)
 
         template = self.__jinja_environment.get_template("index.html")
@@ -116,9 +316,14 @@ class RenderDashboard:
         :param filename: Name of the HTML file to export, defaults to "domain_list.html"
         :type filename: str
         """
-        self.__logger.debug("Rendering %s", filename)
+        data = self.__db_session.query(Domain).order_by(Domain.id).all()
+
+        columns = inspect(Domain).column_attrs.keys()
+        rows = [[getattr(domain, column) for column in columns] for domain in data]
+        if self.__is_up_to_date(filename, self.__templates_hash, rows):
+            return
 
-        data = self.__db_session.query(Domain).all()
+        self.__logger.debug("Rendering %s", filename)
 
         template = self.__jinja_environment.get_template("domain_list.html")
         html_data = template.render(data=data)
@@ -134,7 +339,7 @@ class RenderDashboard:
         color: str,
     ) -> None:
         """
-        Renders the graph view.
+        Queues the graph view to be rendered, unless it is already up to date.
 
         :param data_for_graph: Contains the data for the graph to be generated.Like: Scores for y axis, Timestamps for x axis, Total query, Obtained Query, Relay Fingerprint"
         :type data_for_graph: List[List[Any]]
@@ -147,109 +352,164 @@ class RenderDashboard:
         :param color: The color of the graph
         :type color: str
         """
-        fig = plt.figure(figsize=(20, 10))  # pylint: disable=W0612
-        plt.ylim(top=100)
-        plt.bar(data_for_graph[1], data_for_graph[0], width=0.25, color=color)
-        plt.xlabel("Timestamp in days")
+        name = f"relay_{data_for_graph[-1]}_{graph_type}.{self.__graph_format}"
+        self.graph_name.append(name)
+
+        filename = os.path.join("images", name)
+        if self.__is_up_to_date(filename, data_for_graph, ylabel, title, color):
+            return
+
+        # Graphs are drawn together, see render_pending_graphs
+        self.__pending_graphs.append(
+            Graph(
+                name=name,
+                data_for_graph=data_for_graph,
+                ylabel=ylabel,
+                title=title,
+                color=color,
+            )
+        )
 
-        plt.ylabel(ylabel)
-        plt.title(title)
-        txt_str = f"No of websites that has been evaluated: {data_for_graph[3][2]}"
-        plt.figtext(0.02, 0.035, txt_str)
-        txt_str = f"total websites: {data_for_graph[2][2]}"
-        plt.figtext(0.02, 0.005, txt_str)
+    def render_pending_graphs(
+        self, executor: Optional[ProcessPoolExecutor] = None
+    ) -> None:
+        """
+        Draws the graphs queued by render_graph, in parallel if there are
+        multiple worker processes, and writes them to the www folder
+
+        :param executor: Process pool to draw the graphs in, a pool is created for this call if not given and there are multiple worker processes, defaults to None
+        :type executor: Optional[ProcessPoolExecutor]
+        """
+        graphs, self.__pending_graphs = self.__pending_graphs, []
 
-        images_location = os.path.join(
-            self.__config["dashboard_location"], "static/images/"
+        if not graphs:
+            return
+
+        self.__logger.debug("Rendering %s graphs", len(graphs))
+
+        graph_formats = [self.__graph_format] * len(graphs)
+
+        if executor is not None and len(graphs) > 1:
+            rendered_graphs = list(
+                executor.map(GraphRenderer.render, graphs, graph_formats)
+            )
+        elif self.__graph_worker_count > 1 and len(graphs) > 1:
+            with ProcessPoolExecutor(
+                max_workers=min(self.__graph_worker_count, len(graphs))
+            ) as pool:
+                rendered_graphs = list(
+                    pool.map(GraphRenderer.render, graphs, graph_formats)
+                )
+        else:
+            rendered_graphs = list(map(GraphRenderer.render, graphs, graph_formats))
+
+        for graph, rendered_graph in zip(graphs, rendered_graphs):
+            self.__write_atomically(
+                os.path.join(self.__www_location, "images", graph.name),
+                rendered_graph,
+            )
+
+    def __get_days(self) -> List[Any]:
+        """
+        Gets the days that have analyzed fetches, the graphs of all relays share
+        the same days
+
+        :return: Ordered list of days
+        :rtype: List[Any]
+        """
+        if self.__days is None:
+            query = (
+                self.__db_session.query(AnalyzeDailyRollup.day)
+                .distinct()
+                .order_by(AnalyzeDailyRollup.day)
+            )
+            self.__days = [row.day for row in query]
+
+        return self.__days
+
+    def __iterate_relay_data(self) -> Iterator[Tuple[str, List[Any]]]:
+        """
+        Sums the daily rollup of the analyzed fetches for every relay and day,
+        both in total and for each graph's filters, using a single GROUP BY
+        query. The rows are streamed and handed out one relay at a time, so
+        only a single relay's rows are kept in memory.
+
+        :yield: Relay fingerprint and its rows of day, total count and one count per graph, ordered by day
+        :rtype: Iterator[Tuple[str, List[Any]]]
+        """
+        # pylint: disable=W0143
+        graph_counts = [
+            func.sum(case([(or_(*filters), AnalyzeDailyRollup.count)], else_=0)).label(
+                graph_type
+            )
+            for graph_type, filters in self.graph_filters.items()
+        ]
+
+        query = (
+            self.__db_session.query(
+                Relay.fingerprint,
+                AnalyzeDailyRollup.day,
+                func.sum(AnalyzeDailyRollup.count).label("total"),
+                *graph_counts,
+            )
+            .join(Relay, AnalyzeDailyRollup.relay_id == Relay.id)
+            .group_by(Relay.id, Relay.fingerprint, AnalyzeDailyRollup.day)
+            .order_by(Relay.id, AnalyzeDailyRollup.day)
+            .yield_per(self.relay_rows_per_fetch)
         )
-        plt.savefig(images_location + f"relay_{data_for_graph[-1]}_{graph_type}.png")
-        self.graph_name.append(f"relay_{data_for_graph[-1]}_{graph_type}.png")
+
+        for relay_fingerprint, relay_rows in groupby(
+            query, key=lambda row: row.fingerprint
+        ):
+            yield relay_fingerprint, list(relay_rows)
 
     # pylint: disable=R0914
-    def prepare_data_for_graph(self, filters: List[Any]) -> List[List[Any]]:
+    def prepare_data_for_graph(
+        self, graph_type: str, relay_fingerprint: str, relay_rows: List[Any]
+    ) -> List[List[Any]]:
         """
         Synthesize Data for different graphs.
 
-        :param filters: Contains the details of filters according to which the data is filtered
-        :type filters: List[Any]
+        :param graph_type: The type of the graph, one of the keys of graph_filters
+        :type graph_type: str
+        :param relay_fingerprint: Fingerprint of the relay the graph is for
+        :type relay_fingerprint: str
+        :param relay_rows: Daily counts of the relay, ordered by day
+        :type relay_rows: List[Any]
         :return: List of data to generate the graph. Like Scores for y axis, Timestamps for x axis, Total query, Obtained Query, Relay Fingerprint
         """
         self.__logger.debug("Prepare data for different graphs")
-        analyze_db_data = self.__db_session.query(AnalyzeCompleted).all()
-        timestamp_store = set()
 
-        data_for_graph: List[List[Any]] = []
+        data_for_graph: List[Any] = []
         sc = []
         dt = []
         total_job_query = []
         total_query = []
-        time: Tuple[int, str] = (0, "")
-        for _ in analyze_db_data:
-            timestamp_store.add(
-                f"{_.created_at.year}-{_.created_at.month}-{_.created_at.day}"
-            )
-
-        timestamp_list = sorted(list(timestamp_store))
-        self.__logger.info(timestamp_list)
 
-        # Gets hold of all relays
-        relay_db_data = self.__db_session.query(Relay).all()
+        counts_by_day = {row.day: row for row in relay_rows}
 
-        for _ in relay_db_data:
-            fetch_relay = (
-                self.__db_session.query(FetchCompleted).filter(
-                    FetchCompleted.relay_id == _.id  # pylint: disable=W0143
-                )
-            ).all()
-
-            fetch_ids = []
-
-            # Relays which are Fetched successfully
-            for y in fetch_relay:
-                fetch_ids.append(y.id)
-
-            relay_fingerprint = _.fingerprint
-
-            for time in enumerate(timestamp_list):
-                total_query_ = (
-                    self.__db_session.query(AnalyzeCompleted)
-                    .filter(
-                        cast(AnalyzeCompleted.created_at, Date)
-                        >= f"{time[1]} 00:00:00",
-                        cast(AnalyzeCompleted.created_at, Date)
-                        <= f"{time[1]} 23:59:59",
-                        AnalyzeCompleted.fetch_completed_id.in_(
-                            fetch_ids
-                        ),  # pylint: disable=E1101
-                    )
-                    .all()
-                )
-                # pylint: disable=E1101
-                job_query = (
-                    self.__db_session.query(AnalyzeCompleted)
-                    .filter(
-                        cast(AnalyzeCompleted.created_at, Date)
-                        >= f"{time[1]} 00:00:00",
-                        cast(AnalyzeCompleted.created_at, Date)
-                        <= f"{time[1]} 23:59:59",
-                        AnalyzeCompleted.fetch_completed_id.in_(fetch_ids),
-                    )
-                    .filter(or_(*filters))
-                    .all()
-                )
+        if counts_by_day:
+            first_day, last_day = min(counts_by_day), max(counts_by_day)
+            days = [day for day in self.__get_days() if first_day <= day <= last_day]
+        else:
+            days = []
 
-                count_total_query = len(total_query_)
-                count_job_query = len(job_query)
+        for day in days:
+            # Days this relay wasn't used on are shown as zero
+            if day in counts_by_day:
+                count_total_query = int(counts_by_day[day].total)
+                count_job_query = int(getattr(counts_by_day[day], graph_type))
+            else:
+                count_total_query = count_job_query = 0
 
-                if count_total_query == 0:
-                    break
-                score = count_job_query / count_total_query * 100
+            score = (
+                count_job_query / count_total_query * 100 if count_total_query else 0.0
+            )
 
-                self.__logger.info(score)
-                sc.append(score)
-                dt.append(time[1])
-                total_query.append(count_total_query)
-                total_job_query.append(count_job_query)
+            sc.append(score)
+            dt.append(f"{day.year}-{day.month}-{day.day}")
+            total_query.append(count_total_query)
+            total_job_query.append(count_job_query)
 
         data_for_graph.append(sc)
         data_for_graph.append(dt)
@@ -259,12 +519,112 @@ class RenderDashboard:
 
         return data_for_graph
 
-    def graph_for_tor_block(self) -> None:
+    def render_relay_reports(self) -> None:
+        """
+        Renders the graphs and the page of every relay, one relay at a time,
+        and the index of the relays sorted by their block rate
+        """
+        relay_summaries: List[RelaySummary] = []
+
+        # A single process pool draws the graphs of all relays
+        executor: Optional[ProcessPoolExecutor] = None
+        if self.__graph_worker_count > 1:
+            executor = ProcessPoolExecutor(max_workers=self.__graph_worker_count)
+
+        try:
+            for count, (relay_fingerprint, relay_rows) in enumerate(
+                self.__iterate_relay_data(), start=1
+            ):
+                self.graph_name = []
+                # Render graph: blocked websites for Tor
+                self.graph_for_tor_block(relay_fingerprint, relay_rows)
+                # Render graph: partially blocked websites for Tor
+                self.graph_for_tor_partial_block(relay_fingerprint, relay_rows)
+                # Render graph: blocked websites for both Tor and non-Tor nodes
+                self.graph_for_both_block(relay_fingerprint, relay_rows)
+                # Render graph: accessible websites for Tor
+                self.graph_for_tor_none_block(relay_fingerprint, relay_rows)
+                # Export graph to the website
+                self.export_graph(relay_fingerprint)
+
+                relay_summaries.append(
+                    RelaySummary(
+                        fingerprint=relay_fingerprint,
+                        total=sum(int(row.total) for row in relay_rows),
+                        tor_blocked=sum(int(row.tor_blocked) for row in relay_rows),
+                    )
+                )
+
+                # Draw the graphs that changed every now and then, instead of
+                # keeping all of them in memory
+                if count % self.relays_per_graph_batch == 0:
+                    self.render_pending_graphs(executor)
+
+            self.render_pending_graphs(executor)
+
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        self.render_relay_index(relay_summaries)
+
+    def render_relay_index(
+        self, relay_summaries: List[RelaySummary], filename: str = "reanalyze.html"
+    ) -> None:
+        """
+        Render the paginated index of the relays, sorted by their block rate
+
+        :param relay_summaries: Summaries of all relays
+        :type relay_summaries: List[RelaySummary]
+        :param filename: Name of the first page, the following pages get a page number suffix, defaults to "reanalyze.html"
+        :type filename: str
+        """
+        relay_summaries.sort(
+            key=lambda summary: (-summary.block_rate, summary.fingerprint)
+        )
+
+        page_count = max(1, math.ceil(len(relay_summaries) / self.relays_per_page))
+        base_name, extension = os.path.splitext(filename)
+        page_names = [filename] + [
+            f"{base_name}_{page}{extension}" for page in range(2, page_count + 1)
+        ]
+
+        template = self.__jinja_environment.get_template("reanalyze.html")
+
+        for page, page_name in enumerate(page_names):
+            summaries = relay_summaries[
+                page * self.relays_per_page : (page + 1) * self.relays_per_page
+            ]
+
+            if self.__is_up_to_date(
+                page_name, self.__templates_hash, summaries, page_names
+            ):
+                continue
+
+            self.__logger.debug("Rendering %s", page_name)
+
+            html_data = template.render(
+                relays=summaries,
+                page=page,
+                page_names=page_names,
+                first_rank=page * self.relays_per_page + 1,
+            )
+
+            self.__write_to_file(filename=page_name, html_data=html_data)
+
+    def graph_for_tor_block(
+        self, relay_fingerprint: str, relay_rows: List[Any]
+    ) -> None:
         """
         Basic plot for the percentage of websites blocking the given Tor exit relay.
+
+        :param relay_fingerprint: Fingerprint of the relay the graph is for
+        :type relay_fingerprint: str
+        :param relay_rows: Daily counts of the relay, ordered by day
+        :type relay_rows: List[Any]
         """
         data_for_graph = self.prepare_data_for_graph(
-            filters=[AnalyzeCompleted.status_check == 0]
+            "tor_blocked", relay_fingerprint, relay_rows
         )
         title = f"Graph for relay ids: Fetches the websites using relay: {data_for_graph[4]}, \n and checks the percentage of blocked websites"
         ylabel = "Percentage where Tor is blocked (status_check) (%)"
@@ -273,12 +633,19 @@ class RenderDashboard:
             data_for_graph, ylabel, title, graph_type="tor_blocked", color="maroon"
         )
 
-    def graph_for_tor_partial_block(self) -> None:
+    def graph_for_tor_partial_block(
+        self, relay_fingerprint: str, relay_rows: List[Any]
+    ) -> None:
         """
         Basic graph for the percentage of websites partially blocking tor for the given Tor exit relay.
+
+        :param relay_fingerprint: Fingerprint of the relay the graph is for
+        :type relay_fingerprint: str
+        :param relay_rows: Daily counts of the relay, ordered by day
+        :type relay_rows: List[Any]
         """
         data_for_graph = self.prepare_data_for_graph(
-            filters=[AnalyzeCompleted.dom_analyze == 0]
+            "partially_blocked", relay_fingerprint, relay_rows
         )
         title = f"Graph for relay ids: Fetches the websites using relay: {data_for_graph[4]}, \n and checks the percentage of websites partially blocking tor nodes"
         ylabel = "Percentage where Tor partially-blocked percentage (dom_analyze) (%)"
@@ -291,12 +658,19 @@ class RenderDashboard:
             color="orange",
         )
 
-    def graph_for_both_block(self) -> None:
+    def graph_for_both_block(
+        self, relay_fingerprint: str, relay_rows: List[Any]
+    ) -> None:
         """
         Contains the basic graph for the percentage of websites blocking both Tor and Control Nodes
+
+        :param relay_fingerprint: Fingerprint of the relay the graph is for
+        :type relay_fingerprint: str
+        :param relay_rows: Daily counts of the relay, ordered by day
+        :type relay_rows: List[Any]
         """
         data_for_graph = self.prepare_data_for_graph(
-            filters=[AnalyzeCompleted.status_check == 1]
+            "both_blocked", relay_fingerprint, relay_rows
         )
         title = f"Graph for relay ids: Fetches the websites using relay: {data_for_graph[4]}, \n and checks the percentage of websites blocking both the control nodes and tor nodes"
         ylabel = "Percentage where Both control nodes and tor blocked  percentage (status_check) (%)"
@@ -305,15 +679,19 @@ class RenderDashboard:
             data_for_graph, ylabel, title, graph_type="both_blocked", color="yellow"
         )
 
-    def graph_for_tor_none_block(self) -> None:
+    def graph_for_tor_none_block(
+        self, relay_fingerprint: str, relay_rows: List[Any]
+    ) -> None:
         """
         Contains the basic graph for the percentage of websites that let's Tor exit relay access them.
+
+        :param relay_fingerprint: Fingerprint of the relay the graph is for
+        :type relay_fingerprint: str
+        :param relay_rows: Daily counts of the relay, ordered by day
+        :type relay_rows: List[Any]
         """
         data_for_graph = self.prepare_data_for_graph(
-            filters=[
-                AnalyzeCompleted.dom_analyze == 1,
-                AnalyzeCompleted.dom_analyze == 4,
-            ]
+            "none_blocked", relay_fingerprint, relay_rows
         )
         title = f"Graph for relay ids: Fetches the websites using relay: {data_for_graph[4]}, \n and checks the percentage of websites unblocked by Tor"
         ylabel = "Percentage where Websites are unblocked by Tor (%)"
@@ -322,14 +700,26 @@ class RenderDashboard:
             data_for_graph, ylabel, title, graph_type="none_blocked", color="green"
         )
 
-    def export_graph(self, filename: str = "reanalyze.html") -> None:
+    def export_graph(self, relay_fingerprint: str) -> None:
         """
-        Exports the graphs to the html file
+        Exports the graphs of the given relay to its own html file
 
-        :param filename: Name of the HTML file to export, defaults to "reanalyze.html"
-        :type filename: str
+        :param relay_fingerprint: Fingerprint of the relay
+        :type relay_fingerprint: str
         """
-        template = self.__jinja_environment.get_template("reanalyze.html")
-        html_data = template.render(data=self.graph_name, string=self.graph_string)
+        filename = os.path.join("relays", f"{relay_fingerprint}.html")
+
+        if self.__is_up_to_date(
+            filename, self.__templates_hash, self.graph_name, self.graph_string
+        ):
+            return
+
+        template = self.__jinja_environment.get_template("relay.html")
+        html_data = template.render(
+            root="../",
+            relay=relay_fingerprint,
+            data=self.graph_name,
+            string=self.graph_string,
+        )
 
         self.__write_to_file(filename=filename, html_data=html_data)
@@ -3,7 +3,9 @@ import json
 import time
 import shutil
 import logging
-from typing import Any, Tuple, Union, Optional
+import threading
+from typing import Any, Dict, Tuple, Union, Callable, Optional
+from dataclasses import dataclass
 
 from selenium import webdriver
 from selenium.common.exceptions import WebDriverException
@@ -15,12 +17,84 @@ from captchamonitor.utils.config import Config
 from captchamonitor.utils.exceptions import MissingProxy, HarExportExtensionError
 
 
+@dataclass
+class PooledSession:
+    """
+    Stores a warm Selenium session that is kept alive between fetches
+
+    :param key: The settings the browser session was created with
+    :type key: Tuple
+    :param driver: The connected Selenium remote webdriver
+    :type driver: webdriver.Remote
+    :param uses: Number of fetches completed with this session
+    :type uses: int
+    :param exit_relay: Fingerprint of the exit relay the session's connections go through, if Tor is used
+    :type exit_relay: Optional[str]
+    """
+
+    key: Tuple
+    driver: webdriver.Remote
+    uses: int = 0
+    exit_relay: Optional[str] = None
+
+
+@dataclass
+class CachedProfile:
+    """
+    Stores a prebuilt Firefox profile in its encoded form
+
+    :param fingerprint: Modification times and sizes of the files the profile was built from
+    :type fingerprint: Tuple
+    :param encoded: The zipped and base64 encoded profile directory
+    :type encoded: str
+    """
+
+    fingerprint: Tuple
+    encoded: str
+
+
+class EncodedFirefoxProfile(FirefoxProfile):
+    """
+    A Firefox profile that was already built and encoded. Lets Selenium send a
+    cached profile to the browser without copying or zipping any files.
+    """
+
+    # pylint: disable=W0231
+    def __init__(self, encoded_profile: str) -> None:
+        """
+        Wraps the given encoded profile
+
+        :param encoded_profile: The zipped and base64 encoded profile directory
+        :type encoded_profile: str
+        """
+        self.__encoded_profile: str = encoded_profile
+
+    @property
+    def encoded(self) -> str:
+        """
+        Returns the profile in the form Selenium sends it to the browser
+
+        :return: The zipped and base64 encoded profile directory
+        :rtype: str
+        """
+        return self.__encoded_profile
+
+
 class BaseFetcher:
     """
     Base fetcher class that will be inherited by the actual fetchers, used to unify
     the fetcher interfaces
     """
 
+    # Warm sessions shared by all fetchers, keyed by the Selenium executor URL
+    # since the browser containers accept a single session at a time
+    _session_pool: Dict[str, PooledSession] = {}
+    _session_pool_lock: threading.Lock = threading.Lock()
+
+    # Prebuilt Firefox profiles shared by all fetchers, keyed by the session key
+    _profile_cache: Dict[Tuple, CachedProfile] = {}
+    _profile_cache_lock: threading.Lock = threading.Lock()
+
     def __init__(
         self,
         config: Config,
@@ -36,6 +110,9 @@ class BaseFetcher:
         disable_javascript: bool = False,
         disable_cookies: bool = False,
         options: Optional[dict] = None,
+        reuse_session: bool = False,
+        max_session_uses: int = 10,
+        exit_relay: Optional[str] = None,
     ) -> None:
         """
         Initializes the fetcher with given arguments and tries to fetch the given URL
@@ -66,8 +143,15 @@ class BaseFetcher:
         :type disable_cookies: bool
         :param options: Dictionary of additional options to pass to the fetcher, defaults to None
         :type options: Optional[dict], optional
+        :param reuse_session: Keep the browser session warm for the next fetch with the same settings, defaults to False
+        :type reuse_session: bool
+        :param max_session_uses: Number of fetches after which a reused session is recycled, defaults to 10
+        :type max_session_uses: int
+        :param exit_relay: Fingerprint of the exit relay the Tor circuit is built to, defaults to None
+        :type exit_relay: Optional[str], optional
         :raises MissingProxy: If use_proxy_type is not None but no proxy provided
         """
+        # pylint: disable=R0914,R0915
         # Public class attributes
         self.url: str = url
         self.use_proxy_type: Optional[str] = use_proxy_type
@@ -80,6 +164,9 @@ class BaseFetcher:
         self.disable_javascript: bool = disable_javascript
         self.disable_cookies: bool = disable_cookies
         self.options: Optional[dict] = options
+        self.reuse_session: bool = reuse_session
+        self.max_session_uses: int = max_session_uses
+        self.exit_relay: Optional[str] = exit_relay
         self.container_host: str
         self.container_port: str
         self.driver: webdriver.Remote
@@ -97,6 +184,9 @@ class BaseFetcher:
         self._selenium_options: Any
         self._selenium_executor_url: str
         self._desired_capabilities: webdriver.DesiredCapabilities
+        self._session_reused: bool = False
+        self._session_uses: int = 0
+        self._fetch_succeeded: bool = False
 
         # Check if use_proxy_type is set to True but proxy is not passed
         if (self.use_proxy_type is not None) and (self._proxy is None):
@@ -204,6 +294,8 @@ class BaseFetcher:
             options=options,
         )
 
+        self._session_uses = 0
+
         # Set driver timeout
         self.driver.set_page_load_timeout(self.page_timeout)
 
@@ -213,6 +305,200 @@ class BaseFetcher:
         # Log the current status
         self._logger.debug("Connected to the %s container", container_name)
 
+    def _get_session_key(self) -> Tuple:
+        """
+        Returns the settings that are baked into a browser session when it is
+        created. A pooled session can only be reused by fetchers with the same key.
+
+        :return: Settings that identify a browser session
+        :rtype: Tuple
+        """
+        return (
+            self.__class__.__name__,
+            self.use_proxy_type,
+            self._proxy,
+            self.export_har,
+            self.remove_gdpr,
+            self.disable_javascript,
+            self.disable_cookies,
+        )
+
+    @staticmethod
+    def _quit_driver(driver: webdriver.Remote) -> None:
+        """
+        Quits the given driver and closes the browser session
+
+        :param driver: Selenium remote webdriver to quit
+        :type driver: webdriver.Remote
+        """
+        try:
+            driver.quit()
+        except WebDriverException:
+            # We can safely ignore "No active session with ID XXXXX" exceptions
+            pass
+
+    def _reuse_pooled_session(self) -> bool:
+        """
+        Takes over the warm session of the browser container if it was created
+        with the same settings. Should be called by the fetchers after setting
+        the container host and port, so they can skip the browser setup.
+
+        :return: True if a pooled session was taken over
+        :rtype: bool
+        """
+        if not self.reuse_session:
+            return False
+
+        executor_url = self._get_selenium_executor_url(
+            self.container_host, self.container_port
+        )
+
+        with self._session_pool_lock:
+            pooled_session = self._session_pool.pop(executor_url, None)
+
+        if pooled_session is None:
+            return False
+
+        # The container can hold a single session, so make room for the new one.
+        # Sessions kept alive connections through the previous Tor circuit, so
+        # they are reused only for jobs that exit through the same relay.
+        if (
+            pooled_session.key != self._get_session_key()
+            or pooled_session.exit_relay != self.exit_relay
+        ):
+            self._quit_driver(pooled_session.driver)
+            return False
+
+        try:
+            # Make sure the session didn't time out while waiting in the pool
+            pooled_session.driver.set_page_load_timeout(self.page_timeout)
+            pooled_session.driver.set_script_timeout(self.script_timeout)
+
+        except WebDriverException:
+            self._quit_driver(pooled_session.driver)
+            return False
+
+        self.driver = pooled_session.driver
+        self._session_uses = pooled_session.uses
+        self._session_reused = True
+
+        self._logger.debug("Reusing the warm session at %s", executor_url)
+
+        return True
+
+    def _clear_browser_data(self) -> bool:
+        """
+        Clears the cookies and caches of every website the browser visited.
+        Overridden by the fetchers whose browsers support it, the sessions of
+        the other fetchers are not reused.
+
+        :return: True if the browser data was cleared
+        :rtype: bool
+        """
+        return False
+
+    def _clear_firefox_based_browser_data(self) -> bool:
+        """
+        Clears the cookies, caches and idle connections of Firefox based browsers
+        using the privileged browser context
+
+        :return: True if the browser data was cleared
+        :rtype: bool
+        """
+        # pylint: disable=W0212
+        # Remote webdriver doesn't know the Firefox specific commands
+        self.driver.command_executor._commands["SET_CONTEXT"] = (
+            "POST",
+            "/session/$sessionId/moz/context",
+        )
+
+        self.driver.execute("SET_CONTEXT", {"context": "chrome"})
+        try:
+            self.driver.execute_async_script("""
+                var callback = arguments[arguments.length - 1];
+                var flags = Ci.nsIClearDataService.CLEAR_COOKIES
+                    | Ci.nsIClearDataService.CLEAR_NETWORK_CACHE
+                    | Ci.nsIClearDataService.CLEAR_IMAGE_CACHE
+                    | Ci.nsIClearDataService.CLEAR_AUTH_CACHE
+                    | Ci.nsIClearDataService.CLEAR_DOM_STORAGES;
+                Services.clearData.deleteData(flags, () => {
+                    Services.obs.notifyObservers(null, "net:prune-all-connections");
+                    callback();
+                });
+                """)
+        finally:
+            self.driver.execute("SET_CONTEXT", {"context": "content"})
+
+        return True
+
+    def _clear_chromium_based_browser_data(self) -> bool:
+        """
+        Clears the cookies and caches of Chromium based browsers using the
+        DevTools protocol
+
+        :return: True if the browser data was cleared
+        :rtype: bool
+        """
+        # pylint: disable=W0212
+        # Remote webdriver doesn't know the Chromium specific commands
+        self.driver.command_executor._commands["executeCdpCommand"] = (
+            "POST",
+            "/session/$sessionId/goog/cdp/execute",
+        )
+
+        for command in ("Network.clearBrowserCookies", "Network.clearBrowserCache"):
+            self.driver.execute("executeCdpCommand", {"cmd": command, "params": {}})
+
+        return True
+
+    def _reset_session_state(self) -> bool:
+        """
+        Clears the cookies, storage and caches of the browser, closes the
+        windows opened by the website and navigates to a blank page, so that
+        the next fetch starts from a clean state
+
+        :return: True if the state was reset successfully
+        :rtype: bool
+        """
+        try:
+            # Close the windows opened by the website
+            for window_handle in self.driver.window_handles[1:]:
+                self.driver.switch_to.window(window_handle)
+                self.driver.close()
+            self.driver.switch_to.window(self.driver.window_handles[0])
+
+            # Storage is not reachable when JavaScript is disabled
+            if not self.disable_javascript:
+                self.driver.execute_script(
+                    "window.localStorage.clear(); window.sessionStorage.clear();"
+                )
+
+            self.driver.get("about:blank")
+
+            # Cookies and caches of the third parties are left otherwise
+            if not self._clear_browser_data():
+                return False
+
+        except WebDriverException as exception:
+            self._logger.debug("Could not reset the session state: %s", exception)
+            return False
+
+        return True
+
+    def discard_pooled_session(self) -> None:
+        """
+        Quits the warm session kept for this fetcher's browser container, if any
+        """
+        executor_url = self._get_selenium_executor_url(
+            self.container_host, self.container_port
+        )
+
+        with self._session_pool_lock:
+            pooled_session = self._session_pool.pop(executor_url, None)
+
+        if pooled_session is not None:
+            self._quit_driver(pooled_session.driver)
+
     def _check_extension_validity(self, extension: str, endswith: str) -> None:
         """
         Checks if given extension file exists and is valid
@@ -271,18 +557,92 @@ class BaseFetcher:
         """
         chrome_options.add_extension(extension_crx)
 
-    def _setup_common_firefox_based_fetcher(self, ff_profile: FirefoxProfile) -> None:
+    def _get_profile_fingerprint(self, profile_location: Optional[str]) -> Tuple:
         """
-        Performs the common setup procedures for Firefox based fetchers, including Firefox itself
+        Collects the modification times and sizes of the files a Firefox profile
+        is built from, so that cached profiles can be invalidated when they change
+
+        :param profile_location: Directory the profile is copied from, if any
+        :type profile_location: Optional[str]
+        :return: Modification times and sizes of the source files
+        :rtype: Tuple
+        """
+        paths = []
+
+        if self.remove_gdpr:
+            paths.append(self._gdpr_extension_xpi)
+
+        if self.export_har:
+            paths.append(self._har_export_extension_xpi)
+
+        if profile_location is not None:
+            for base, _, files in os.walk(profile_location):
+                paths.extend(
+                    os.path.join(base, file)
+                    for file in files
+                    if file not in ("parent.lock", "lock", ".parentlock")
+                )
+
+        fingerprint = []
+        for path in sorted(paths):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Files might disappear while we are walking the directory
+                continue
+            fingerprint.append((path, stat.st_mtime_ns, stat.st_size))
+
+        return tuple(fingerprint)
+
+    def _get_cached_firefox_profile(
+        self,
+        create_profile: Callable[[], FirefoxProfile],
+        profile_location: Optional[str] = None,
+    ) -> FirefoxProfile:
+        """
+        Returns a prebuilt profile for the current settings. Builds and encodes
+        the profile only if it isn't cached yet or its source files changed.
+
+        :param create_profile: Creates the browser specific profile
+        :type create_profile: Callable[[], FirefoxProfile]
+        :param profile_location: Directory the profile is copied from, defaults to None
+        :type profile_location: Optional[str], optional
+        :return: Prebuilt Firefox profile
+        :rtype: FirefoxProfile
+        """
+        key = self._get_session_key()
+        fingerprint = self._get_profile_fingerprint(profile_location)
+
+        with self._profile_cache_lock:
+            cached_profile = self._profile_cache.get(key, None)
+
+        if cached_profile is not None and cached_profile.fingerprint == fingerprint:
+            return EncodedFirefoxProfile(cached_profile.encoded)
+
+        self._logger.debug("Building a new Firefox profile for %s", key)
+
+        ff_profile = create_profile()
+        self._prepare_firefox_profile(ff_profile)
+        encoded = ff_profile.encoded
+
+        # The profile lives in memory from now on, remove the temporary copy
+        shutil.rmtree(ff_profile.tempfolder or ff_profile.path, ignore_errors=True)
+
+        with self._profile_cache_lock:
+            self._profile_cache[key] = CachedProfile(
+                fingerprint=fingerprint, encoded=encoded
+            )
+
+        return EncodedFirefoxProfile(encoded)
+
+    def _prepare_firefox_profile(self, ff_profile: FirefoxProfile) -> None:
+        """
+        Installs the extensions and sets the preferences that are common to all
+        Firefox based fetchers
 
         :param ff_profile: Firefox Profile created for the webdriver
         :type ff_profile: FirefoxProfile
         """
-        # Get the executor URL
-        self._selenium_executor_url = self._get_selenium_executor_url(
-            self.container_host, self.container_port
-        )
-
         # Install the extensions
         if self.remove_gdpr:
             self._install_xpi_extension(
@@ -346,10 +706,30 @@ class BaseFetcher:
         # Apply the preferences
         ff_profile.update_preferences()
 
+    def _setup_common_firefox_based_fetcher(
+        self,
+        create_profile: Callable[[], FirefoxProfile],
+        profile_location: Optional[str] = None,
+    ) -> None:
+        """
+        Performs the common setup procedures for Firefox based fetchers, including Firefox itself
+
+        :param create_profile: Creates the browser specific profile, only called if a matching profile isn't cached
+        :type create_profile: Callable[[], FirefoxProfile]
+        :param profile_location: Directory the profile is copied from, used for detecting changes, defaults to None
+        :type profile_location: Optional[str], optional
+        """
+        # Get the executor URL
+        self._selenium_executor_url = self._get_selenium_executor_url(
+            self.container_host, self.container_port
+        )
+
         # Set selenium related options for Firefox Browser
         self._desired_capabilities = webdriver.DesiredCapabilities.FIREFOX.copy()
         self._selenium_options = webdriver.FirefoxOptions()
-        self._selenium_options.profile = ff_profile
+        self._selenium_options.profile = self._get_cached_firefox_profile(
+            create_profile, profile_location
+        )
 
         if self.disable_javascript:
             self._selenium_options.preferences.update(
@@ -436,14 +816,14 @@ class BaseFetcher:
         self.page_title = self.driver.title
 
         if self.export_har:
-            har_dict = self.driver.execute_async_script(
-                """
+            har_dict = self.driver.execute_async_script("""
                 var callback = arguments[arguments.length - 1];
                 HAR.triggerExport().then((harLog) => { callback(harLog) });
-                """
-            )
+                """)
             self.page_har = json.dumps({"log": har_dict})
 
+        self._fetch_succeeded = True
+
     def get_selenium_logs(self) -> dict:
         """
         Obtains and returns all kinds of available Selenium logs
@@ -474,11 +854,37 @@ class BaseFetcher:
 
     def close(self) -> None:
         """
-        Clean up before going out of scope
+        Clean up before going out of scope. Returns the session to the pool if
+        it can be reused, otherwise quits the browser.
         """
-        if hasattr(self, "driver"):
-            try:
-                self.driver.quit()
-            except WebDriverException:
-                # We can safely ignore "No active session with ID XXXXX" exceptions
-                pass
+        if not hasattr(self, "driver"):
+            return
+
+        self._session_uses += 1
+
+        # Recycle the sessions that failed or were used too many times
+        if (
+            self.reuse_session
+            and self._fetch_succeeded
+            and self._session_uses < self.max_session_uses
+            and self._reset_session_state()
+        ):
+            executor_url = self._get_selenium_executor_url(
+                self.container_host, self.container_port
+            )
+
+            with self._session_pool_lock:
+                replaced_session = self._session_pool.get(executor_url, None)
+                self._session_pool[executor_url] = PooledSession(
+                    key=self._get_session_key(),
+                    driver=self.driver,
+                    uses=self._session_uses,
+                    exit_relay=self.exit_relay,
+                )
+
+            if replaced_session is not None:
+                self._quit_driver(replaced_session.driver)
+
+            return
+
+        self._quit_driver(self.driver)
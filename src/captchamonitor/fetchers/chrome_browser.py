@@ -22,6 +22,10 @@ class ChromeBrowser(BaseFetcher):
         self.container_host = self._config["docker_chrome_browser_container_name"]
         self.container_port = self._config["docker_chrome_browser_container_port"]
 
+        # Skip preparing a new browser if a warm session can be reused
+        if self._reuse_pooled_session():
+            return
+
         self._desired_capabilities = webdriver.DesiredCapabilities.CHROME.copy()
 
         # Perform the rest of the common setup
@@ -31,6 +35,10 @@ class ChromeBrowser(BaseFetcher):
         """
         Connects Selenium driver to Chrome Browser Container
         """
+        # Already connected to a warm session
+        if self._session_reused:
+            return
+
         self._connect_to_selenium_remote_web_driver(
             container_name="Chrome Browser",
             desired_capabilities=self._desired_capabilities,
@@ -43,6 +51,15 @@ class ChromeBrowser(BaseFetcher):
         # nothing and causes trouble
         time.sleep(1)
 
+    def _clear_browser_data(self) -> bool:
+        """
+        Clears the cookies and caches of Chrome Browser
+
+        :return: True if the browser data was cleared
+        :rtype: bool
+        """
+        return self._clear_chromium_based_browser_data()
+
     def fetch(self) -> None:
         """
         Fetches the given URL using Chrome Browser
@@ -20,16 +20,22 @@ class FirefoxBrowser(BaseFetcher):
         self.container_host = self._config["docker_firefox_browser_container_name"]
         self.container_port = self._config["docker_firefox_browser_container_port"]
 
-        # Create new Firefox profile
-        ff_profile = FirefoxProfile()
+        # Skip preparing a new browser if a warm session can be reused
+        if self._reuse_pooled_session():
+            return
 
-        # Perform the rest of the common setup procedures
-        self._setup_common_firefox_based_fetcher(ff_profile)
+        # Perform the rest of the common setup procedures, a new Firefox
+        # profile is created only if a matching one isn't cached
+        self._setup_common_firefox_based_fetcher(FirefoxProfile)
 
     def connect(self) -> None:
         """
         Connects Selenium driver to Firefox Browser Container
         """
+        # Already connected to a warm session
+        if self._session_reused:
+            return
+
         self._connect_to_selenium_remote_web_driver(
             container_name="Firefox Browser",
             desired_capabilities=self._desired_capabilities,
@@ -37,6 +43,15 @@ class FirefoxBrowser(BaseFetcher):
             options=self._selenium_options,
         )
 
+    def _clear_browser_data(self) -> bool:
+        """
+        Clears the cookies and caches of Firefox Browser
+
+        :return: True if the browser data was cleared
+        :rtype: bool
+        """
+        return self._clear_firefox_based_browser_data()
+
     def fetch(self) -> None:
         """
         Fetches the given URL using Firefox Browser
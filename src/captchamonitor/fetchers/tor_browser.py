@@ -1,4 +1,5 @@
 import os
+from typing import Tuple
 
 from selenium.webdriver.firefox.firefox_profile import FirefoxProfile
 
@@ -16,40 +17,52 @@ class TorBrowser(BaseFetcher):
 
     method_name_in_db = "tor_browser"
 
-    def setup(self) -> None:
+    def __get_security_level(self) -> str:
         """
-        Prepares and starts the Tor Browser for fetching
+        Returns the security level specified in the options
 
-        :raises TorBrowserProfileLocationError: If provided Tor Browser location is not valid
+        :return: Tor Browser security level, "standard" if none was provided
+        :rtype: str
         """
-        self.container_host = self._config["docker_tor_browser_container_name"]
-        self.container_port = self._config["docker_tor_browser_container_port"]
-
-        profile_location = self._config["docker_tor_browser_container_profile_location"]
-
-        # Check if the profile location makes sense
-        if not os.path.isdir(profile_location):
-            raise TorBrowserProfileLocationError
+        security_level = None
+        if self.options is not None:
+            security_level = self.options.get("tbb_security_level", None)
 
         # If no security level is provided, default to "standard"
-        # TODO: Clean this if else mess
-        security_levels = {"safest": 1, "safer": 2, "standard": 4}
-        if self.options is not None:
-            security_level = self.options.get("tbb_security_level", "standard")
-            if security_level is None:
-                security_level = "standard"
-        else:
+        if security_level is None:
             security_level = "standard"
 
-        # Convert security level to integer representation
-        security_level = security_levels[security_level]
+        return str(security_level)
+
+    def _get_session_key(self) -> Tuple:
+        """
+        Extends the session key with the security level, since it is baked into
+        the Tor Browser profile
+
+        :return: Settings that identify a browser session
+        :rtype: Tuple
+        """
+        return super()._get_session_key() + (self.__get_security_level(),)
 
+    @staticmethod
+    def __create_profile(profile_location: str, security_level: int) -> FirefoxProfile:
+        """
+        Creates a copy of the Tor Browser profile and sets the Tor Browser
+        specific preferences
+
+        :param profile_location: Absolute path to the Tor Browser profile
+        :type profile_location: str
+        :param security_level: Integer representation of the security level
+        :type security_level: int
+        :return: The Tor Browser profile
+        :rtype: FirefoxProfile
+        """
         # Obtain the Tor Browser profile and create a copy of it in /tmp
         tb_profile = FirefoxProfile(profile_location)
 
         # Set security level
         tb_profile.set_preference(
-            "extensions.torbutton.security_slider", int(security_level)
+            "extensions.torbutton.security_slider", security_level
         )
 
         # Stop Tor Browser's internal Tor
@@ -65,13 +78,46 @@ class TorBrowser(BaseFetcher):
         # Stop updates
         tb_profile.set_preference("extensions.torbutton.versioncheck_enabled", False)
 
-        # Perform the rest of the common setup procedures
-        self._setup_common_firefox_based_fetcher(tb_profile)
+        return tb_profile
+
+    def setup(self) -> None:
+        """
+        Prepares and starts the Tor Browser for fetching
+
+        :raises TorBrowserProfileLocationError: If provided Tor Browser location is not valid
+        """
+        self.container_host = self._config["docker_tor_browser_container_name"]
+        self.container_port = self._config["docker_tor_browser_container_port"]
+
+        # Skip preparing a new browser if a warm session can be reused
+        if self._reuse_pooled_session():
+            return
+
+        profile_location = self._config["docker_tor_browser_container_profile_location"]
+
+        # Check if the profile location makes sense
+        if not os.path.isdir(profile_location):
+            raise TorBrowserProfileLocationError
+
+        # Convert security level to integer representation
+        security_levels = {"safest": 1, "safer": 2, "standard": 4}
+        security_level = security_levels[self.__get_security_level()]
+
+        # Perform the rest of the common setup procedures, the Tor Browser
+        # profile is copied only if a matching one isn't cached
+        self._setup_common_firefox_based_fetcher(
+            lambda: self.__create_profile(profile_location, security_level),
+            profile_location,
+        )
 
     def connect(self) -> None:
         """
         Connects Selenium driver to Tor Browser Container
         """
+        # Already connected to a warm session
+        if self._session_reused:
+            return
+
         self._connect_to_selenium_remote_web_driver(
             container_name="Tor Browser",
             desired_capabilities=self._desired_capabilities,
@@ -79,6 +125,15 @@ class TorBrowser(BaseFetcher):
             options=self._selenium_options,
         )
 
+    def _clear_browser_data(self) -> bool:
+        """
+        Clears the cookies and caches of Tor Browser
+
+        :return: True if the browser data was cleared
+        :rtype: bool
+        """
+        return self._clear_firefox_based_browser_data()
+
     def fetch(self) -> None:
         """
         Fetches the given URL using Tor Browser
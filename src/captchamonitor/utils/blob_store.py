@@ -0,0 +1,80 @@
+import hashlib
+import logging
+from typing import Tuple, Optional
+
+import zstandard
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects.postgresql import insert
+
+from captchamonitor.utils.models import Blob
+
+
+class BlobStore:
+    """
+    Stores large payloads in the blob table, content-addressed by their SHA-256
+    hash and compressed with zstd
+    """
+
+    def __init__(self, db_session: sessionmaker, compression_level: int = 3) -> None:
+        """
+        Initializes the blob store
+
+        :param db_session: Database session used to connect to the database
+        :type db_session: sessionmaker
+        :param compression_level: zstd compression level, defaults to 3
+        :type compression_level: int
+        """
+        # Private class attributes
+        self.__logger = logging.getLogger(__name__)
+        self.__db_session: sessionmaker = db_session
+        self.__compressor = zstandard.ZstdCompressor(level=compression_level)
+
+    def put(self, payload: Optional[str]) -> Tuple[Optional[str], Optional[int]]:
+        """
+        Stores the given payload unless an identical one is already stored. Does
+        not commit, so the payload is stored together with the row that
+        references it.
+
+        :param payload: The payload to store
+        :type payload: Optional[str]
+        :return: SHA-256 hash and size of the payload, None for both if there is no payload
+        :rtype: Tuple[Optional[str], Optional[int]]
+        """
+        if payload is None:
+            return None, None
+
+        raw_payload = payload.encode("utf-8")
+        sha256 = hashlib.sha256(raw_payload).hexdigest()
+        size = len(raw_payload)
+
+        # Identical payloads are already there, so there is nothing to insert
+        query = (
+            insert(Blob)
+            .values(
+                sha256=sha256,
+                size=size,
+                data=self.__compressor.compress(raw_payload),
+            )
+            .on_conflict_do_nothing(index_elements=[Blob.sha256])
+        )
+        self.__db_session.execute(query)
+
+        self.__logger.debug("Stored a blob of %s bytes with hash %s", size, sha256)
+
+        return sha256, size
+
+    def get(self, sha256: str) -> Optional[str]:
+        """
+        Loads the payload with the given SHA-256 hash
+
+        :param sha256: SHA-256 hash of the payload
+        :type sha256: str
+        :return: The payload, None if there is no such payload
+        :rtype: Optional[str]
+        """
+        blob = self.__db_session.query(Blob).filter(Blob.sha256 == sha256).one_or_none()
+
+        if blob is None:
+            return None
+
+        return blob.load()
@@ -1,11 +1,14 @@
+import io
 import os
+import json
+import lzma
 import time
-import shutil
-import fnmatch
 import logging
 import tarfile
 import tempfile
-from datetime import datetime
+from typing import Any, Set, Dict, List, Tuple, Iterator, Optional, Generator
+from datetime import datetime, timedelta
+from itertools import groupby
 
 import requests
 
@@ -13,6 +16,7 @@ from captchamonitor.utils.exceptions import (
     CollectorDownloadError,
     CollectorConnectionError,
 )
+from captchamonitor.utils.consensus_store import ConsensusStore
 
 
 class Collector:
@@ -21,9 +25,24 @@ class Collector:
     Collector if it doesn't exist
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        max_cache_size: int = 512 * 1024 * 1024,
+        max_cache_age: float = 7 * 24 * 3600,
+        max_archive_age: float = 24 * 3600,
+        compress: bool = False,
+    ) -> None:
         """
         Initialize Collector
+
+        :param max_cache_size: Maximum total size of the cached consensus files in bytes, defaults to 512 MiB
+        :type max_cache_size: int
+        :param max_cache_age: Seconds a cached consensus file is kept after it was last used, defaults to 7 days
+        :type max_cache_age: float
+        :param max_archive_age: Seconds a downloaded archive is kept after it was last used, defaults to 1 day
+        :type max_archive_age: float
+        :param compress: Should I cache the consensus files compressed, defaults to False
+        :type compress: bool
         """
         # Private class attributes
         self.__logger = logging.getLogger(__name__)
@@ -34,16 +53,57 @@ class Collector:
             "https://collector.torproject.org/archive/relay-descriptors/consensuses/"
         )
         self.__consensus_dir: str = "/tmp/cm-consensus"
+        self.__archive_dir: str = "/tmp/cm-consensus-archives"
+        self.__archive_path: Optional[str] = None
+        self.__max_archive_age: float = max_archive_age
+        self.__request_timeout: float = 60
+        self.__chunk_size: int = 1024 * 1024
         self.__num_retries_on_fail: int = 3
         self.__delay_in_seconds_between_retries: int = 3
+        self.__consensus_store: ConsensusStore = ConsensusStore(
+            self.__consensus_dir,
+            max_size=max_cache_size,
+            max_age=max_cache_age,
+            compress=compress,
+        )
+
+        # Create the archive directory if doesn't exist
+        os.makedirs(self.__archive_dir, exist_ok=True)
+
+        self.__remove_expired_archives()
+
+    def __remove_expired_archives(self) -> None:
+        """
+        Removes the archives, their member indexes and the partial downloads
+        that weren't used within the maximum archive age. Each instance only
+        removes the archive it used last, so the ones left behind by earlier
+        runs are removed here.
+        """
+        expiry = time.time() - self.__max_archive_age
+
+        try:
+            file_names = os.listdir(self.__archive_dir)
 
-        # Remove if a file with same name was created earlier
-        if os.path.isfile(self.__consensus_dir):
-            os.remove(self.__consensus_dir)
+        except OSError as exception:
+            self.__logger.debug("Cannot list the archive directory: %s", exception)
+            return
 
-        # Create the consensus directory if doesn't exist'
-        if not os.path.isdir(self.__consensus_dir):
-            os.makedirs(self.__consensus_dir)
+        for file_name in file_names:
+            file_path = os.path.join(self.__archive_dir, file_name)
+
+            # An index is removed together with its archive, unless the
+            # archive is already gone
+            if file_name.endswith(".index") and os.path.isfile(file_path[:-6]):
+                continue
+
+            try:
+                if os.path.getmtime(file_path) < expiry:
+                    self.__remove_archive(file_path)
+
+            except OSError as exception:
+                self.__logger.debug(
+                    "Cannot remove expired archive %s: %s", file_path, exception
+                )
 
     @staticmethod
     def __get_date_str(consensus_date: datetime) -> str:
@@ -69,14 +129,16 @@ class Collector:
 
         self.__logger.debug("Using the list from recent consensuses")
 
-        file_name = f"{date_str}-consensus"
-        url = f"{self.__url_consensuses_recent}{file_name}"
-        file_path = os.path.join(self.__consensus_dir, file_name)
+        url = f"{self.__url_consensuses_recent}{date_str}-consensus"
 
         try:
-            # Download the consensus file directly to the consensus directory
-            with open(file_path, "wb") as file:
-                file.write(requests.get(url).content)
+            # Stream the consensus file directly to the consensus store
+            with requests.get(
+                url, stream=True, timeout=self.__request_timeout
+            ) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                self.__consensus_store.put(date_str, response.raw)
 
         except Exception as exception:
             self.__logger.debug(
@@ -85,79 +147,332 @@ class Collector:
             )
             raise CollectorDownloadError from exception
 
+    def __download_archive(self, archive_name: str) -> str:
+        """
+        Downloads the given consensus archive to the disk in chunks, unless it
+        was downloaded before. Only the archive this instance used most
+        recently is kept, archives used by other instances aren't touched
+        until they expire.
+
+        :param archive_name: Name of the archive, like consensuses-2021-01.tar.xz
+        :type archive_name: str
+        :return: Path to the downloaded archive
+        :rtype: str
+        """
+        archive_path = os.path.join(self.__archive_dir, archive_name)
+
+        if os.path.isfile(archive_path):
+            # Mark the archive as used, so that it doesn't expire while in use
+            os.utime(archive_path)
+        else:
+            self.__fetch_archive(archive_name, archive_path)
+
+        # Remove the archive of another month this instance used before
+        if self.__archive_path not in (None, archive_path):
+            self.__remove_archive(str(self.__archive_path))
+        self.__archive_path = archive_path
+
+        return archive_path
+
+    def __fetch_archive(self, archive_name: str, archive_path: str) -> None:
+        """
+        Streams the given consensus archive from Collector to the given path
+
+        :param archive_name: Name of the archive, like consensuses-2021-01.tar.xz
+        :type archive_name: str
+        :param archive_path: Path to save the archive at
+        :type archive_path: str
+        :raises CollectorDownloadError: If cannot download the archive
+        """
+        url = f"{self.__url_consensuses_archive}{archive_name}"
+        file_descriptor, temp_file = tempfile.mkstemp(
+            dir=self.__archive_dir, prefix="."
+        )
+
+        try:
+            with os.fdopen(file_descriptor, "wb") as file, requests.get(
+                url, stream=True, timeout=self.__request_timeout
+            ) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=self.__chunk_size):
+                    file.write(chunk)
+
+            os.replace(temp_file, archive_path)
+
+        except Exception as exception:
+            self.__logger.debug(
+                "Cannot download requested consensus file: %s",
+                exception,
+            )
+            os.unlink(temp_file)
+            raise CollectorDownloadError from exception
+
+    @staticmethod
+    def __remove_archive(archive_path: str) -> None:
+        """
+        Removes the given archive and its member index
+
+        :param archive_path: Path to the archive
+        :type archive_path: str
+        """
+        for file_path in (archive_path, f"{archive_path}.index"):
+            try:
+                os.remove(file_path)
+
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def __load_archive_index(archive_path: str) -> Dict[str, Any]:
+        """
+        Loads the member index of the given archive
+
+        :param archive_path: Path to the archive
+        :type archive_path: str
+        :return: Whether the index is complete and the offset and size of each member, by valid-after hour
+        :rtype: Dict[str, Any]
+        """
+        try:
+            with open(f"{archive_path}.index", "r", encoding="utf-8") as file:
+                return dict(json.load(file))
+
+        except (OSError, ValueError):
+            return {"complete": False, "members": {}}
+
+    @staticmethod
+    def __save_archive_index(archive_path: str, archive_index: Dict[str, Any]) -> None:
+        """
+        Saves the member index of the given archive
+
+        :param archive_path: Path to the archive
+        :type archive_path: str
+        :param archive_index: The member index
+        :type archive_index: Dict[str, Any]
+        """
+        with open(f"{archive_path}.index", "w", encoding="utf-8") as file:
+            json.dump(archive_index, file)
+
+    def __iterate_archive(
+        self, archive_path: str, date_strs: Set[str]
+    ) -> Generator[str, None, None]:
+        """
+        Extracts the consensuses with the given valid-after hours from the given
+        archive to the consensus store, yielding each hour as soon as its
+        consensus is stored. The members are read while the archive is
+        streamed, nothing else is extracted. Offsets of the members that were
+        passed are indexed, so that later lookups can seek directly to them.
+
+        :param archive_path: Path to the archive
+        :type archive_path: str
+        :param date_strs: Valid-after hours of the consensuses to extract
+        :type date_strs: Set[str]
+        :yield: Valid-after hours of the extracted consensuses, in archive order
+        :rtype: Generator[str, None, None]
+        """
+        archive_index = self.__load_archive_index(archive_path)
+        members = archive_index["members"]
+        remaining = set(date_strs)
+
+        # Seek to the indexed members, in order so that the archive is only
+        # decompressed once
+        indexed = sorted(remaining & members.keys(), key=lambda key: members[key][0])
+        if indexed:
+            with lzma.open(archive_path) as archive:
+                for date_str in indexed:
+                    offset, size = members[date_str]
+                    archive.seek(offset)
+                    self.__consensus_store.put(date_str, io.BytesIO(archive.read(size)))
+                    remaining.discard(date_str)
+                    yield date_str
+
+        if not remaining or archive_index["complete"]:
+            return
+
+        try:
+            with tarfile.open(archive_path, "r|xz") as archive:
+                for member in archive:
+                    match = ConsensusStore.file_name_pattern.match(
+                        os.path.basename(member.name)
+                    )
+                    if not member.isfile() or match is None:
+                        continue
+
+                    date_str = match.group(1)
+                    members[date_str] = (member.offset_data, member.size)
+
+                    if date_str in remaining:
+                        consensus = archive.extractfile(member)
+                        if consensus is None:
+                            continue
+
+                        self.__consensus_store.put(date_str, consensus)
+                        remaining.discard(date_str)
+                        yield date_str
+
+                        if not remaining:
+                            break
+                else:
+                    archive_index["complete"] = True
+
+        finally:
+            # Also keep the offsets if the caller stopped early
+            self.__save_archive_index(archive_path, archive_index)
+
+    def __extract_from_archive(
+        self, archive_path: str, date_strs: Set[str]
+    ) -> Set[str]:
+        """
+        Extracts the consensuses with the given valid-after hours from the given
+        archive to the consensus store
+
+        :param archive_path: Path to the archive
+        :type archive_path: str
+        :param date_strs: Valid-after hours of the consensuses to extract
+        :type date_strs: Set[str]
+        :return: Valid-after hours of the extracted consensuses
+        :rtype: Set[str]
+        """
+        return set(self.__iterate_archive(archive_path, date_strs))
+
+    @staticmethod
+    def __get_archive_name(consensus_date: datetime) -> str:
+        """
+        Gets the name of the archive that contains the consensus of the given date
+
+        :param consensus_date: The date for valid-after timestamp of the consensus document
+        :type consensus_date: datetime
+        :return: Name of the archive, like consensuses-2021-01.tar.xz
+        :rtype: str
+        """
+        return f"consensuses-{consensus_date.strftime('%Y-%m')}.tar.xz"
+
+    def __get_recent_consensuses(self) -> str:
+        """
+        Gets the listing of the Collector's recent consensuses page
+
+        :raises CollectorConnectionError: If cannot connect to Collector
+        :return: The listing
+        :rtype: str
+        """
+        try:
+            return str(
+                requests.get(
+                    self.__url_consensuses_recent, timeout=self.__request_timeout
+                ).text
+            )
+
+        except Exception as exception:
+            self.__logger.debug(
+                "Cannot connect to Collector: %s",
+                exception,
+            )
+            raise CollectorConnectionError from exception
+
+    def __open_archive_range(
+        self, consensus_date: datetime, consensus_dates: List[datetime]
+    ) -> Generator[str, None, None]:
+        """
+        Downloads the archive that contains the consensus of the given date and
+        starts extracting the consensuses of the given dates from then on that
+        aren't cached yet
+
+        :param consensus_date: The date for valid-after timestamp of the consensus document
+        :type consensus_date: datetime
+        :param consensus_dates: Valid-after dates of the requested consensus documents in the same month
+        :type consensus_dates: List[datetime]
+        :return: Valid-after hours of the extracted consensuses, in archive order
+        :rtype: Generator[str, None, None]
+        """
+        archive_path = self.__download_archive(self.__get_archive_name(consensus_date))
+
+        date_strs = {
+            self.__get_date_str(date)
+            for date in consensus_dates
+            if date >= consensus_date
+        }
+        date_strs = {
+            date_str for date_str in date_strs if date_str not in self.__consensus_store
+        }
+
+        return self.__iterate_archive(archive_path, date_strs)
+
+    @staticmethod
+    def __read_archive_until(
+        archive_members: Generator[str, None, None], date_str: str
+    ) -> None:
+        """
+        Reads the archive only until the consensus of the given hour is stored.
+        Hours stored on the way are found in the store later, whatever order
+        the members are in.
+
+        :param archive_members: Valid-after hours of the extracted consensuses, in archive order
+        :type archive_members: Generator[str, None, None]
+        :param date_str: Valid-after hour of the consensus to wait for
+        :type date_str: str
+        """
+        for member in archive_members:
+            if member == date_str:
+                break
+
+    def __iterate_month(
+        self, consensus_dates: List[datetime]
+    ) -> Iterator[Tuple[datetime, str]]:
+        """
+        Gets the consensus files of the given dates within the same month, in
+        order, downloading the missing ones
+
+        :param consensus_dates: Valid-after dates of the consensus documents, in order
+        :type consensus_dates: List[datetime]
+        :yield: Valid-after dates and absolute paths to the consensus files
+        :rtype: Iterator[Tuple[datetime, str]]
+        """
+        recent_consensuses: Optional[str] = None
+        archive_members: Optional[Generator[str, None, None]] = None
+
+        try:
+            for consensus_date in consensus_dates:
+                date_str = self.__get_date_str(consensus_date)
+
+                if date_str not in self.__consensus_store:
+                    if recent_consensuses is None:
+                        recent_consensuses = self.__get_recent_consensuses()
+
+                    if date_str in recent_consensuses:
+                        self.__download_consensus_from_recent(consensus_date)
+
+                    else:
+                        if archive_members is None:
+                            archive_members = self.__open_archive_range(
+                                consensus_date, consensus_dates
+                            )
+
+                        self.__read_archive_until(archive_members, date_str)
+
+                consensus_file = self.__consensus_store.get(date_str)
+                if consensus_file is None:
+                    self.__logger.warning(
+                        "Could not find the consensus file for %s", date_str
+                    )
+                    continue
+
+                yield consensus_date, consensus_file
+
+        finally:
+            if archive_members is not None:
+                archive_members.close()
+
     def __download_consensus_from_archive(self, consensus_date: datetime) -> None:
         """
         Downloads from the Collector's archive page
 
         :param consensus_date: The date for valid-after timestamp of the consensus document
         :type consensus_date: datetime
-        :raises CollectorDownloadError: If cannot connect to Collector
         """
         self.__logger.debug("Using the list from consensuses archive")
 
-        # Create a temporary directory and download the consensus archive
-        with tempfile.TemporaryDirectory() as download_dir:
-            folder_name = "consensuses-%s-%s" % (
-                consensus_date.strftime("%Y"),
-                consensus_date.strftime("%m"),
-            )
-            archive_name = folder_name + ".tar.xz"
-            archive_path = os.path.join(download_dir, archive_name)
-            extracted_path = os.path.join(download_dir, folder_name)
-            url = f"{self.__url_consensuses_archive}{archive_name}"
-
-            try:
-                # Download the consensus archive to a temporary location
-                with open(archive_path, "wb") as file:
-                    file.write(requests.get(url).content)
+        archive_path = self.__download_archive(self.__get_archive_name(consensus_date))
 
-            except Exception as exception:
-                self.__logger.debug(
-                    "Cannot download requested consensus file: %s",
-                    exception,
-                )
-                raise CollectorDownloadError from exception
-
-            # Extract the archive
-            with tarfile.open(archive_path) as archive:
-                def is_within_directory(directory, target):
-                    
-                    abs_directory = os.path.abspath(directory)
-                    abs_target = os.path.abspath(target)
-                
-                    prefix = os.path.commonprefix([abs_directory, abs_target])
-                    
-                    return prefix == abs_directory
-                
-                def safe_extract(tar, path=".", members=None, *, numeric_owner=False):
-                
-                    for member in tar.getmembers():
-                        member_path = os.path.join(path, member.name)
-                        if not is_within_directory(path, member_path):
-                            raise Exception("Attempted Path Traversal in Tar File")
-                
-                    tar.extractall(path, members, numeric_owner=numeric_owner) 
-                    
-                
-                safe_extract(archive, download_dir)
-
-            # Recursively move files
-            for day_folder in os.listdir(extracted_path):
-                for consensus_file in os.listdir(
-                    os.path.join(extracted_path, day_folder)
-                ):
-                    try:
-                        shutil.move(
-                            os.path.join(extracted_path, day_folder, consensus_file),
-                            self.__consensus_dir,
-                        )
-
-                    except shutil.Error as exception:
-                        # We can simply skip already existing files
-                        self.__logger.debug(
-                            "This consensus file already exists: %s",
-                            exception,
-                        )
+        self.__extract_from_archive(archive_path, {self.__get_date_str(consensus_date)})
 
     def get_consensus(self, consensus_date: datetime) -> str:
         """
@@ -174,9 +489,9 @@ class Collector:
         # Try multiple times
         for _ in range(self.__num_retries_on_fail):
             # Find the requested consensus from the cache
-            for file in os.listdir(self.__consensus_dir):
-                if fnmatch.fnmatch(file, "*" + date_str + "*"):
-                    return os.path.join(self.__consensus_dir, file)
+            consensus_file = self.__consensus_store.get(date_str)
+            if consensus_file is not None:
+                return consensus_file
 
             # If we are here, it means that the requested consensus is not cached yet
             self.__logger.debug(
@@ -196,26 +511,43 @@ class Collector:
 
         :param consensus_date: The date for valid-after timestamp of the consensus document
         :type consensus_date: datetime
-        :raises CollectorConnectionError: If cannot connect to Collector
         """
         date_str = self.__get_date_str(consensus_date)
 
-        try:
-            # Check for recent consensuses first
-            recent_consensuses = requests.get(self.__url_consensuses_recent).text
-
-        except Exception as exception:
-            self.__logger.debug(
-                "Cannot connect to Collector: %s",
-                exception,
-            )
-            raise CollectorConnectionError from exception
+        # Check for recent consensuses first
+        recent_consensuses = self.__get_recent_consensuses()
 
         if date_str in recent_consensuses:
             self.__download_consensus_from_recent(consensus_date)
         else:
             self.__download_consensus_from_archive(consensus_date)
 
+    def iterate_consensuses(
+        self, start: datetime, end: datetime
+    ) -> Iterator[Tuple[datetime, str]]:
+        """
+        Gets the consensus files of every hour between the given dates, in
+        order. Cached consensuses are used as they are. Missing consensuses are
+        downloaded from the recent page, or extracted from the monthly archives
+        while they are streamed, so each archive is read at most once. Hours
+        that aren't in the archives are skipped.
+
+        :param start: Valid-after date of the first consensus document
+        :type start: datetime
+        :param end: Valid-after date of the last consensus document, inclusive
+        :type end: datetime
+        :yield: Valid-after dates and absolute paths to the consensus files
+        :rtype: Iterator[Tuple[datetime, str]]
+        """
+        consensus_dates = []
+        consensus_date = start.replace(minute=0, second=0, microsecond=0)
+        while consensus_date <= end:
+            consensus_dates.append(consensus_date)
+            consensus_date += timedelta(hours=1)
+
+        for _, month_dates in groupby(consensus_dates, key=self.__get_archive_name):
+            yield from self.__iterate_month(list(month_dates))
+
     def remove_consensus_file(self, consensus_date: datetime) -> None:
         """
         Finds the consensus document that was published at given date and deletes it
@@ -225,12 +557,4 @@ class Collector:
         """
         date_str = self.__get_date_str(consensus_date)
 
-        if os.path.exists(self.__consensus_dir):
-            file = os.path.join(self.__consensus_dir, f"{date_str}-consensus")
-            try:
-                os.remove(file)
-
-            except FileNotFoundError:
-                pass
-
-            self.__logger.debug("Removed the consensus file %s", file)
+        self.__consensus_store.remove(date_str)
@@ -33,9 +33,14 @@ ENV_VARS = {
     "asset_gdpr_extension_xpi_id": "CM_ASSET_GDPR_EXTENSION_XPI_ID",
     "asset_gdpr_extension_crx": "CM_ASSET_GDPR_EXTENSION_CRX",
     "job_queue_delay": "CM_JOB_QUEUE_DELAY",
+    "job_claim_batch_size": "CM_JOB_CLAIM_BATCH_SIZE",
+    "job_lease_duration": "CM_JOB_LEASE_DURATION",
+    "analyzer_worker_count": "CM_ANALYZER_WORKER_COUNT",
     "fixture_location": "CM_FIXTURE_LOCATION",
     "dashboard_location": "CM_DASHBOARD_LOCATION",
     "dashboard_www_location": "CM_DASHBOARD_WWW_LOCATION",
+    "dashboard_graph_format": "CM_DASHBOARD_GRAPH_FORMAT",
+    "dashboard_graph_worker_count": "CM_DASHBOARD_GRAPH_WORKER_COUNT",
 }
 
 
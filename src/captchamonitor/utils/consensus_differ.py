@@ -0,0 +1,86 @@
+from typing import Dict, List, Iterable
+from dataclasses import field, dataclass
+
+from captchamonitor.utils.consensus_parser import ConsensusRelayEntry
+
+
+@dataclass
+class ConsensusDiff:
+    """
+    Stores the relays that differ between two consensuses
+
+    :param added: Fingerprints of the relays that are only in the new consensus
+    :type added: List[str]
+    :param removed: Fingerprints of the relays that are only in the old consensus
+    :type removed: List[str]
+    :param changed: Fingerprints of the relays whose entries differ between the consensuses
+    :type changed: List[str]
+    """
+
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+
+
+class ConsensusDiffer:
+    """
+    Compares the relay entries of two consensuses using a signature per relay,
+    so that the previous consensus doesn't need to be kept around but only
+    its signatures. The signature covers the relay's descriptor digest, which
+    changes whenever the relay publishes new details, and its addresses.
+    """
+
+    @staticmethod
+    def get_signature(relay_entry: ConsensusRelayEntry) -> str:
+        """
+        Gets the signature of the given relay entry
+
+        :param relay_entry: The relay entry
+        :type relay_entry: ConsensusRelayEntry
+        :return: The signature
+        :rtype: str
+        """
+        return f"{relay_entry.digest} {relay_entry.IP} {relay_entry.IPv6 or ''}"
+
+    @classmethod
+    def get_signatures(
+        cls, relay_entries: Iterable[ConsensusRelayEntry]
+    ) -> Dict[str, str]:
+        """
+        Gets the signatures of the given relay entries
+
+        :param relay_entries: The relay entries
+        :type relay_entries: Iterable[ConsensusRelayEntry]
+        :return: Signatures by fingerprint
+        :rtype: Dict[str, str]
+        """
+        return {
+            relay_entry.fingerprint: cls.get_signature(relay_entry)
+            for relay_entry in relay_entries
+        }
+
+    @staticmethod
+    def diff(previous: Dict[str, str], current: Dict[str, str]) -> ConsensusDiff:
+        """
+        Compares the signatures of two consensuses
+
+        :param previous: Signatures of the old consensus by fingerprint
+        :type previous: Dict[str, str]
+        :param current: Signatures of the new consensus by fingerprint
+        :type current: Dict[str, str]
+        :return: The relays that differ
+        :rtype: ConsensusDiff
+        """
+        consensus_diff = ConsensusDiff()
+
+        for fingerprint, signature in current.items():
+            if fingerprint not in previous:
+                consensus_diff.added.append(fingerprint)
+            elif previous[fingerprint] != signature:
+                consensus_diff.changed.append(fingerprint)
+
+        consensus_diff.removed = [
+            fingerprint for fingerprint in previous if fingerprint not in current
+        ]
+
+        return consensus_diff
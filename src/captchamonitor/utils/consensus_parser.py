@@ -1,29 +1,39 @@
+import os
+import sys
+import base64
 import logging
-from typing import Dict, List, Optional
+import calendar
+from array import array
+from typing import Dict, List, Tuple, Iterator, Optional
 from datetime import datetime
-from dataclasses import dataclass
-
-import stem.descriptor
+from operator import mul, truediv
+from itertools import repeat
 
 from captchamonitor.utils.exceptions import (
     ConsensusParserInvalidDocument,
     ConsensusParserFileNotFoundError,
 )
+from captchamonitor.utils.consensus_store import open_consensus_file
 
 
-@dataclass
 class ConsensusRelayEntry:
     """
     Stores a router/relay/node entry
     See https://gitweb.torproject.org/torspec.git/tree/dir-spec.txt#n2337 for
     exact details
 
+    Entries are kept compact since historical studies keep thousands of them
+    per consensus in memory: attributes are slotted, repeated strings are
+    interned, known flags are stored as a bitmask, the publication time is
+    stored as seconds since the epoch, and the fingerprint is only computed
+    when it is first accessed.
+
     :param nickname: OR's nickname
     :type nickname: str
     :param identity: hash of relay's identity key, encoded in base64, with trailing equals sign(s) removed
     :type identity: str
-    :param fingerprint: HEX version of the relay's identity key
-    :type fingerprint: str
+    :param fingerprint: HEX version of the relay's identity key, always derived from identity
+    :type fingerprint: str, optional
     :param digest:  hash of relay's most recent descriptor as signed (that is, not including the signature) by the RSA identity key, encoded in base64
     :type digest: str
     :param publication: publication time of relay's most recent descriptor, in the form YYYY-MM-DD HH:MM:SS, in UTC
@@ -52,213 +62,486 @@ class ConsensusRelayEntry:
     :type exit_probability: float, optional
     :param consensus_weight_fraction: relay's consensus weight fraction
     :type consensus_weight_fraction: float, optional
+    :param captcha_percentage: percentage of the fetches over this relay that got a CAPTCHA
+    :type captcha_percentage: float, optional
 
     :returns: ConsensusRelayEntry object
     """
 
-    nickname: str
-    identity: str
-    digest: str
-    publication: datetime
-    IP: str
-    IPv6: Optional[str]
-    IPv6ORPort: Optional[str]
-    is_exit: bool
-    ORPort: int
-    DirPort: int
-    bandwidth: float
-    flags: List
-    fingerprint: Optional[str] = None
-    guard_probability: float = 0.0
-    middle_probability: float = 0.0
-    exit_probability: float = 0.0
-    consensus_weight_fraction: float = 0.0
-    captcha_percentage: float = 0.0
-
-    def __post_init__(self) -> None:
-        # pylint: disable=W0212
-        self.fingerprint = stem.descriptor.router_status_entry._base64_to_hex(
-            self.identity
+    # pylint: disable=R0902,C0103
+
+    __slots__ = (
+        "nickname",
+        "identity",
+        "digest",
+        "publication_timestamp",
+        "IP",
+        "IPv6",
+        "IPv6ORPort",
+        "is_exit",
+        "ORPort",
+        "DirPort",
+        "bandwidth",
+        "flag_bits",
+        "unknown_flags",
+        "guard_probability",
+        "middle_probability",
+        "exit_probability",
+        "consensus_weight_fraction",
+        "captcha_percentage",
+        "__fingerprint",
+    )
+
+    # Bit of each flag in flag_bits, covers every flag dir-spec ever defined.
+    # The table never changes, so that the bits mean the same in every
+    # process. Flags that aren't listed here are kept in unknown_flags.
+    flag_bit: Dict[str, int] = {
+        flag: 1 << bit
+        for bit, flag in enumerate(
+            (
+                "Authority",
+                "BadDirectory",
+                "BadExit",
+                "Exit",
+                "Fast",
+                "Guard",
+                "HSDir",
+                "MiddleOnly",
+                "Named",
+                "NoEdConsensus",
+                "Running",
+                "Stable",
+                "StaleDesc",
+                "Sybil",
+                "Unnamed",
+                "V2Dir",
+                "Valid",
+            )
+        )
+    }
+
+    def __init__(  # pylint: disable=R0913,R0914,W0613
+        self,
+        nickname: str,
+        identity: str,
+        digest: str,
+        publication: datetime,
+        IP: str,
+        IPv6: Optional[str],
+        IPv6ORPort: Optional[str],
+        is_exit: bool,
+        ORPort: int,
+        DirPort: int,
+        bandwidth: float,
+        flags: List,
+        fingerprint: Optional[str] = None,
+        guard_probability: float = 0.0,
+        middle_probability: float = 0.0,
+        exit_probability: float = 0.0,
+        consensus_weight_fraction: float = 0.0,
+        captcha_percentage: float = 0.0,
+    ) -> None:
+        self.nickname: str = sys.intern(nickname)
+        self.identity: str = sys.intern(identity)
+        self.digest: str = digest
+        self.publication = publication
+        self.IP: str = sys.intern(IP)
+        self.IPv6: Optional[str] = None if IPv6 is None else sys.intern(IPv6)
+        self.IPv6ORPort: Optional[str] = IPv6ORPort
+        self.is_exit: bool = is_exit
+        self.ORPort: int = ORPort
+        self.DirPort: int = DirPort
+        self.bandwidth: float = bandwidth
+        self.flags = flags
+        self.guard_probability: float = guard_probability
+        self.middle_probability: float = middle_probability
+        self.exit_probability: float = exit_probability
+        self.consensus_weight_fraction: float = consensus_weight_fraction
+        self.captcha_percentage: float = captcha_percentage
+        self.__fingerprint: Optional[str] = None
+
+    @classmethod
+    def get_flag_bits(cls, flags: List[str]) -> int:
+        """
+        Converts the given flags to a bitmask, flags missing from flag_bit
+        are left out
+
+        :param flags: List of flags
+        :type flags: List[str]
+        :return: The bitmask
+        :rtype: int
+        """
+        flag_bits = 0
+        for flag in flags:
+            flag_bits |= cls.flag_bit.get(flag, 0)
+
+        return flag_bits
+
+    def has_flag(self, flag: str) -> bool:
+        """
+        Checks if the relay has the given flag
+
+        :param flag: The flag
+        :type flag: str
+        :return: True if the relay has the flag
+        :rtype: bool
+        """
+        if flag in self.flag_bit:
+            return bool(self.flag_bits & self.flag_bit[flag])
+
+        return flag in self.unknown_flags
+
+    @property
+    def flags(self) -> List[str]:
+        """
+        Relay's flags, in alphabetical order like in the consensus
+
+        :return: List of flags
+        :rtype: List[str]
+        """
+        known_flags = [
+            flag for flag, bit in self.flag_bit.items() if self.flag_bits & bit
+        ]
+
+        return sorted(known_flags + list(self.unknown_flags))
+
+    @flags.setter
+    def flags(self, flags: Optional[List[str]]) -> None:
+        flags = flags or []
+        self.flag_bits = self.get_flag_bits(flags)
+        self.unknown_flags: Tuple[str, ...] = tuple(
+            sorted(sys.intern(flag) for flag in flags if flag not in self.flag_bit)
+        )
+
+    @property
+    def publication(self) -> datetime:
+        """
+        Publication time of relay's most recent descriptor, in UTC
+
+        :return: The publication time
+        :rtype: datetime
+        """
+        return datetime.utcfromtimestamp(self.publication_timestamp)
+
+    @publication.setter
+    def publication(self, publication: datetime) -> None:
+        self.publication_timestamp = calendar.timegm(publication.timetuple())
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        HEX version of the relay's identity key, computed on first access
+
+        :return: The fingerprint
+        :rtype: str
+        """
+        if self.__fingerprint is None:
+            padding = "=" * (-len(self.identity) % 4)
+            self.__fingerprint = sys.intern(
+                base64.b64decode(self.identity + padding).hex().upper()
+            )
+
+        return self.__fingerprint
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ConsensusRelayEntry):
+            return NotImplemented
+
+        return all(
+            getattr(self, name) == getattr(other, name)
+            for name in self.__slots__
+            if not name.startswith("__")
+        )
+
+    def __repr__(self) -> str:
+        return f"ConsensusRelayEntry(nickname={self.nickname!r}, fingerprint={self.fingerprint!r}, flags={self.flags!r})"
+
+
+class ConsensusRelayTable:
+    """
+    Stores the columns of the relay entries that path selection depends on in
+    compact arrays, so that the path selection probabilities of all relays are
+    calculated with a few passes over the columns instead of per relay
+    dictionary lookups
+    """
+
+    # Relay classes, used as indexes to the weight multipliers
+    other, exit_only, guard_only, guard_and_exit = range(4)
+
+    # Bandwidth weights used for path selection
+    weight_keys = ("Wgg", "Wgd", "Wmg", "Wmm", "Wme", "Wmd", "Wee", "Wed")
+
+    def __init__(self, relay_entries: List[ConsensusRelayEntry]) -> None:
+        """
+        Builds the columns from the given relay entries
+
+        :param relay_entries: List of relay entries
+        :type relay_entries: List[ConsensusRelayEntry]
+        """
+        # Public class attributes
+        self.bandwidth: array = array("d")
+        self.relay_class: array = array("B")
+
+        flag_bit = ConsensusRelayEntry.flag_bit
+        running, exit_, bad_exit, guard = (
+            flag_bit["Running"],
+            flag_bit["Exit"],
+            flag_bit["BadExit"],
+            flag_bit["Guard"],
+        )
+
+        for relay in relay_entries:
+            flag_bits = relay.flag_bits
+
+            # Relays that are not running are not selected at all
+            if not flag_bits & running:
+                self.bandwidth.append(0.0)
+                self.relay_class.append(self.other)
+                continue
+
+            is_exit = bool(flag_bits & exit_) and not flag_bits & bad_exit
+            is_guard = bool(flag_bits & guard)
+            self.bandwidth.append(float(relay.bandwidth))
+            self.relay_class.append(is_guard * 2 + is_exit)
+
+    def __weigh(self, multipliers: List[float]) -> array:
+        """
+        Multiplies the bandwidth of each relay with the multiplier of its class
+
+        :param multipliers: Weight multiplier of each relay class
+        :type multipliers: List[float]
+        :return: Weight of each relay
+        :rtype: array
+        """
+        return array(
+            "d",
+            map(mul, self.bandwidth, map(multipliers.__getitem__, self.relay_class)),
         )
 
+    @staticmethod
+    def __normalize(weights: array) -> array:
+        """
+        Divides the weights by their total
+
+        :param weights: Weight of each relay
+        :type weights: array
+        :return: Fraction of the total weight of each relay
+        :rtype: array
+        """
+        total = sum(weights)
+
+        if total == 0:
+            return array("d", bytes(len(weights) * weights.itemsize))
+
+        return array("d", map(truediv, weights, repeat(total, len(weights))))
+
+    def path_selection_probabilities(self, bandwidth_weights: Dict) -> Dict[str, array]:
+        """
+        Calculates guard, middle, and exit probabilities and consensus weight
+        fractions of the relays
+
+        Adapted from the function called calculatePathSelectionProbabilities() in
+        https://gitweb.torproject.org/onionoo.git/tree/src/main/java/org/torproject/metrics/onionoo/updater/NodeDetailsStatusUpdater.java#n597
+
+        :param bandwidth_weights: A dictionary of bandwidth weights parsed from consensus
+        :type bandwidth_weights: Dict
+        :return: Columns of consensus_weight_fraction, guard_probability, middle_probability, and exit_probability, in the order of the relay entries
+        :rtype: Dict[str, array]
+        """
+        weights = {key: bandwidth_weights[key] / 10000.0 for key in self.weight_keys}
+
+        # Multipliers for other, exit only, guard only, and guard and exit relays
+        guard_multipliers = [0.0, 0.0, weights["Wgg"], weights["Wgd"]]
+        middle_multipliers = [
+            weights["Wmm"],
+            weights["Wme"],
+            weights["Wmg"],
+            weights["Wmd"],
+        ]
+        exit_multipliers = [0.0, weights["Wee"], 0.0, weights["Wed"]]
+
+        return {
+            "consensus_weight_fraction": self.__normalize(self.bandwidth),
+            "guard_probability": self.__normalize(self.__weigh(guard_multipliers)),
+            "middle_probability": self.__normalize(self.__weigh(middle_multipliers)),
+            "exit_probability": self.__normalize(self.__weigh(exit_multipliers)),
+        }
+
 
 class ConsensusV3Parser:
     """
-    Parses a given V3 consensus file
+    Parses a given V3 consensus file in a single pass over its lines, without
+    reading the whole file into memory
     """
 
-    def __init__(self, consensus_file: str) -> None:
+    def __init__(self, consensus_file: str, lazy: bool = False) -> None:
         """
         Initializes the parser
 
         :param consensus_file: The absolute path to the consensus file
         :type consensus_file: str
+        :param lazy: Should I leave parsing to iterate_relay_entries instead of parsing all relay entries now, defaults to False
+        :type lazy: bool
         :raises ConsensusParserFileNotFoundError: If given file does not exist
         """
         # Public class attributes
         self.valid_after: datetime
         self.fresh_until: datetime
-        self.bandwidth_weights: Dict
-        self.relay_entries: List[ConsensusRelayEntry]
+        self.bandwidth_weights: Dict = {}
+        self.relay_entries: List[ConsensusRelayEntry] = []
 
         # Private class attributes
         self.__logger = logging.getLogger(__name__)
-        self.__consensus_lines: List
+        self.__consensus_file: str = consensus_file
 
-        try:
-            # Read the file
-            with open(consensus_file, "r") as file:
-                self.__consensus_lines = [line.strip() for line in file.readlines()]
+        # Fail early, even if parsing is left to iterate_relay_entries
+        if not os.path.isfile(consensus_file):
+            self.__logger.warning(
+                "Given consensus file doesn't exist: %s", consensus_file
+            )
+            raise ConsensusParserFileNotFoundError
 
-        except FileNotFoundError as exception:
-            self.__logger.warning("Given consensus file doesn't exist: %s", exception)
-            raise ConsensusParserFileNotFoundError from exception
+        if lazy:
+            return
 
         # Parse the consensus
-        self.valid_after = self.__parse_valid_after(self.__consensus_lines)
-        self.fresh_until = self.__parse_fresh_until(self.__consensus_lines)
-        self.bandwidth_weights = self.__parse_bandwidth_weights(self.__consensus_lines)
-        self.relay_entries = self.__parse_relay_entries(self.__consensus_lines)
+        self.relay_entries = list(self.iterate_relay_entries())
         self.relay_entries = self.__calculate_path_selection_probabilities(
             self.relay_entries, self.bandwidth_weights
         )
 
-    @staticmethod
-    def __parse_valid_after(consensus_lines: List) -> datetime:
+    def iterate_relay_entries(self) -> Iterator[ConsensusRelayEntry]:
         """
-        Parses the valid after date from consensus
+        Parses the consensus line by line and yields the relay entries as soon
+        as they are complete. The header and footer fields are filled along
+        the way, so bandwidth_weights is only available once all relay entries
+        were yielded. Path selection probabilities aren't calculated, since
+        they depend on all relay entries.
 
-        :param consensus_lines: Rows of the consensus
-        :type consensus_lines: List
+        :raises ConsensusParserFileNotFoundError: If given file does not exist
         :raises ConsensusParserInvalidDocument: If given file is invalid
-        :return: "valid-after" timestamp
-        :rtype: datetime
+        :yield: ConsensusRelayEntry objects in the order they appear in the consensus
+        :rtype: Iterator[ConsensusRelayEntry]
         """
-        for line in consensus_lines:
-            if line.startswith("valid-after"):
-                date = line.split(" ", 1)[1]
-                return datetime.strptime(date, "%Y-%m-%d %H:%M:%S")
+        try:
+            file = open_consensus_file(self.__consensus_file)
 
-        raise ConsensusParserInvalidDocument
+        except FileNotFoundError as exception:
+            self.__logger.warning("Given consensus file doesn't exist: %s", exception)
+            raise ConsensusParserFileNotFoundError from exception
 
-    @staticmethod
-    def __parse_fresh_until(consensus_lines: List) -> datetime:
-        """
-        Parses the fresh until date from consensus
+        valid_after: Optional[datetime] = None
+        fresh_until: Optional[datetime] = None
+        relay: Optional[ConsensusRelayEntry] = None
 
-        :param consensus_lines: Rows of the consensus
-        :type consensus_lines: List
-        :raises ConsensusParserInvalidDocument: If given file is invalid
-        :return: "fresh-until" timestamp
-        :rtype: datetime
-        """
-        for line in consensus_lines:
-            if line.startswith("fresh-until"):
-                date = line.split(" ", 1)[1]
-                return datetime.strptime(date, "%Y-%m-%d %H:%M:%S")
+        with file:
+            for line in file:
+                keyword, _, rest = line.strip().partition(" ")
+
+                # Relay entries
+                if keyword == "r":
+                    if relay is not None:
+                        yield relay
+                    relay = self.__parse_router_line(rest)
 
-        raise ConsensusParserInvalidDocument
+                elif relay is not None and keyword in ("a", "s", "w"):
+                    self.__parse_relay_line(relay, keyword, rest)
+
+                # Header and footer
+                elif keyword == "valid-after":
+                    valid_after = datetime.fromisoformat(rest)
+
+                elif keyword == "fresh-until":
+                    fresh_until = datetime.fromisoformat(rest)
+
+                elif keyword == "directory-footer":
+                    if relay is not None:
+                        yield relay
+                    relay = None
+
+                elif keyword == "bandwidth-weights" and not self.bandwidth_weights:
+                    self.bandwidth_weights = self.__parse_bandwidth_weights(rest)
+
+        if relay is not None:
+            yield relay
+
+        if valid_after is None or fresh_until is None:
+            raise ConsensusParserInvalidDocument
+
+        self.valid_after = valid_after
+        self.fresh_until = fresh_until
 
     @staticmethod
-    def __parse_bandwidth_weights(consensus_lines: List) -> Dict:
+    def __parse_bandwidth_weights(weights_line: str) -> Dict:
         """
-        Parses the fresh until date from consensus
+        Parses the bandwidth weights from consensus
 
-        :param consensus_lines: Rows of the consensus
-        :type consensus_lines: List
+        :param weights_line: The bandwidth-weights line, without the keyword
+        :type weights_line: str
         :return: A dictionary of weight values
         :rtype: Dict
         """
-        weights = []
-        for line in consensus_lines[::-1]:
-            if line.startswith("bandwidth-weights "):
-                weights = line.split(" ")[1:]
-
         weights_dict = {}
-        for weight in weights:
+        for weight in weights_line.split(" "):
             values = weight.split("=")
             weights_dict.update({values[0]: float(values[1])})
 
         return weights_dict
 
     @staticmethod
-    def __parse_relay_entries(
-        consensus_lines: List,
-    ) -> List[ConsensusRelayEntry]:
+    def __parse_router_line(router_line: str) -> ConsensusRelayEntry:
         """
-        Parses relay entries in the consensus
+        Parses the "r" line that starts a relay entry
 
-        :param consensus_lines: Rows of the consensus
-        :type consensus_lines: List
-        :return: A list of ConsensusRelayEntry objects
-        :rtype: List[ConsensusRelayEntry]
+        :param router_line: The "r" line, without the keyword
+        :type router_line: str
+        :return: ConsensusRelayEntry object, to be completed by the following lines
+        :rtype: ConsensusRelayEntry
         """
-        # TODO: Please refactor me into smaller functions
-        # pylint: disable=R0914
-        relays = []
-
-        for idx, line in enumerate(consensus_lines):
-            params = []
-            # Find relay entries
-            if line.startswith("r "):
-                # Split the line into separate parameters
-                params = line.split(" ")[1:]
-
-                # See https://gitweb.torproject.org/torspec.git/tree/dir-spec.txt#n2337
-                #   for the exact order of the params
-                nickname = params[0]
-                identity = params[1]
-                digest = params[2]
-                publication = datetime.strptime(
-                    params[3] + " " + params[4], "%Y-%m-%d %H:%M:%S"
-                )
-                IP = params[5]
-                ORPort = int(params[6])
-                DirPort = int(params[7])
-
-                # Parse the flags and bandwidth for this relay
-                flags = []
-                bandwidth = 0.0
-                is_exit = False
-                IPv6 = None
-                IPv6ORPort = None
-                for i in range(1, 10):
-
-                    temp_line = consensus_lines[idx + i]
-
-                    if temp_line.startswith("a "):
-                        cur_line = temp_line.split(" ")[1:][0].rsplit(":", 1)
-                        IPv6 = cur_line[0]
-                        IPv6ORPort = cur_line[1]
-
-                    elif temp_line.startswith("s "):
-                        flags = temp_line.split(" ")[1:]
-                        is_exit = "Exit" in flags and "BadExit" not in flags
-
-                    elif temp_line.startswith("w "):
-                        bandwidth = float(temp_line.split(" ")[1].split("=")[1])
-
-                        # Stop searching since bandwidth comes the last
-                        break
-
-                # Add relay to the list
-                relays.append(
-                    ConsensusRelayEntry(
-                        nickname=nickname,
-                        identity=identity,
-                        digest=digest,
-                        publication=publication,
-                        IP=IP,
-                        is_exit=is_exit,
-                        IPv6=IPv6,
-                        IPv6ORPort=IPv6ORPort,
-                        ORPort=ORPort,
-                        DirPort=DirPort,
-                        bandwidth=bandwidth,
-                        flags=flags,
-                    )
-                )
-        return relays
+        # See https://gitweb.torproject.org/torspec.git/tree/dir-spec.txt#n2337
+        #   for the exact order of the params
+        params = router_line.split(" ")
+
+        return ConsensusRelayEntry(
+            nickname=params[0],
+            identity=params[1],
+            digest=params[2],
+            publication=datetime.fromisoformat(f"{params[3]} {params[4]}"),
+            IP=params[5],
+            is_exit=False,
+            IPv6=None,
+            IPv6ORPort=None,
+            ORPort=int(params[6]),
+            DirPort=int(params[7]),
+            bandwidth=0.0,
+            flags=[],
+        )
+
+    @staticmethod
+    def __parse_relay_line(
+        relay: ConsensusRelayEntry, keyword: str, relay_line: str
+    ) -> None:
+        """
+        Parses an "a", "s", or "w" line of a relay entry into the given entry
+
+        :param relay: The relay entry the line belongs to
+        :type relay: ConsensusRelayEntry
+        :param keyword: The keyword of the line
+        :type keyword: str
+        :param relay_line: The line, without the keyword
+        :type relay_line: str
+        """
+        if keyword == "a":
+            address = relay_line.split(" ")[0].rsplit(":", 1)
+            relay.IPv6 = address[0]
+            relay.IPv6ORPort = address[1]
+
+        elif keyword == "s":
+            relay.flags = relay_line.split()
+            relay.is_exit = relay.has_flag("Exit") and not relay.has_flag("BadExit")
+
+        else:
+            relay.bandwidth = float(relay_line.split(" ")[0].split("=")[1])
 
     @staticmethod
     def __calculate_path_selection_probabilities(
@@ -268,10 +551,6 @@ class ConsensusV3Parser:
         """
         Calculates guard, middle, and exit probabilities for relays
 
-        Adapted from the function called calculatePathSelectionProbabilities() in
-        https://gitweb.torproject.org/onionoo.git/tree/src/main/java/org/torproject/metrics/onionoo/updater/NodeDetailsStatusUpdater.java#n597
-
-
         :param relay_entries: List of relay entries
         :type relay_entries: List[ConsensusRelayEntry]
         :param bandwidth_weights: A dictionary of bandwidth weights parsed from consensus
@@ -279,90 +558,19 @@ class ConsensusV3Parser:
         :return: List of relay entry objects
         :rtype: List[ConsensusRelayEntry]
         """
-        # TODO: Please refactor me into smaller functions
-        # pylint: disable=R0914
-        # pylint: disable=R0915
-        wgg = bandwidth_weights["Wgg"] / 10000.0
-        wgd = bandwidth_weights["Wgd"] / 10000.0
-        wmg = bandwidth_weights["Wmg"] / 10000.0
-        wmm = bandwidth_weights["Wmm"] / 10000.0
-        wme = bandwidth_weights["Wme"] / 10000.0
-        wmd = bandwidth_weights["Wmd"] / 10000.0
-        wee = bandwidth_weights["Wee"] / 10000.0
-        wed = bandwidth_weights["Wed"] / 10000.0
-
-        consensusWeights = {}
-        guardWeights = {}
-        middleWeights = {}
-        exitWeights = {}
-
-        totalConsensusWeight = 0.0
-        totalGuardWeight = 0.0
-        totalMiddleWeight = 0.0
-        totalExitWeight = 0.0
-
-        running_relays = []
-        for relay in relay_entries:
-            if "Running" in relay.flags:
-                running_relays.append(relay)
-
-        for relay in running_relays:
-            isExit = (
-                relay.flags is not None
-                and "Exit" in relay.flags
-                and "BadExit" not in relay.flags
-            )
-            isGuard = relay.flags is not None and "Guard" in relay.flags
-            consensusWeight = float(relay.bandwidth)
-            consensusWeights.update({relay.fingerprint: consensusWeight})
-            totalConsensusWeight += consensusWeight
-
-            guardWeight = consensusWeight
-            middleWeight = consensusWeight
-            exitWeight = consensusWeight
-
-            if isGuard and isExit:
-                guardWeight *= wgd
-                middleWeight *= wmd
-                exitWeight *= wed
-            elif isGuard:
-                guardWeight *= wgg
-                middleWeight *= wmg
-                exitWeight = 0.0
-            elif isExit:
-                guardWeight = 0.0
-                middleWeight *= wme
-                exitWeight *= wee
-            else:
-                guardWeight = 0.0
-                middleWeight *= wmm
-                exitWeight = 0.0
-
-            guardWeights.update({relay.fingerprint: guardWeight})
-            middleWeights.update({relay.fingerprint: middleWeight})
-            exitWeights.update({relay.fingerprint: exitWeight})
-
-            totalGuardWeight += guardWeight
-            totalMiddleWeight += middleWeight
-            totalExitWeight += exitWeight
-
-        for relay in relay_entries:
-            fingerprint = relay.fingerprint
-
-            if fingerprint in consensusWeights:
-                fraction = float(consensusWeights[fingerprint] / totalConsensusWeight)
-                relay.consensus_weight_fraction = fraction
-
-            if fingerprint in guardWeights:
-                probability = float(guardWeights[fingerprint] / totalGuardWeight)
-                relay.guard_probability = probability
-
-            if fingerprint in middleWeights:
-                probability = float(middleWeights[fingerprint] / totalMiddleWeight)
-                relay.middle_probability = probability
-
-            if fingerprint in exitWeights:
-                probability = float(exitWeights[fingerprint] / totalExitWeight)
-                relay.exit_probability = probability
+        relay_table = ConsensusRelayTable(relay_entries)
+        probabilities = relay_table.path_selection_probabilities(bandwidth_weights)
+
+        for relay, consensus_weight_fraction, guard, middle, exit_ in zip(
+            relay_entries,
+            probabilities["consensus_weight_fraction"],
+            probabilities["guard_probability"],
+            probabilities["middle_probability"],
+            probabilities["exit_probability"],
+        ):
+            relay.consensus_weight_fraction = consensus_weight_fraction
+            relay.guard_probability = guard
+            relay.middle_probability = middle
+            relay.exit_probability = exit_
 
         return relay_entries
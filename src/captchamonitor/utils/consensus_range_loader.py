@@ -0,0 +1,89 @@
+import logging
+from typing import Deque, Tuple, Iterator, Optional
+from datetime import datetime
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from captchamonitor.utils.collector import Collector
+from captchamonitor.utils.consensus_parser import ConsensusV3Parser
+
+
+class ConsensusRangeLoader:
+    """
+    Loads the consensuses of every hour within a range of dates, in order.
+    Consensus files are sourced by the Collector and parsed in worker
+    processes, a limited number of them ahead of the consumer, so that long
+    periods can be processed without keeping them in memory.
+    """
+
+    def __init__(
+        self,
+        collector: Optional[Collector] = None,
+        max_workers: int = 4,
+        read_ahead: int = 8,
+    ) -> None:
+        """
+        Initializes the loader
+
+        :param collector: Collector used to get the consensus files, a new one is created if not given
+        :type collector: Optional[Collector]
+        :param max_workers: Number of processes parsing the consensuses, parses in this process if 1 or less, defaults to 4
+        :type max_workers: int
+        :param read_ahead: Maximum number of consensuses parsed ahead of the consumer, defaults to 8
+        :type read_ahead: int
+        """
+        # Private class attributes
+        self.__logger = logging.getLogger(__name__)
+        self.__collector: Collector = collector or Collector()
+        self.__max_workers: int = max_workers
+        self.__read_ahead: int = max(read_ahead, 1)
+
+    def iterate(
+        self, start: datetime, end: datetime
+    ) -> Iterator[Tuple[datetime, ConsensusV3Parser]]:
+        """
+        Parses the consensuses of every hour between the given dates
+
+        :param start: Valid-after date of the first consensus document
+        :type start: datetime
+        :param end: Valid-after date of the last consensus document, inclusive
+        :type end: datetime
+        :yield: Valid-after dates and the parsed consensuses, in order
+        :rtype: Iterator[Tuple[datetime, ConsensusV3Parser]]
+        """
+        consensus_files = self.__collector.iterate_consensuses(start, end)
+
+        if self.__max_workers <= 1:
+            for consensus_date, consensus_file in consensus_files:
+                yield consensus_date, ConsensusV3Parser(consensus_file)
+            return
+
+        self.__logger.debug(
+            "Parsing consensuses using %s processes", self.__max_workers
+        )
+
+        pending: Deque[Tuple[datetime, Future]] = deque()
+
+        with ProcessPoolExecutor(max_workers=self.__max_workers) as executor:
+            try:
+                for consensus_date, consensus_file in consensus_files:
+                    pending.append(
+                        (
+                            consensus_date,
+                            executor.submit(ConsensusV3Parser, consensus_file),
+                        )
+                    )
+
+                    # Wait for the consumer before parsing any further
+                    if len(pending) >= self.__read_ahead:
+                        consensus_date, future = pending.popleft()
+                        yield consensus_date, future.result()
+
+                while pending:
+                    consensus_date, future = pending.popleft()
+                    yield consensus_date, future.result()
+
+            finally:
+                # Don't parse what won't be consumed if the caller stopped early
+                for _, future in pending:
+                    future.cancel()
@@ -0,0 +1,244 @@
+import io
+import os
+import re
+import time
+import shutil
+import logging
+import tempfile
+from typing import IO, Dict, Tuple, Optional
+
+import zstandard
+
+
+def open_consensus_file(consensus_file: str) -> IO[str]:
+    """
+    Opens the given consensus file for reading as text, decompresses it on the
+    fly if it was stored compressed
+
+    :param consensus_file: Path to the consensus file
+    :type consensus_file: str
+    :return: The opened file
+    :rtype: IO[str]
+    """
+    if consensus_file.endswith(ConsensusStore.compressed_suffix):
+        # pylint: disable=R1732
+        reader = zstandard.ZstdDecompressor().stream_reader(open(consensus_file, "rb"))
+        return io.TextIOWrapper(io.BufferedReader(reader), encoding="utf-8")
+
+    return open(consensus_file, "r", encoding="utf-8")
+
+
+class ConsensusStore:
+    """
+    Stores consensus files in a directory, indexed by their valid-after hour.
+    Files that weren't used for a while are evicted once the store grows
+    beyond its size or age limits, least recently used first.
+    """
+
+    # Suffix of the plain and compressed consensus files
+    suffix = "-consensus"
+    compressed_suffix = "-consensus.zst"
+
+    # Matches the valid-after hour at the start of the file names
+    file_name_pattern = re.compile(r"^(\d{4}-\d{2}-\d{2}-\d{2}-\d{2}-\d{2})-consensus")
+
+    def __init__(
+        self,
+        consensus_dir: str,
+        max_size: int = 512 * 1024 * 1024,
+        max_age: float = 7 * 24 * 3600,
+        compress: bool = False,
+    ) -> None:
+        """
+        Initializes the store and indexes the files that are already there
+
+        :param consensus_dir: Directory to store the consensus files in
+        :type consensus_dir: str
+        :param max_size: Maximum total size of the stored files in bytes, defaults to 512 MiB
+        :type max_size: int
+        :param max_age: Seconds a file is kept after it was last used, defaults to 7 days
+        :type max_age: float
+        :param compress: Should I store new files compressed with zstd, defaults to False
+        :type compress: bool
+        """
+        # Private class attributes
+        self.__logger = logging.getLogger(__name__)
+        self.__consensus_dir: str = consensus_dir
+        self.__max_size: int = max_size
+        self.__max_age: float = max_age
+        self.__compress: bool = compress
+        self.__index: Dict[str, Tuple[str, int, float]] = {}
+
+        # Remove if a file with same name was created earlier
+        if os.path.isfile(self.__consensus_dir):
+            os.remove(self.__consensus_dir)
+
+        # Create the consensus directory if doesn't exist
+        os.makedirs(self.__consensus_dir, exist_ok=True)
+
+        for file_name in os.listdir(self.__consensus_dir):
+            self.__add_to_index(file_name)
+
+    def __add_to_index(self, file_name: str) -> Optional[str]:
+        """
+        Adds the given file in the consensus directory to the index
+
+        :param file_name: Name of the file
+        :type file_name: str
+        :return: Path to the file, None if it isn't a consensus file
+        :rtype: Optional[str]
+        """
+        match = self.file_name_pattern.match(file_name)
+        if match is None:
+            return None
+
+        file_path = os.path.join(self.__consensus_dir, file_name)
+        try:
+            stat = os.stat(file_path)
+
+        except FileNotFoundError:
+            return None
+
+        self.__index[match.group(1)] = (file_name, stat.st_size, stat.st_mtime)
+
+        return file_path
+
+    def __contains__(self, date_str: str) -> bool:
+        """
+        Checks if the consensus file with the given valid-after hour is stored,
+        without marking it as recently used. The index is checked first, the
+        disk only if the file might have been stored by another process.
+
+        :param date_str: Valid-after hour, like 2021-01-01-00-00-00
+        :type date_str: str
+        :return: True if the consensus file is stored
+        :rtype: bool
+        """
+        if date_str in self.__index:
+            return True
+
+        for suffix in (self.suffix, self.compressed_suffix):
+            if self.__add_to_index(f"{date_str}{suffix}") is not None:
+                return True
+
+        return False
+
+    def get(self, date_str: str) -> Optional[str]:
+        """
+        Gets the path to the consensus file with the given valid-after hour
+
+        :param date_str: Valid-after hour, like 2021-01-01-00-00-00
+        :type date_str: str
+        :return: Path to the consensus file, None if it isn't stored
+        :rtype: Optional[str]
+        """
+        if date_str in self.__index:
+            file_name = self.__index[date_str][0]
+            file_path = os.path.join(self.__consensus_dir, file_name)
+
+            try:
+                # Mark as recently used
+                os.utime(file_path)
+                self.__add_to_index(file_name)
+                return file_path
+
+            except FileNotFoundError:
+                # Removed by another process
+                del self.__index[date_str]
+
+        # Might have been stored by another process
+        for suffix in (self.suffix, self.compressed_suffix):
+            stored_file_path = self.__add_to_index(f"{date_str}{suffix}")
+            if stored_file_path is not None:
+                return stored_file_path
+
+        return None
+
+    def put(self, date_str: str, source: IO[bytes]) -> str:
+        """
+        Stores the consensus file read from the given source
+
+        :param date_str: Valid-after hour, like 2021-01-01-00-00-00
+        :type date_str: str
+        :param source: Binary stream to read the consensus file from
+        :type source: IO[bytes]
+        :raises OSError: If the consensus file cannot be written
+        :return: Path to the stored consensus file
+        :rtype: str
+        """
+        if self.__compress:
+            suffix, other_suffix = self.compressed_suffix, self.suffix
+        else:
+            suffix, other_suffix = self.suffix, self.compressed_suffix
+        file_name = f"{date_str}{suffix}"
+
+        file_descriptor, temp_file = tempfile.mkstemp(
+            dir=self.__consensus_dir, prefix="."
+        )
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                if self.__compress:
+                    with zstandard.ZstdCompressor().stream_writer(
+                        file, closefd=False
+                    ) as writer:
+                        shutil.copyfileobj(source, writer)
+                else:
+                    shutil.copyfileobj(source, file)
+
+            os.chmod(temp_file, 0o644)
+            os.replace(temp_file, os.path.join(self.__consensus_dir, file_name))
+
+        except OSError:
+            os.unlink(temp_file)
+            raise
+
+        # Only a single copy of each consensus is kept
+        try:
+            os.remove(os.path.join(self.__consensus_dir, f"{date_str}{other_suffix}"))
+
+        except FileNotFoundError:
+            pass
+
+        file_path = self.__add_to_index(file_name)
+        self.evict(keep=date_str)
+
+        return str(file_path)
+
+    def remove(self, date_str: str) -> None:
+        """
+        Removes the consensus file with the given valid-after hour
+
+        :param date_str: Valid-after hour, like 2021-01-01-00-00-00
+        :type date_str: str
+        """
+        self.__index.pop(date_str, None)
+
+        for suffix in (self.suffix, self.compressed_suffix):
+            try:
+                os.remove(os.path.join(self.__consensus_dir, f"{date_str}{suffix}"))
+                self.__logger.debug("Removed the consensus file for %s", date_str)
+
+            except FileNotFoundError:
+                pass
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """
+        Removes the files that weren't used within max_age, and then the least
+        recently used files until the store fits into max_size
+
+        :param keep: Valid-after hour of a file that shouldn't be evicted, defaults to None
+        :type keep: Optional[str]
+        """
+        oldest_allowed = time.time() - self.__max_age
+        total_size = sum(size for _, size, _ in self.__index.values())
+
+        # Least recently used first
+        entries = sorted(self.__index.items(), key=lambda entry: entry[1][2])
+
+        for date_str, (_, size, last_used) in entries:
+            if date_str == keep:
+                continue
+
+            if last_used < oldest_allowed or total_size > self.__max_size:
+                self.remove(date_str)
+                total_size -= size
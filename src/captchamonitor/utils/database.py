@@ -1,11 +1,13 @@
+import json
 import logging
-from typing import Optional
+from typing import Any, Dict, Optional
 
-from sqlalchemy import create_engine
+from sqlalchemy import JSON, Integer, Unicode, text, create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy_utils import create_database, database_exists
 
 from captchamonitor.utils.models import Model
+from captchamonitor.utils.blob_store import BlobStore
 from captchamonitor.utils.exceptions import DatabaseInitError
 
 
@@ -64,6 +66,188 @@ class Database:
 
         # Process models
         self.model.metadata.create_all(self.engine)
+        self.__upgrade_schema()
 
         # Create session
         self.session = sessionmaker(bind=self.engine)
+
+    def __upgrade_schema(self) -> None:
+        """
+        Adds the columns that were introduced after the tables were created,
+        since create_all only creates the missing tables. Every statement is
+        safe to run on an up to date database. Runs in a single transaction,
+        while other processes wait for it to finish.
+
+        :raises Exception: If the schema couldn't be upgraded
+        """
+        statements = [
+            # The time the job was leased by a worker
+            "ALTER TABLE fetch_queue ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP WITH TIME ZONE",
+            # The fetched payloads moved into the blob table
+            "ALTER TABLE fetch_completed ADD COLUMN IF NOT EXISTS html_data_hash VARCHAR(64) REFERENCES blob (sha256)",
+            "ALTER TABLE fetch_completed ADD COLUMN IF NOT EXISTS html_data_size INTEGER",
+            "ALTER TABLE fetch_completed ADD COLUMN IF NOT EXISTS http_requests_hash VARCHAR(64) REFERENCES blob (sha256)",
+            "ALTER TABLE fetch_completed ADD COLUMN IF NOT EXISTS http_requests_size INTEGER",
+        ]
+
+        db_session = sessionmaker(bind=self.engine)()
+
+        try:
+            db_session.execute(
+                text(
+                    "SELECT pg_advisory_xact_lock(hashtext('captchamonitor_upgrade_schema'))"
+                )
+            )
+
+            for statement in statements:
+                db_session.execute(text(statement))
+
+            db_session.commit()
+
+        except Exception:
+            db_session.rollback()
+            raise
+
+        finally:
+            db_session.close()
+
+        self.__move_payloads_to_blobs()
+
+    def __move_payloads_to_blobs(self, batch_size: int = 1000) -> None:
+        """
+        Moves the payloads stored in the legacy html_data and http_requests
+        columns of the FetchCompleted table into the blob table, then drops
+        the legacy columns. Commits after every batch, so that the progress
+        is kept if it is interrupted. Only one process does the work, the
+        others carry on without waiting for it.
+
+        :param batch_size: Number of rows moved at once, defaults to 1000
+        :type batch_size: int
+        :raises Exception: If the payloads couldn't be moved
+        """
+        # The lock belongs to the connection, so the session sticks to it
+        connection = self.engine.connect()
+        db_session = sessionmaker(bind=connection)()
+
+        try:
+            legacy_columns = db_session.execute(
+                text(
+                    "SELECT column_name FROM information_schema.columns "
+                    "WHERE table_name = 'fetch_completed' "
+                    "AND column_name IN ('html_data', 'http_requests')"
+                )
+            ).fetchall()
+
+            if len(legacy_columns) < 2:
+                return
+
+            if not db_session.execute(
+                text(
+                    "SELECT pg_try_advisory_lock(hashtext('captchamonitor_move_payloads_to_blobs'))"
+                )
+            ).scalar():
+                self.__logger.info("Another process is moving the fetched payloads")
+                return
+
+            self.__logger.info("Moving the fetched payloads into the blob table")
+
+            last_id: Optional[int] = 0
+            while last_id is not None:
+                last_id = self.__move_batch_of_payloads_to_blobs(
+                    db_session, last_id, batch_size
+                )
+                db_session.commit()
+
+            db_session.execute(
+                text(
+                    "ALTER TABLE fetch_completed DROP COLUMN IF EXISTS html_data, "
+                    "DROP COLUMN IF EXISTS http_requests"
+                )
+            )
+            db_session.commit()
+
+        except Exception:
+            db_session.rollback()
+            raise
+
+        finally:
+            db_session.close()
+            # Closing the connection releases the advisory lock
+            connection.close()
+
+    @staticmethod
+    def __move_batch_of_payloads_to_blobs(
+        db_session: sessionmaker, last_id: int, batch_size: int
+    ) -> Optional[int]:
+        """
+        Moves the legacy payloads of the next batch of FetchCompleted rows into
+        the blob table, and points the rows to the blobs using a single update
+
+        :param db_session: Database session bound to a single connection
+        :type db_session: sessionmaker
+        :param last_id: Only the rows with a greater ID are moved
+        :type last_id: int
+        :param batch_size: Maximum number of rows to move
+        :type batch_size: int
+        :return: ID of the last moved row, None if there was nothing left to move
+        :rtype: Optional[int]
+        """
+        rows = db_session.execute(
+            text(
+                "SELECT id, html_data, http_requests FROM fetch_completed "
+                "WHERE id > :last_id "
+                "AND html_data_hash IS NULL AND http_requests_hash IS NULL "
+                "AND (html_data IS NOT NULL OR http_requests IS NOT NULL) "
+                "ORDER BY id LIMIT :batch_size"
+            ).columns(id=Integer, html_data=Unicode, http_requests=JSON),
+            {"last_id": last_id, "batch_size": batch_size},
+        ).fetchall()
+
+        if len(rows) == 0:
+            return None
+
+        blob_store = BlobStore(db_session)
+        values = []
+        params: Dict[str, Any] = {}
+
+        for index, (fetch_completed_id, html_data, http_requests) in enumerate(rows):
+            # The HAR used to be stored as a JSON encoded string
+            if http_requests is not None and not isinstance(http_requests, str):
+                http_requests = json.dumps(http_requests)
+
+            html_data_hash, html_data_size = blob_store.put(html_data)
+            http_requests_hash, http_requests_size = blob_store.put(http_requests)
+
+            # NULLs need a type, otherwise Postgres takes the column as text
+            values.append(
+                f"(CAST(:id_{index} AS INTEGER), "
+                f"CAST(:html_data_hash_{index} AS VARCHAR(64)), "
+                f"CAST(:html_data_size_{index} AS INTEGER), "
+                f"CAST(:http_requests_hash_{index} AS VARCHAR(64)), "
+                f"CAST(:http_requests_size_{index} AS INTEGER))"
+            )
+            params.update(
+                {
+                    f"id_{index}": fetch_completed_id,
+                    f"html_data_hash_{index}": html_data_hash,
+                    f"html_data_size_{index}": html_data_size,
+                    f"http_requests_hash_{index}": http_requests_hash,
+                    f"http_requests_size_{index}": http_requests_size,
+                }
+            )
+
+        db_session.execute(
+            text(
+                "UPDATE fetch_completed SET "
+                "html_data_hash = moved.html_data_hash, "
+                "html_data_size = moved.html_data_size, "
+                "http_requests_hash = moved.http_requests_hash, "
+                "http_requests_size = moved.http_requests_size "
+                f"FROM (VALUES {', '.join(values)}) AS moved "
+                "(id, html_data_hash, html_data_size, http_requests_hash, http_requests_size) "
+                "WHERE fetch_completed.id = moved.id"
+            ),
+            params,
+        )
+
+        return rows[-1][0]
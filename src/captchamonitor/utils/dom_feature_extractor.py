@@ -0,0 +1,151 @@
+from typing import Dict, List, Tuple, Optional
+from collections import Counter
+from dataclasses import field, dataclass
+from html.parser import HTMLParser
+
+
+@dataclass
+class DomFeatures:
+    """
+    Stores the features extracted from an HTML document
+
+    :param tag_count: Number of tags in the document
+    :type tag_count: int
+    :param tag_histogram: Number of occurrences of each tag
+    :type tag_histogram: Dict[str, int]
+    :param text_length: Length of the visible text, excluding scripts and styles
+    :type text_length: int
+    :param keyword_hits: Number of tokens each keyword was found in
+    :type keyword_hits: Dict[str, int]
+    """
+
+    tag_count: int = 0
+    tag_histogram: Dict[str, int] = field(default_factory=dict)
+    text_length: int = 0
+    keyword_hits: Dict[str, int] = field(default_factory=dict)
+
+    def contains(self, keyword: str) -> bool:
+        """
+        Checks if the given keyword was found in the document
+
+        :param keyword: The keyword to check, case insensitive
+        :type keyword: str
+        :return: True if the keyword was found at least once
+        :rtype: bool
+        """
+        return self.keyword_hits.get(keyword.lower(), 0) > 0
+
+
+class DomFeatureExtractor(HTMLParser):
+    """
+    Extracts DomFeatures from HTML documents in a single pass over the tokens,
+    without building a tree. Keywords are searched case insensitively in tag
+    names, attributes, text and comments.
+    """
+
+    # Tags whose content is not displayed
+    invisible_tags = ("script", "style", "template")
+
+    def __init__(self, keywords: List[str]) -> None:
+        """
+        Initializes the feature extractor
+
+        :param keywords: List of keywords to search for
+        :type keywords: List[str]
+        """
+        super().__init__()
+
+        # Private class attributes
+        self.__keywords: List[str] = [keyword.lower() for keyword in keywords]
+        self.__tag_histogram: Counter = Counter()
+        self.__keyword_hits: Counter = Counter()
+        self.__text_length: int = 0
+        self.__invisible_depth: int = 0
+
+    def extract(self, html_data: Optional[str]) -> DomFeatures:
+        """
+        Extracts the features of the given HTML document
+
+        :param html_data: The HTML document
+        :type html_data: Optional[str]
+        :return: The extracted features
+        :rtype: DomFeatures
+        """
+        self.reset()
+        self.__tag_histogram = Counter()
+        self.__keyword_hits = Counter()
+        self.__text_length = 0
+        self.__invisible_depth = 0
+
+        if html_data:
+            self.feed(html_data)
+            self.close()
+
+        return DomFeatures(
+            tag_count=sum(self.__tag_histogram.values()),
+            tag_histogram=dict(self.__tag_histogram),
+            text_length=self.__text_length,
+            keyword_hits={
+                keyword: self.__keyword_hits[keyword] for keyword in self.__keywords
+            },
+        )
+
+    def __search_keywords(self, data: str) -> None:
+        """
+        Counts the keywords found in the given token
+
+        :param data: The token
+        :type data: str
+        """
+        data = data.lower()
+        for keyword in self.__keywords:
+            if keyword in data:
+                self.__keyword_hits[keyword] += 1
+
+    def __handle_tag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        """
+        Counts the tag and searches its attributes for the keywords
+
+        :param tag: Name of the tag
+        :type tag: str
+        :param attrs: Attributes of the tag
+        :type attrs: List[Tuple[str, Optional[str]]]
+        """
+        self.__tag_histogram[tag] += 1
+        self.__search_keywords(tag)
+
+        for name, value in attrs:
+            self.__search_keywords(name)
+            if value is not None:
+                self.__search_keywords(value)
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        self.__handle_tag(tag, attrs)
+
+        if tag in self.invisible_tags:
+            self.__invisible_depth += 1
+
+    def handle_startendtag(
+        self, tag: str, attrs: List[Tuple[str, Optional[str]]]
+    ) -> None:
+        self.__handle_tag(tag, attrs)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self.invisible_tags and self.__invisible_depth > 0:
+            self.__invisible_depth -= 1
+
+    def handle_data(self, data: str) -> None:
+        self.__search_keywords(data)
+
+        if self.__invisible_depth == 0:
+            self.__text_length += len(data.strip())
+
+    def handle_comment(self, data: str) -> None:
+        self.__search_keywords(data)
+
+    def handle_decl(self, decl: str) -> None:
+        self.__search_keywords(decl)
+
+    def error(self, message: str) -> None:
+        # Malformed documents are expected, ignore them like browsers do
+        pass
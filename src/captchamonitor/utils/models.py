@@ -1,15 +1,18 @@
+from typing import Optional
 from datetime import datetime
 
 import pytz
+import zstandard
 from sqlalchemy import (
     JSON,
+    Date,
     Column,
     String,
     Boolean,
     Integer,
-    Unicode,
     DateTime,
     ForeignKey,
+    LargeBinary,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declared_attr, declarative_base
@@ -49,6 +52,31 @@ class MetaData(BaseModel):
     # fmt: on
 
 
+class Blob(BaseModel):
+    """
+    Stores large payloads, such as HTML data and HAR files, content-addressed by
+    their SHA-256 hash and compressed with zstd, so identical payloads are
+    stored only once
+    """
+
+    __tablename__ = "blob"
+
+    # fmt: off
+    sha256 = Column(String(64), unique=True, nullable=False) # SHA-256 hash of the uncompressed payload
+    size = Column(Integer, nullable=False)                   # Size of the uncompressed payload in bytes
+    data = Column(LargeBinary, nullable=False)               # zstd compressed payload
+    # fmt: on
+
+    def load(self) -> str:
+        """
+        Decompresses the stored payload
+
+        :return: The uncompressed payload
+        :rtype: str
+        """
+        return zstandard.ZstdDecompressor().decompress(self.data).decode("utf-8")
+
+
 class Domain(BaseModel):
     """
     Stores list of tracked domains and metadata related to them
@@ -178,7 +206,8 @@ class FetchQueue(FetchBaseModel):
     __tablename__ = "fetch_queue"
 
     # fmt: off
-    claimed_by = Column(String) # Workers use this field for assigning jobs to themselves
+    claimed_by = Column(String)                   # Workers use this field for assigning jobs to themselves
+    claimed_at = Column(DateTime(timezone=True))  # The time the job was leased by a worker, used for expiring leases of crashed workers
     # fmt: on
 
     # References to the foreign keys, gives access to these tables
@@ -196,9 +225,11 @@ class FetchCompleted(FetchBaseModel):
     __tablename__ = "fetch_completed"
 
     # fmt: off
-    captcha_monitor_version = Column(String, nullable=False) # Version of the CAPTCHA Monitor used to do fetching
-    html_data = Column(Unicode)                              # The HTML data gathered as a result of the fetch
-    http_requests = Column(JSON)                             # The HTTP requests in JSON format made by the fetcher while fetching the URL
+    captcha_monitor_version = Column(String, nullable=False)           # Version of the CAPTCHA Monitor used to do fetching
+    html_data_hash = Column(String(64), ForeignKey("blob.sha256"))     # SHA-256 hash of the HTML data gathered as a result of the fetch
+    html_data_size = Column(Integer)                                   # Size of the HTML data in bytes
+    http_requests_hash = Column(String(64), ForeignKey("blob.sha256")) # SHA-256 hash of the HTTP requests in JSON format made by the fetcher while fetching the URL
+    http_requests_size = Column(Integer)                               # Size of the HTTP requests in bytes
     # fmt: on
 
     # References to the foreign keys, gives access to these tables
@@ -207,6 +238,34 @@ class FetchCompleted(FetchBaseModel):
     ref_relay = relationship("Relay", backref="FetchCompleted")
     ref_proxy = relationship("Proxy", backref="FetchCompleted")
 
+    # The payloads are loaded only when accessed
+    ref_html_data = relationship("Blob", foreign_keys=[html_data_hash])
+    ref_http_requests = relationship("Blob", foreign_keys=[http_requests_hash])
+
+    @property
+    def html_data(self) -> Optional[str]:
+        """
+        Lazily loads the HTML data gathered as a result of the fetch
+
+        :return: The HTML data, None if there isn't any
+        :rtype: Optional[str]
+        """
+        if self.ref_html_data is None:
+            return None
+        return self.ref_html_data.load()
+
+    @property
+    def http_requests(self) -> Optional[str]:
+        """
+        Lazily loads the HTTP requests in JSON format made by the fetcher
+
+        :return: The HTTP requests, None if there isn't any
+        :rtype: Optional[str]
+        """
+        if self.ref_http_requests is None:
+            return None
+        return self.ref_http_requests.load()
+
 
 class FetchFailed(FetchBaseModel):
     """
@@ -250,3 +309,26 @@ class AnalyzeCompleted(BaseModel):
 
     # References to the foreign keys, gives access to these tables
     ref_fetch_completed = relationship("FetchCompleted", backref="AnalyzeCompleted")
+
+
+class AnalyzeDailyRollup(BaseModel):
+    """
+    Contains the daily counts of the analyzed fetches, maintained incrementally
+    from the Analyzer table so that statistics don't need to scan it
+    """
+
+    __tablename__ = "analyze_daily_rollup"
+
+    # fmt: off
+    day = Column(Date, nullable=False, index=True)                         # The day the fetches were analyzed on
+    relay_id = Column(Integer, ForeignKey("relay.id"))                     # ID of the relay used for fetching, if there is any
+    fetcher_id = Column(Integer, ForeignKey("fetcher.id"), nullable=False) # ID of the fetcher used for fetching
+    status_check = Column(Integer)                                         # Result of the status check
+    dom_analyze = Column(Integer)                                          # Result of the DOM analyzer
+    captcha_checker = Column(Integer)                                      # Result of the CAPTCHA checker
+    count = Column(Integer, nullable=False)                                # Number of analyzed fetches with these values
+    # fmt: on
+
+    # References to the foreign keys, gives access to these tables
+    ref_relay = relationship("Relay", backref="AnalyzeDailyRollup")
+    ref_fetcher = relationship("Fetcher", backref="AnalyzeDailyRollup")
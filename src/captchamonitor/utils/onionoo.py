@@ -1,11 +1,18 @@
+import os
 import json
+import time
+import hashlib
 import logging
+import tempfile
 from typing import Dict, List, Optional
 from datetime import datetime, timezone
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 import country_converter as coco
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from captchamonitor.utils.exceptions import OnionooConnectionError
 
@@ -33,32 +40,305 @@ class OnionooRelayEntry:
     exit_policy_v6_summary: Optional[dict]
 
 
+class OnionooClient:
+    """
+    Downloads relay details from the Onionoo API over a pooled HTTP session.
+    Failed requests are retried with exponential backoff. Responses are cached
+    on disk, served from there while they are fresh, and revalidated with
+    If-None-Match and If-Modified-Since afterwards, so that unchanged documents
+    aren't downloaded again.
+
+    Small lookups are split into batches that are requested concurrently. Large
+    lookups download the details of all running relays at once and filter
+    them locally, which is a lot faster than looking them up batch by batch.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "https://onionoo.torproject.org",
+        lookup_batch_size: int = 40,
+        bulk_threshold: int = 200,
+        max_workers: int = 4,
+        max_retries: int = 3,
+        backoff_factor: float = 1.0,
+        timeout: float = 60,
+        cache_location: str = "/tmp/cm-onionoo",
+        max_age: float = 1800,
+        cache_expiry: float = 86400,
+    ) -> None:
+        """
+        Initializes the client
+
+        :param base_url: URL of the Onionoo API, defaults to "https://onionoo.torproject.org"
+        :type base_url: str
+        :param lookup_batch_size: Number of fingerprints to look up in a single request, defaults to 40
+        :type lookup_batch_size: int
+        :param bulk_threshold: Download all running relays if more fingerprints than this are requested, defaults to 200
+        :type bulk_threshold: int
+        :param max_workers: Maximum number of concurrent requests, defaults to 4
+        :type max_workers: int
+        :param max_retries: Maximum number of retries for a failed request, defaults to 3
+        :type max_retries: int
+        :param backoff_factor: Backoff factor between the retries in seconds, defaults to 1.0
+        :type backoff_factor: float
+        :param timeout: Timeout of a single request in seconds, defaults to 60
+        :type timeout: float
+        :param cache_location: Directory to cache the responses in, defaults to "/tmp/cm-onionoo"
+        :type cache_location: str
+        :param max_age: Seconds a cached response is used without revalidating it, defaults to 1800
+        :type max_age: float
+        :param cache_expiry: Seconds after which a cached response that wasn't updated is removed, defaults to 86400
+        :type cache_expiry: float
+        """
+        # Private class attributes
+        self.__logger = logging.getLogger(__name__)
+        self.__details_url: str = f"{base_url}/details"
+        self.__lookup_batch_size: int = lookup_batch_size
+        self.__bulk_threshold: int = bulk_threshold
+        self.__max_workers: int = max_workers
+        self.__timeout: float = timeout
+        self.__fields: str = (
+            "fingerprint,nickname,exit_policy_summary,exit_policy_v6_summary,first_seen,last_seen,country,country_name,as,as_name,version,platform"
+        )
+        self.__cache_location: str = cache_location
+        self.__max_age: float = max_age
+        self.__cache_expiry: float = cache_expiry
+
+        # Create the cache directory if doesn't exist
+        os.makedirs(self.__cache_location, exist_ok=True)
+        self.__remove_expired_cache_files()
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=max_workers, max_retries=retry
+        )
+        self.__session: requests.Session = requests.Session()
+        self.__session.mount("https://", adapter)
+        self.__session.mount("http://", adapter)
+
+    def __remove_expired_cache_files(self) -> None:
+        """
+        Removes the cache files that weren't updated within the cache expiry,
+        every distinct set of fingerprints gets its own file otherwise the
+        cache keeps growing
+        """
+        expired_at = time.time() - self.__cache_expiry
+
+        for entry in os.scandir(self.__cache_location):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < expired_at:
+                    os.unlink(entry.path)
+
+            # Another process might have removed or replaced it already
+            except OSError as exception:
+                self.__logger.debug(
+                    "Could not remove the cache file %s: %s", entry.path, exception
+                )
+
+    def __get_cache_file(self, params: Dict[str, str]) -> str:
+        """
+        Gets the path of the cache file of the given request
+
+        :param params: Query parameters of the request
+        :type params: Dict[str, str]
+        :return: Path of the cache file
+        :rtype: str
+        """
+        key = json.dumps([self.__details_url, sorted(params.items())])
+        key_hash = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.__cache_location, f"{key_hash}.json")
+
+    def __read_cache(self, cache_file: str) -> Optional[Dict]:
+        """
+        Reads the given cache file
+
+        :param cache_file: Path of the cache file
+        :type cache_file: str
+        :return: The cache entry, None if there is no valid entry
+        :rtype: Optional[Dict]
+        """
+        try:
+            with open(cache_file, "r", encoding="utf-8") as file:
+                cache_entry = json.load(file)
+
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(cache_entry, dict) or "relays" not in cache_entry:
+            return None
+
+        return cache_entry
+
+    @staticmethod
+    def __write_cache(cache_file: str, cache_entry: Dict) -> None:
+        """
+        Writes the given cache entry atomically, since multiple processes might
+        share the same cache
+
+        :param cache_file: Path of the cache file
+        :type cache_file: str
+        :param cache_entry: The cache entry
+        :type cache_entry: Dict
+        :raises OSError: If the cache file cannot be written
+        """
+        file_descriptor, temp_file = tempfile.mkstemp(
+            dir=os.path.dirname(cache_file), prefix="."
+        )
+        try:
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as file:
+                json.dump(cache_entry, file)
+            os.replace(temp_file, cache_file)
+
+        except OSError:
+            os.unlink(temp_file)
+            raise
+
+    def request_details(self, params: Dict[str, str]) -> List[Dict]:
+        """
+        Requests relay details from Onionoo. Serves the cached response while it
+        is fresh, otherwise revalidates it with ETag and Last-Modified and only
+        downloads the document again if it changed.
+
+        :param params: Query parameters of the request
+        :type params: Dict[str, str]
+        :raises OnionooConnectionError: If cannot connect to the API
+        :return: List of relay details
+        :rtype: List[Dict]
+        """
+        cache_file = self.__get_cache_file(params)
+        cache_entry = self.__read_cache(cache_file)
+
+        headers = {}
+        if cache_entry is not None:
+            if time.time() - cache_entry.get("fetched_at", 0) < self.__max_age:
+                self.__logger.debug("Using cached Onionoo details")
+                return cache_entry["relays"]
+
+            if cache_entry.get("etag", None) is not None:
+                headers["If-None-Match"] = cache_entry["etag"]
+            if cache_entry.get("last_modified", None) is not None:
+                headers["If-Modified-Since"] = cache_entry["last_modified"]
+
+        try:
+            response = self.__session.get(
+                self.__details_url,
+                params=params,
+                headers=headers,
+                timeout=self.__timeout,
+            )
+
+            if response.status_code == 304 and cache_entry is not None:
+                self.__logger.debug("Onionoo details did not change since last time")
+                cache_entry["fetched_at"] = time.time()
+                self.__write_cache(cache_file, cache_entry)
+                return cache_entry["relays"]
+
+            response.raise_for_status()
+            relay_data = response.json()["relays"]
+
+        except Exception as exception:
+            self.__logger.debug("Could not connect to Onionoo: %s", exception)
+            raise OnionooConnectionError from exception
+
+        self.__write_cache(
+            cache_file,
+            {
+                "fetched_at": time.time(),
+                "etag": response.headers.get("ETag", None),
+                "last_modified": response.headers.get("Last-Modified", None),
+                "relays": relay_data,
+            },
+        )
+
+        return relay_data
+
+    def __lookup_details(self, fingerprints: List[str]) -> List[Dict]:
+        """
+        Looks up the details of the given relays
+
+        :param fingerprints: List of relay fingerprints
+        :type fingerprints: List[str]
+        :return: List of relay details
+        :rtype: List[Dict]
+        """
+        # Sorted, so that the same set of relays always hits the same cache entry
+        return self.request_details(
+            {"fields": self.__fields, "lookup": ",".join(sorted(fingerprints))}
+        )
+
+    def get_details(self, fingerprints: List[str]) -> List[Dict]:
+        """
+        Gets the details of the given relays
+
+        :param fingerprints: List of relay fingerprints
+        :type fingerprints: List[str]
+        :return: List of relay details, relays unknown to Onionoo are left out
+        :rtype: List[Dict]
+        """
+        if len(fingerprints) > self.__bulk_threshold:
+            # Download everything at once and filter locally
+            wanted_fingerprints = set(fingerprints)
+            relay_data = self.request_details(
+                {"fields": self.__fields, "type": "relay", "running": "true"}
+            )
+            return [
+                relay
+                for relay in relay_data
+                if relay.get("fingerprint", None) in wanted_fingerprints
+            ]
+
+        batches = [
+            fingerprints[i : i + self.__lookup_batch_size]
+            for i in range(0, len(fingerprints), self.__lookup_batch_size)
+        ]
+
+        if len(batches) <= 1:
+            return [
+                relay for batch in batches for relay in self.__lookup_details(batch)
+            ]
+
+        with ThreadPoolExecutor(max_workers=self.__max_workers) as executor:
+            results: List[List[Dict]] = list(
+                executor.map(self.__lookup_details, batches)
+            )
+
+        return [relay for relay_data in results for relay in relay_data]
+
+    def close(self) -> None:
+        """
+        Closes the connections of the HTTP session
+        """
+        self.__session.close()
+
+
 class Onionoo:
     """
     Uses Onionoo to get the details of the given relay
     """
 
-    def __init__(self, fingerprints: List[str]) -> None:
+    def __init__(
+        self, fingerprints: List[str], client: Optional[OnionooClient] = None
+    ) -> None:
         """
         Initialize, fetch, and parse the details
 
         :param fingerprints: List of BASE64 encoded SHA256 hash of the relays
         :type fingerprints: List[str]
+        :param client: Client used to connect to Onionoo, a new one is created if not given
+        :type client: Optional[OnionooClient]
         """
         # Public class attributes
         self.fingerprint_list: List[str] = fingerprints
         self.relay_entries: List[OnionooRelayEntry] = []
 
         # Private class attributes
-        self.__logger = logging.getLogger(__name__)
-        self.__fingerprint_list_str: str = "".join(
-            f"{str(fpr)}," for fpr in self.fingerprint_list
-        )[:-1]
-        self.__lookup_fields: str = f"fingerprint,nickname,exit_policy_summary,exit_policy_v6_summary,first_seen,last_seen,country,country_name,as,as_name,version,platform&lookup={self.__fingerprint_list_str}"
-        self.__lookup_url: str = (
-            f"https://onionoo.torproject.org/details?fields={self.__lookup_fields}"
-        )
-        self.__relay_data: Dict
+        self.__logger = logging.getLogger(__name__)  # pylint: disable=W0238
+        self.__client: OnionooClient = client or OnionooClient()
+        self.__relay_data: List[Dict]
         self.__onionoo_datetime_format: str = "%Y-%m-%d %H:%M:%S"
         self.__exit_ports: List[int] = [80, 443]
 
@@ -70,16 +350,8 @@ class Onionoo:
     def __get_details(self) -> None:
         """
         Performs a request to Onioon API
-
-        :raises OnionooConnectionError: If cannot connect to the API
         """
-        try:
-            response = json.loads(requests.get(self.__lookup_url).text)
-            self.__relay_data = response["relays"]
-
-        except Exception as exception:
-            self.__logger.debug("Could not connect to Onionoo: %s", exception)
-            raise OnionooConnectionError from exception
+        self.__relay_data = self.__client.get_details(self.fingerprint_list)
 
     def __parse_details_of_relay(self, relay_data: Dict) -> OnionooRelayEntry:
         """
@@ -7,10 +7,10 @@ import traceback
 from typing import Any, List, Tuple, Union, Optional
 
 import docker
-import requests
 from sqlalchemy.orm import sessionmaker
 
 from captchamonitor.utils.config import Config
+from captchamonitor.utils.onionoo import OnionooClient
 from captchamonitor.fetchers.firefox_browser import FirefoxBrowser
 
 # Deep copies objects
@@ -119,16 +119,22 @@ def get_random_exit_relay(
     :return: The exit relay fingerprint
     :rtype: Union[str, List[str]]
     """
-    api_url = "https://onionoo.torproject.org/details?fields=fingerprint,exit_addresses&running=true&type=relay&limit=100"
+    params = {
+        "fields": "fingerprint,exit_addresses",
+        "running": "true",
+        "type": "relay",
+        "limit": "100",
+    }
 
     # Add specified options
     if country is not None:
-        api_url += f"&country={country}"
+        params["country"] = country
 
-    result = requests.get(api_url).json()
+    # Cached, since Onionoo updates the details hourly at most
+    relays = OnionooClient().request_details(params)
 
     exit_relay_fingerprints = [
-        relay["fingerprint"] for relay in result["relays"] if "exit_addresses" in relay
+        relay["fingerprint"] for relay in relays if "exit_addresses" in relay
     ]
 
     if multiple:
@@ -1,12 +1,14 @@
 import time
 import random
 import logging
-from typing import Any, List, Optional
+import threading
+from typing import Any, Dict, List, Optional
+from dataclasses import field, dataclass
 
 import docker
 import port_for
 import stem.control
-from stem import SocketError, DescriptorUnavailable
+from stem import CircStatus, SocketError, ControllerError, DescriptorUnavailable
 from stem.control import Controller
 from stem.util.log import get_logger
 
@@ -19,17 +21,86 @@ from captchamonitor.utils.exceptions import (
 from captchamonitor.utils.small_scripts import hasattr_private
 
 
+@dataclass
+class CircuitBuildStats:
+    """
+    Stores circuit build statistics of an exit relay
+
+    :param built: Number of circuits built successfully
+    :type built: int
+    :param failed: Number of circuits that failed to build
+    :type failed: int
+    :param total_build_time: Total time in seconds spent on building the successful circuits
+    :type total_build_time: float
+    """
+
+    built: int = 0
+    failed: int = 0
+    total_build_time: float = 0.0
+
+    @property
+    def average_build_time(self) -> float:
+        """
+        Returns the average time it took to build a circuit
+
+        :return: Average build time in seconds, 0 if no circuits were built
+        :rtype: float
+        """
+        if self.built == 0:
+            return 0.0
+        return self.total_build_time / self.built
+
+
+@dataclass
+class PrebuiltCircuit:
+    """
+    Stores a circuit that is being built in the background
+
+    :param circuit_id: ID of the circuit assigned by Tor
+    :type circuit_id: str
+    :param exit_relay: Fingerprint of the exit relay of the circuit
+    :type exit_relay: str
+    :param started_at: The time the circuit build was started at
+    :type started_at: float
+    :param done: Set when the circuit is built or failed
+    :type done: threading.Event
+    :param failed: Whether the circuit failed or was closed
+    :type failed: bool
+    """
+
+    circuit_id: str
+    exit_relay: str
+    started_at: float
+    done: threading.Event = field(default_factory=threading.Event)
+    failed: bool = False
+
+
 class TorLauncher:
     """
     Launch Tor with given configuration values
     """
 
-    def __init__(self, config: Config) -> None:
+    def __init__(
+        self,
+        config: Config,
+        relay_descriptors_ttl: int = 900,
+        circuit_build_timeout: int = 60,
+        max_prebuilt_circuits: int = 10,
+        prebuilt_circuit_max_age: float = 600,
+    ) -> None:
         """
         Initialize Tor Launcher
 
         :param config: The config class instance that contains global configuration values
         :type config: Config
+        :param relay_descriptors_ttl: Number of seconds the relay descriptors are reused before refreshing, defaults to 900
+        :type relay_descriptors_ttl: int
+        :param circuit_build_timeout: Number of seconds to wait for a prebuilt circuit, defaults to 60
+        :type circuit_build_timeout: int
+        :param max_prebuilt_circuits: Maximum number of circuits to build ahead of time, defaults to 10
+        :type max_prebuilt_circuits: int
+        :param prebuilt_circuit_max_age: Number of seconds a prebuilt circuit is kept if no job takes it, defaults to 600
+        :type prebuilt_circuit_max_age: float
         :raises TorLauncherInitError: If Tor launcher wasn't able connect to the Tor container
         """
         # Public class attributes
@@ -37,6 +108,7 @@ class TorLauncher:
         self.socks_port: int
         self.control_port: int
         self.relay_fingerprints: List[Any]
+        self.circuit_build_stats: Dict[str, CircuitBuildStats] = {}
 
         # Private class attributes
         self.__logger = logging.getLogger(__name__)
@@ -44,6 +116,13 @@ class TorLauncher:
         self.__circuit_id: Controller.new_circuit
         self.__num_retries_on_fail: int = 3
         self.__delay_in_seconds_between_retries: int = 3
+        self.__relay_descriptors_ttl: int = relay_descriptors_ttl
+        self.__relay_descriptors_updated_at: float = 0.0
+        self.__circuit_build_timeout: int = circuit_build_timeout
+        self.__max_prebuilt_circuits: int = max_prebuilt_circuits
+        self.__prebuilt_circuits: Dict[str, PrebuiltCircuit] = {}
+        self.__prebuilt_circuit_max_age: float = prebuilt_circuit_max_age
+        self.__circuits_lock: threading.Lock = threading.Lock()
 
         try:
             self.__docker_network_name = self.__config["docker_network"]
@@ -60,6 +139,12 @@ class TorLauncher:
         self.__launch_tor_container()
         self.__bind_stem_to_tor_container()
 
+        # Keep track of the circuits built in the background
+        # pylint: disable=E1101
+        self.__controller.add_event_listener(
+            self.__handle_circuit_event, stem.control.EventType.CIRC
+        )
+
     def __launch_tor_container(self) -> None:
         """
         Launches a new Tor container with the given configuration
@@ -186,6 +271,7 @@ class TorLauncher:
                     desc.fingerprint
                     for desc in self.__controller.get_network_statuses()
                 ]
+                self.__relay_descriptors_updated_at = time.time()
                 connected = True
                 break
 
@@ -211,32 +297,254 @@ class TorLauncher:
         if stream.status == "NEW":
             self.__controller.attach_stream(stream.id, self.__circuit_id)
 
+    def __get_relay_fingerprints(self) -> List[Any]:
+        """
+        Returns the relay fingerprints, refreshes the relay descriptors only if
+        the cached copy is older than the configured TTL
+
+        :return: List of relay fingerprints
+        :rtype: List[Any]
+        """
+        age = time.time() - self.__relay_descriptors_updated_at
+        if age > self.__relay_descriptors_ttl:
+            self.update_relay_descriptors()
+
+        return self.relay_fingerprints
+
+    def __choose_guard_relay(self, exit_relay: str) -> str:
+        """
+        Randomly chooses a guard relay that is not the same as the exit relay
+
+        :param exit_relay: Fingerprint of the exit relay to use
+        :type exit_relay: str
+        :return: Fingerprint of the guard relay
+        :rtype: str
+        """
+        relay_fingerprints = self.__get_relay_fingerprints()
+
+        while True:
+            guard_relay = random.choice(relay_fingerprints)
+            # Make sure the chosen guard relay is not same as the exit relay
+            if guard_relay != exit_relay:
+                return str(guard_relay)
+
+    def __record_circuit_build(
+        self, exit_relay: str, build_time: Optional[float]
+    ) -> None:
+        """
+        Updates the circuit build statistics of the given exit relay
+
+        :param exit_relay: Fingerprint of the exit relay
+        :type exit_relay: str
+        :param build_time: Time in seconds it took to build the circuit, None if the build failed
+        :type build_time: Optional[float]
+        """
+        with self.__circuits_lock:
+            stats = self.circuit_build_stats.setdefault(exit_relay, CircuitBuildStats())
+            if build_time is None:
+                stats.failed += 1
+            else:
+                stats.built += 1
+                stats.total_build_time += build_time
+
+    # pylint: disable=E1101
+    def __handle_circuit_event(self, event: stem.control.EventType.CIRC) -> None:
+        """
+        Marks the circuits built in the background as ready or failed
+
+        :param event: stem.control.EventType.CIRC
+        :type event: stem.control.EventType.CIRC
+        """
+        with self.__circuits_lock:
+            circuits = [
+                circuit
+                for circuit in self.__prebuilt_circuits.values()
+                if circuit.circuit_id == event.id
+            ]
+
+        for circuit in circuits:
+            self.__set_prebuilt_circuit_status(circuit, event.status)
+
+    def __set_prebuilt_circuit_status(
+        self, circuit: PrebuiltCircuit, status: CircStatus
+    ) -> None:
+        """
+        Marks the given circuit built in the background as ready or failed,
+        records its build only once even if the status is reported twice
+
+        :param circuit: The circuit built in the background
+        :type circuit: PrebuiltCircuit
+        :param status: The latest status of the circuit reported by Tor
+        :type status: CircStatus
+        """
+        with self.__circuits_lock:
+            was_done = circuit.done.is_set()
+
+            if status == CircStatus.BUILT:
+                circuit.done.set()
+
+            elif status in (CircStatus.FAILED, CircStatus.CLOSED):
+                # Tor won't let us use this circuit anymore
+                circuit.failed = True
+                circuit.done.set()
+
+                if self.__prebuilt_circuits.get(circuit.exit_relay) is circuit:
+                    del self.__prebuilt_circuits[circuit.exit_relay]
+
+            else:
+                return
+
+        if not was_done:
+            build_time = None if circuit.failed else time.time() - circuit.started_at
+            self.__record_circuit_build(circuit.exit_relay, build_time)
+
+    def __evict_stale_prebuilt_circuits(self) -> None:
+        """
+        Closes the prebuilt circuits that no job took within the maximum age,
+        for example because the job failed or was claimed by another worker,
+        so that they don't take the slots of the upcoming jobs
+        """
+        oldest_allowed = time.time() - self.__prebuilt_circuit_max_age
+
+        with self.__circuits_lock:
+            stale_circuits = [
+                circuit
+                for circuit in self.__prebuilt_circuits.values()
+                if circuit.started_at < oldest_allowed
+            ]
+            for circuit in stale_circuits:
+                del self.__prebuilt_circuits[circuit.exit_relay]
+
+        for circuit in stale_circuits:
+            self.__logger.debug("Closing the stale circuit to %s", circuit.exit_relay)
+
+            try:
+                self.__controller.close_circuit(circuit.circuit_id)
+
+            except ControllerError as exception:
+                # Tor might have closed it already
+                self.__logger.debug(
+                    "Could not close the circuit to %s: %s",
+                    circuit.exit_relay,
+                    exception,
+                )
+
+    def prebuild_circuits_to(self, exit_relays: List[str]) -> None:
+        """
+        Starts building circuits to the given exit relays in the background, so
+        that they are ready by the time the jobs that use them start. Prebuilt
+        circuits that were never taken are closed once they get too old.
+
+        :param exit_relays: Fingerprints of the exit relays of the upcoming jobs
+        :type exit_relays: List[str]
+        """
+        self.__evict_stale_prebuilt_circuits()
+
+        for exit_relay in exit_relays:
+            with self.__circuits_lock:
+                if exit_relay in self.__prebuilt_circuits:
+                    continue
+                if len(self.__prebuilt_circuits) >= self.__max_prebuilt_circuits:
+                    return
+
+            try:
+                guard_relay = self.__choose_guard_relay(exit_relay)
+                started_at = time.time()
+                circuit_id = self.__controller.new_circuit(
+                    [guard_relay, exit_relay], await_build=False
+                )
+
+            except (ControllerError, StemDescriptorUnavailableError) as exception:
+                self.__logger.debug(
+                    "Could not start building a circuit to %s: %s",
+                    exit_relay,
+                    exception,
+                )
+                self.__record_circuit_build(exit_relay, None)
+                continue
+
+            circuit = PrebuiltCircuit(
+                circuit_id=circuit_id, exit_relay=exit_relay, started_at=started_at
+            )
+
+            with self.__circuits_lock:
+                self.__prebuilt_circuits[exit_relay] = circuit
+
+            # The circuit events that arrived before we knew the circuit ID
+            # were ignored, so catch up with its current status
+            try:
+                status = self.__controller.get_circuit(circuit_id, None)
+            except ControllerError:
+                continue
+
+            self.__set_prebuilt_circuit_status(
+                circuit, CircStatus.CLOSED if status is None else status.status
+            )
+
+    def __take_prebuilt_circuit(self, exit_relay: str) -> Optional[str]:
+        """
+        Hands out the circuit prebuilt to the given exit relay, waits for it if
+        it is still being built
+
+        :param exit_relay: Fingerprint of the exit relay to use
+        :type exit_relay: str
+        :return: ID of the ready circuit, None if there isn't a usable one
+        :rtype: Optional[str]
+        """
+        with self.__circuits_lock:
+            circuit = self.__prebuilt_circuits.pop(exit_relay, None)
+
+        if circuit is None:
+            return None
+
+        if not circuit.done.wait(timeout=self.__circuit_build_timeout):
+            self.__logger.debug("Prebuilt circuit to %s timed out", exit_relay)
+            return None
+
+        if circuit.failed:
+            return None
+
+        return circuit.circuit_id
+
     def create_new_circuit_to(
         self, exit_relay: str, guard_relay: Optional[str] = None
     ) -> None:
         """
         Create a two hop circuit between a guard relay and an exit relay. Uses the
         given exit relay and randomly chooses a guard relay if not provided one.
+        Uses the circuit prebuilt to the exit relay if there is one.
 
         :param exit_relay: Fingerprint of the exit relay to use
         :type exit_relay: str
         :param guard_relay: Fingerprint of the guard relay to use, defaults to None
         :type guard_relay: str, optional
+        :raises ControllerError: If the circuit couldn't be built
         """
-        # Get a fresh copy of the descriptors
-        self.update_relay_descriptors()
+        circuit_id = None
 
-        # Choose a guard relay randomly if not specified
+        # Prebuilt circuits use random guards, so only use them if that is fine
         if guard_relay is None:
-            while True:
-                guard_relay = random.choice(self.relay_fingerprints)
-                # Make sure the chosen guard relay is not same as the exit relay
-                if guard_relay != exit_relay:
-                    break
-
-        self.__circuit_id = self.__controller.new_circuit(
-            [guard_relay, exit_relay], await_build=True
-        )
+            circuit_id = self.__take_prebuilt_circuit(exit_relay)
+
+        if circuit_id is not None:
+            self.__logger.debug("Using the prebuilt circuit to %s", exit_relay)
+            self.__circuit_id = circuit_id
+
+        else:
+            # Choose a guard relay randomly if not specified
+            if guard_relay is None:
+                guard_relay = self.__choose_guard_relay(exit_relay)
+
+            started_at = time.time()
+            try:
+                self.__circuit_id = self.__controller.new_circuit(
+                    [guard_relay, exit_relay], await_build=True
+                )
+            except ControllerError:
+                self.__record_circuit_build(exit_relay, None)
+                raise
+
+            self.__record_circuit_build(exit_relay, time.time() - started_at)
 
         # pylint: disable=E1101
         self.__controller.add_event_listener(
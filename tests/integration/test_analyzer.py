@@ -3,8 +3,15 @@
 import pytest
 
 from captchamonitor.core.worker import Worker
-from captchamonitor.utils.models import FetchQueue, FetchCompleted, AnalyzeCompleted
+from captchamonitor.utils.models import (
+    Blob,
+    MetaData,
+    FetchQueue,
+    FetchCompleted,
+    AnalyzeCompleted,
+)
 from captchamonitor.core.analyzer import Analyzer
+from captchamonitor.utils.small_scripts import deep_copy
 
 
 @pytest.fixture()
@@ -103,3 +110,154 @@ class TestAnalyzer:
 
         # Consensus Lite Captcha is not executed as site isn't suspicious
         assert db_session.query(AnalyzeCompleted).first().consensus_lite_captcha is None
+
+    @staticmethod
+    def test_analyzer_incremental(config, db_session):
+        analyzer = Analyzer(
+            analyzer_id="0",
+            config=config,
+            db_session=db_session,
+            loop=False,
+        )
+
+        analyzer.process_next_batch_of_domains()
+        assert db_session.query(AnalyzeCompleted).count() == 1
+
+        # Already analyzed fetches shouldn't be analyzed again
+        analyzer.process_next_batch_of_domains()
+        assert db_session.query(AnalyzeCompleted).count() == 1
+
+        watermark = (
+            db_session.query(MetaData)
+            .filter(MetaData.key == "analyzer_last_fetch_completed_id")
+            .one()
+            .value
+        )
+        assert watermark == db_session.query(AnalyzeCompleted).one().fetch_completed_id
+
+    @staticmethod
+    def test_analyzer_waiting_for_non_tor(config, db_session, tor_browser_id):
+        # pylint: disable=W0143
+        analyzed_tor_fetch = (
+            db_session.query(FetchCompleted)
+            .filter(FetchCompleted.fetcher_id == tor_browser_id)
+            .one()
+        )
+
+        def add_tor_fetch(domain_id):
+            tor_fetch = FetchCompleted(
+                url=analyzed_tor_fetch.url,
+                fetcher_id=tor_browser_id,
+                domain_id=domain_id,
+                relay_id=1,
+                captcha_monitor_version=analyzed_tor_fetch.captcha_monitor_version,
+                html_data_hash=analyzed_tor_fetch.html_data_hash,
+                html_data_size=analyzed_tor_fetch.html_data_size,
+                http_requests_hash=analyzed_tor_fetch.http_requests_hash,
+                http_requests_size=analyzed_tor_fetch.http_requests_size,
+            )
+            db_session.add(tor_fetch)
+            db_session.commit()
+            return tor_fetch.id
+
+        def get_watermark():
+            return (
+                db_session.query(MetaData)
+                .filter(MetaData.key == "analyzer_last_fetch_completed_id")
+                .one()
+                .value
+            )
+
+        # There is no non-Tor fetch of the second domain
+        waiting_tor_fetch_id = add_tor_fetch(2)
+        add_tor_fetch(1)
+
+        analyzer = Analyzer(
+            analyzer_id="0",
+            config=config,
+            db_session=db_session,
+            loop=False,
+            batch_size=1,
+        )
+
+        # The waiting fetch doesn't hold back the ones after it
+        analyzer.process_next_batch_of_domains()
+        analyzer.process_next_batch_of_domains()
+        assert db_session.query(AnalyzeCompleted).count() == 2
+        assert get_watermark() < waiting_tor_fetch_id
+
+        # The waiting fetch is skipped once it waited too long
+        Analyzer(
+            analyzer_id="0",
+            config=config,
+            db_session=db_session,
+            loop=False,
+            non_tor_fetch_max_wait=0,
+        ).process_next_batch_of_domains()
+        assert db_session.query(AnalyzeCompleted).count() == 2
+        assert get_watermark() >= waiting_tor_fetch_id
+
+    @staticmethod
+    def test_analyzer_broken_payload(config, db_session, tor_browser_id):
+        # pylint: disable=W0143
+        analyzed_tor_fetch = (
+            db_session.query(FetchCompleted)
+            .filter(FetchCompleted.fetcher_id == tor_browser_id)
+            .one()
+        )
+
+        # A Tor fetch whose stored HTML data can't be decompressed
+        db_session.add(Blob(sha256="0" * 64, size=1, data=b"broken"))
+        broken_tor_fetch = FetchCompleted(
+            url=analyzed_tor_fetch.url,
+            fetcher_id=tor_browser_id,
+            domain_id=1,
+            relay_id=1,
+            captcha_monitor_version=analyzed_tor_fetch.captcha_monitor_version,
+            html_data_hash="0" * 64,
+            html_data_size=1,
+            http_requests_hash=analyzed_tor_fetch.http_requests_hash,
+            http_requests_size=analyzed_tor_fetch.http_requests_size,
+        )
+        db_session.add(broken_tor_fetch)
+        db_session.commit()
+
+        Analyzer(
+            analyzer_id="0",
+            config=config,
+            db_session=db_session,
+            loop=False,
+        ).process_next_batch_of_domains()
+
+        # The broken fetch is recorded without results and isn't retried
+        analyze_completed = (
+            db_session.query(AnalyzeCompleted)
+            .filter(AnalyzeCompleted.fetch_completed_id == broken_tor_fetch.id)
+            .one()
+        )
+        assert analyze_completed.status_check is None
+        assert analyze_completed.captcha_checker is None
+        assert db_session.query(AnalyzeCompleted).count() == 2
+
+        watermark = (
+            db_session.query(MetaData)
+            .filter(MetaData.key == "analyzer_last_fetch_completed_id")
+            .one()
+            .value
+        )
+        assert watermark >= broken_tor_fetch.id
+
+    @staticmethod
+    def test_analyzer_multiple_processes(config, db_session):
+        test_config = deep_copy(config)
+        test_config["analyzer_worker_count"] = 2
+
+        Analyzer(
+            analyzer_id="0",
+            config=test_config,
+            db_session=db_session,
+            loop=False,
+        ).process_next_batch_of_domains()
+
+        assert db_session.query(AnalyzeCompleted).count() == 1
+        assert db_session.query(AnalyzeCompleted).first().captcha_checker == 0
@@ -0,0 +1,41 @@
+# pylint: disable=C0115,C0116,W0212
+
+from captchamonitor.utils.models import Blob
+from captchamonitor.utils.blob_store import BlobStore
+
+
+class TestBlobStore:
+    @staticmethod
+    def test_blob_store_put_and_get(db_session):
+        blob_store = BlobStore(db_session)
+        payload = "<html><body>Hello, world!</body></html>"
+
+        sha256, size = blob_store.put(payload)
+        db_session.commit()
+
+        assert len(sha256) == 64
+        assert size == len(payload)
+        assert blob_store.get(sha256) == payload
+
+    @staticmethod
+    def test_blob_store_dedupe(db_session):
+        blob_store = BlobStore(db_session)
+        payload = "<html>" + "a" * 10000 + "</html>"
+
+        first_hash, _ = blob_store.put(payload)
+        second_hash, _ = blob_store.put(payload)
+        db_session.commit()
+
+        assert first_hash == second_hash
+        assert db_session.query(Blob).filter(Blob.sha256 == first_hash).count() == 1
+
+        # Should be stored compressed
+        blob = db_session.query(Blob).filter(Blob.sha256 == first_hash).one()
+        assert len(blob.data) < len(payload)
+
+    @staticmethod
+    def test_blob_store_none(db_session):
+        blob_store = BlobStore(db_session)
+
+        assert blob_store.put(None) == (None, None)
+        assert blob_store.get("0" * 64) is None
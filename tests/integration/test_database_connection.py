@@ -1,7 +1,11 @@
 # pylint: disable=C0115,C0116,W0212
 
+import json
+
 import pytest
+from sqlalchemy import inspect
 
+from captchamonitor.utils.models import FetchCompleted
 from captchamonitor.utils.database import Database
 from captchamonitor.utils.exceptions import DatabaseInitError
 
@@ -17,6 +21,70 @@ class TestDatabaseConnection:
             config["db_password"],
         )
 
+    @staticmethod
+    def test_upgrade_schema(config):
+        database = Database(
+            config["db_host"],
+            config["db_port"],
+            config["db_name"],
+            config["db_user"],
+            config["db_password"],
+        )
+
+        # Simulate a database created before the column was introduced
+        with database.engine.begin() as connection:
+            connection.execute("ALTER TABLE fetch_queue DROP COLUMN claimed_at")
+
+        database = Database(
+            config["db_host"],
+            config["db_port"],
+            config["db_name"],
+            config["db_user"],
+            config["db_password"],
+        )
+
+        columns = inspect(database.engine).get_columns("fetch_queue")
+        assert "claimed_at" in [column["name"] for column in columns]
+
+    @staticmethod
+    @pytest.mark.usefixtures("insert_domains_fetchers_relays_proxies")
+    def test_move_payloads_to_blobs(config, db_session, firefox_id):
+        html_data = "<html><body>Hello, world!</body></html>"
+        http_requests = json.dumps({"log": {"entries": []}})
+
+        # Simulate a fetch stored before the payloads were moved into blobs
+        db_session.execute(
+            "ALTER TABLE fetch_completed ADD COLUMN html_data VARCHAR, "
+            "ADD COLUMN http_requests JSON"
+        )
+        db_session.execute(
+            "INSERT INTO fetch_completed (created_at, captcha_monitor_version, "
+            "fetcher_id, domain_id, url, html_data, http_requests) VALUES "
+            "(now(), '0', :fetcher_id, 1, 'https://check.torproject.org', "
+            ":html_data, :http_requests)",
+            {
+                "fetcher_id": firefox_id,
+                "html_data": html_data,
+                "http_requests": json.dumps(http_requests),
+            },
+        )
+        db_session.commit()
+
+        database = Database(
+            config["db_host"],
+            config["db_port"],
+            config["db_name"],
+            config["db_user"],
+            config["db_password"],
+        )
+
+        fetch_completed = db_session.query(FetchCompleted).one()
+        assert fetch_completed.html_data == html_data
+        assert fetch_completed.http_requests == http_requests
+
+        columns = inspect(database.engine).get_columns("fetch_completed")
+        assert "html_data" not in [column["name"] for column in columns]
+
     @staticmethod
     def test_connection_with_wrong_credentials():
         with pytest.raises(DatabaseInitError):
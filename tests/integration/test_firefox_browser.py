@@ -25,6 +25,101 @@ class TestFirefoxBrowser:
 
         firefox_browser.close()
 
+    def test_firefox_browser_reuse_session(self, config):
+        session_ids = []
+
+        for _ in range(2):
+            firefox_browser = FirefoxBrowser(
+                config=config,
+                url=self.target_url,
+                explicit_wait_duration=0,
+                reuse_session=True,
+            )
+
+            firefox_browser.setup()
+            firefox_browser.connect()
+            firefox_browser.fetch()
+
+            assert "Sorry. You are not using Tor." in firefox_browser.page_source
+
+            session_ids.append(firefox_browser.driver.session_id)
+            firefox_browser.close()
+
+        # The second fetch should have used the warm session
+        assert session_ids[0] == session_ids[1]
+
+        firefox_browser.discard_pooled_session()
+
+    def test_firefox_browser_reuse_session_clean_state(self, config):
+        page_cookies = []
+
+        for _ in range(2):
+            firefox_browser = FirefoxBrowser(
+                config=config,
+                url=self.target_url,
+                explicit_wait_duration=0,
+                reuse_session=True,
+            )
+
+            firefox_browser.setup()
+            firefox_browser.connect()
+            firefox_browser.fetch()
+
+            page_cookies.append(firefox_browser.page_cookies)
+            firefox_browser.driver.add_cookie({"name": "reused", "value": "1"})
+            firefox_browser.close()
+
+        # The cookies of the first fetch shouldn't be visible to the second one
+        assert firefox_browser._session_reused
+        assert "reused" not in [cookie["name"] for cookie in page_cookies[1]]
+
+        firefox_browser.discard_pooled_session()
+
+    def test_firefox_browser_reuse_session_other_exit_relay(self, config):
+        session_ids = []
+
+        for exit_relay in ("A" * 40, "B" * 40):
+            firefox_browser = FirefoxBrowser(
+                config=config,
+                url=self.target_url,
+                explicit_wait_duration=0,
+                reuse_session=True,
+                exit_relay=exit_relay,
+            )
+
+            firefox_browser.setup()
+            firefox_browser.connect()
+            firefox_browser.fetch()
+
+            session_ids.append(firefox_browser.driver.session_id)
+            firefox_browser.close()
+
+        # Sessions are not reused for jobs exiting through another relay
+        assert session_ids[0] != session_ids[1]
+
+        firefox_browser.discard_pooled_session()
+
+    def test_firefox_browser_cached_profile(self, config):
+        firefox_browser_1 = FirefoxBrowser(config=config, url=self.target_url)
+        firefox_browser_1.setup()
+        encoded_profile_1 = firefox_browser_1._selenium_options.profile.encoded
+
+        firefox_browser_2 = FirefoxBrowser(config=config, url=self.target_url)
+        firefox_browser_2.setup()
+        encoded_profile_2 = firefox_browser_2._selenium_options.profile.encoded
+
+        # The second fetcher should have used the cached profile
+        assert encoded_profile_1 == encoded_profile_2
+        assert firefox_browser_1._get_session_key() in FirefoxBrowser._profile_cache
+
+        # Fetchers with different settings should get a different profile
+        firefox_browser_3 = FirefoxBrowser(
+            config=config, url=self.target_url, disable_cookies=True
+        )
+        firefox_browser_3.setup()
+
+        assert firefox_browser_3._selenium_options.profile.encoded != encoded_profile_1
+
     def test_firefox_browser_with_tor(self, config, tor_proxy):
         firefox_browser = FirefoxBrowser(
             config=config,
@@ -22,3 +22,42 @@ class TestTorLauncher:
         # Try intializing
         with pytest.raises(TorLauncherInitError):
             TorLauncher(test_config)
+
+    @staticmethod
+    def test_tor_launcher_prebuilt_circuit(config):
+        tor_launcher = TorLauncher(config)
+        exit_relay = tor_launcher.relay_fingerprints[0]
+        prebuilt_circuits = tor_launcher._TorLauncher__prebuilt_circuits
+
+        tor_launcher.prebuild_circuits_to([exit_relay])
+        assert exit_relay in prebuilt_circuits
+        circuit_id = prebuilt_circuits[exit_relay].circuit_id
+
+        # The prebuilt circuit is handed out to the job
+        tor_launcher.create_new_circuit_to(exit_relay)
+        tor_launcher.reset_configuration()
+
+        assert exit_relay not in prebuilt_circuits
+        assert tor_launcher._TorLauncher__circuit_id == circuit_id
+
+        stats = tor_launcher.circuit_build_stats[exit_relay]
+        assert stats.built == 1
+        assert stats.average_build_time > 0
+
+    @staticmethod
+    def test_evict_stale_prebuilt_circuits(config):
+        tor_launcher = TorLauncher(
+            config, max_prebuilt_circuits=1, prebuilt_circuit_max_age=0
+        )
+        controller = tor_launcher._TorLauncher__controller
+        prebuilt_circuits = tor_launcher._TorLauncher__prebuilt_circuits
+        first_exit_relay, second_exit_relay = tor_launcher.relay_fingerprints[:2]
+
+        tor_launcher.prebuild_circuits_to([first_exit_relay])
+        circuit_id = prebuilt_circuits[first_exit_relay].circuit_id
+
+        # The circuit nobody took doesn't keep the only slot
+        tor_launcher.prebuild_circuits_to([second_exit_relay])
+
+        assert list(prebuilt_circuits.keys()) == [second_exit_relay]
+        assert controller.get_circuit(circuit_id, None) is None
@@ -0,0 +1,66 @@
+# pylint: disable=C0115,C0116,W0212
+
+import pytest
+from sqlalchemy import func
+
+from captchamonitor.utils.models import (
+    FetchCompleted,
+    AnalyzeCompleted,
+    AnalyzeDailyRollup,
+)
+from captchamonitor.core.update_analyze_rollup import UpdateAnalyzeRollup
+
+
+def insert_analyzed_fetch(db_session, fetcher_id, status_check):
+    fetch = FetchCompleted(
+        url="https://check.torproject.org",
+        captcha_monitor_version="1",
+        fetcher_id=fetcher_id,
+        domain_id=1,
+        relay_id=1,
+    )
+    db_session.add(fetch)
+    db_session.flush()
+
+    db_session.add(
+        AnalyzeCompleted(
+            fetch_completed_id=fetch.id,
+            status_check=status_check,
+            dom_analyze=4,
+            captcha_checker=0,
+        )
+    )
+    db_session.commit()
+
+
+@pytest.mark.usefixtures("insert_domains_fetchers_relays_proxies")
+class TestUpdateAnalyzeRollup:
+    @staticmethod
+    def test_update_analyze_rollup(config, db_session, tor_browser_id):
+        insert_analyzed_fetch(db_session, tor_browser_id, 0)
+        insert_analyzed_fetch(db_session, tor_browser_id, 0)
+        insert_analyzed_fetch(db_session, tor_browser_id, 1)
+
+        UpdateAnalyzeRollup(config=config, db_session=db_session)
+
+        rollup = db_session.query(AnalyzeDailyRollup)
+        assert rollup.count() == 2
+        assert rollup.filter(AnalyzeDailyRollup.status_check == 0).one().count == 2
+        assert rollup.filter(AnalyzeDailyRollup.status_check == 1).one().count == 1
+
+    @staticmethod
+    def test_update_analyze_rollup_incremental(config, db_session, tor_browser_id):
+        insert_analyzed_fetch(db_session, tor_browser_id, 0)
+        UpdateAnalyzeRollup(config=config, db_session=db_session)
+
+        # Running again without new analyses shouldn't change anything
+        UpdateAnalyzeRollup(config=config, db_session=db_session)
+        assert db_session.query(AnalyzeDailyRollup).count() == 1
+
+        # New analyses on the same day should update the existing counts
+        insert_analyzed_fetch(db_session, tor_browser_id, 0)
+        UpdateAnalyzeRollup(config=config, db_session=db_session)
+
+        total = db_session.query(func.sum(AnalyzeDailyRollup.count)).scalar()
+        assert db_session.query(AnalyzeDailyRollup).count() == 1
+        assert total == 2
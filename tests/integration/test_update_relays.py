@@ -92,3 +92,48 @@ class TestUpdateRelays:
         # Make sure there still only one relay
         assert db_relay_query.count() == 1
         assert db_relay_query.first().fingerprint == self.csailmitexit_fpr
+        assert db_relay_query.first().updated_at is not None
+
+    def test__insert_batch_into_db_leaves_commit_to_caller(self, config, db_session):
+        update_relays = UpdateRelays(
+            config=config, db_session=db_session, auto_update=False
+        )
+        onionoo_relay_data = Onionoo([self.csailmitexit_fpr]).relay_entries
+        parsed_consensus = {self.csailmitexit_fpr: self.consensus_relay_entry}
+
+        update_relays._UpdateRelays__insert_batch_into_db(
+            onionoo_relay_data, parsed_consensus
+        )
+        assert db_session.query(Relay).count() == 1
+
+        # The batch is part of the update's transaction
+        db_session.rollback()
+        assert db_session.query(Relay).count() == 0
+
+    @staticmethod
+    def test_update_relay_statuses(config, db_session):
+        update_relays = UpdateRelays(
+            config=config, db_session=db_session, auto_update=False
+        )
+
+        db_session.add(Relay(fingerprint="A", status=False))
+        db_session.add(Relay(fingerprint="B", status=True))
+        db_session.commit()
+
+        update_relays._UpdateRelays__update_relay_statuses(["A"])
+
+        statuses = dict(db_session.query(Relay.fingerprint, Relay.status).all())
+        assert statuses == {"A": True, "B": False}
+
+    @staticmethod
+    def test_save_signatures(config, db_session):
+        update_relays = UpdateRelays(
+            config=config, db_session=db_session, auto_update=False
+        )
+
+        assert update_relays._UpdateRelays__get_previous_signatures() == {}
+
+        update_relays._UpdateRelays__save_signatures({"A": "digest"})
+        update_relays._UpdateRelays__save_signatures({"B": "digest"})
+
+        assert update_relays._UpdateRelays__get_previous_signatures() == {"B": "digest"}
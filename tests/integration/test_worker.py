@@ -4,6 +4,7 @@ import pytest
 
 from captchamonitor.core.worker import Worker
 from captchamonitor.utils.models import FetchQueue, FetchFailed, FetchCompleted
+from captchamonitor.utils.small_scripts import deep_copy
 
 
 @pytest.mark.usefixtures("insert_domains_fetchers_relays_proxies")
@@ -41,6 +42,11 @@ class TestWorker:
         assert db_job.count() != 0
         assert db_job.first().url == "https://check.torproject.org"
 
+        # The payloads should be loaded lazily from the blob store
+        html_data = db_job.first().html_data
+        assert db_job.first().html_data_size == len(html_data.encode("utf-8"))
+        assert db_job.first().http_requests is not None
+
     @staticmethod
     def test_worker_single_run_without_tor_fail(config, db_session, firefox_id):
         worker = Worker(
@@ -153,3 +159,108 @@ class TestWorker:
 
         # Process the job, shouldn't rise any errors
         worker.process_next_job()
+
+    @staticmethod
+    def test_worker_claim_jobs(config, db_session, firefox_id):
+        worker_0 = Worker(
+            worker_id="0",
+            config=config,
+            db_session=db_session,
+            loop=False,
+        )
+        worker_1 = Worker(
+            worker_id="1",
+            config=config,
+            db_session=db_session,
+            loop=False,
+        )
+
+        # Insert jobs
+        for _ in range(3):
+            db_session.add(
+                FetchQueue(
+                    url="https://check.torproject.org",
+                    fetcher_id=firefox_id,
+                    domain_id=1,
+                )
+            )
+        db_session.commit()
+
+        # Lease the jobs in batches
+        claimed_0 = worker_0.claim_jobs(batch_size=2)
+        claimed_1 = worker_1.claim_jobs(batch_size=2)
+
+        assert len(claimed_0) == 2
+        assert len(claimed_1) == 1
+        assert set(claimed_0).isdisjoint(claimed_1)
+
+        # Nothing is left to claim
+        assert len(worker_1.claim_jobs(batch_size=2)) == 0
+
+    @staticmethod
+    def test_worker_claim_jobs_with_expired_lease(config, db_session, firefox_id):
+        test_config = deep_copy(config)
+        test_config["job_lease_duration"] = 0
+
+        worker_0 = Worker(
+            worker_id="0",
+            config=test_config,
+            db_session=db_session,
+            loop=False,
+        )
+        worker_1 = Worker(
+            worker_id="1",
+            config=test_config,
+            db_session=db_session,
+            loop=False,
+        )
+
+        # Insert a job
+        db_session.add(
+            FetchQueue(
+                url="https://check.torproject.org",
+                fetcher_id=firefox_id,
+                domain_id=1,
+            )
+        )
+        db_session.commit()
+
+        # The lease expires immediately, so the other worker can take over the job
+        claimed_0 = worker_0.claim_jobs()
+        claimed_1 = worker_1.claim_jobs()
+
+        assert claimed_0 == claimed_1
+        assert db_session.query(FetchQueue).first().claimed_by == "1"
+
+    @staticmethod
+    def test_worker_skips_lost_job(config, db_session, firefox_id):
+        worker = Worker(
+            worker_id="0",
+            config=config,
+            db_session=db_session,
+            loop=False,
+        )
+
+        # Insert a job
+        db_session.add(
+            FetchQueue(
+                url="https://check.torproject.org",
+                fetcher_id=firefox_id,
+                domain_id=1,
+            )
+        )
+        db_session.commit()
+
+        assert len(worker.claim_jobs()) == 1
+
+        # Another worker takes the job over before we get to it
+        db_session.query(FetchQueue).update({FetchQueue.claimed_by: "1"})
+        db_session.commit()
+
+        worker._Worker__claimed_job_ids = [db_session.query(FetchQueue).one().id]
+        worker.process_next_job()
+
+        # The job is left to the other worker
+        assert db_session.query(FetchQueue).one().claimed_by == "1"
+        assert db_session.query(FetchCompleted).count() == 0
+        assert db_session.query(FetchFailed).count() == 0
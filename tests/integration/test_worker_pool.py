@@ -0,0 +1,84 @@
+# pylint: disable=C0115,C0116,W0212
+
+import pytest
+
+from captchamonitor.utils.models import FetchQueue, FetchCompleted
+from captchamonitor.core.worker_pool import WorkerPool
+from captchamonitor.fetchers.tor_browser import TorBrowser
+from captchamonitor.fetchers.firefox_browser import FirefoxBrowser
+
+
+@pytest.mark.usefixtures("insert_domains_fetchers_relays_proxies")
+class TestWorkerPool:
+    @staticmethod
+    def test_worker_pool_single_run(config, db_session, firefox_id, tor_browser_id):
+        worker_pool = WorkerPool(
+            worker_id="0",
+            config=config,
+            db_session=db_session,
+            fetcher_methods=[
+                TorBrowser.method_name_in_db,
+                FirefoxBrowser.method_name_in_db,
+            ],
+            loop=False,
+        )
+
+        # Insert a job for each slot
+        db_session.add(
+            FetchQueue(
+                url="https://check.torproject.org",
+                fetcher_id=firefox_id,
+                domain_id=1,
+                options={"explicit_wait_duration": 0},
+            )
+        )
+        db_session.add(
+            FetchQueue(
+                url="https://check.torproject.org",
+                fetcher_id=tor_browser_id,
+                domain_id=1,
+                relay_id=1,
+                options={"explicit_wait_duration": 0},
+            )
+        )
+        db_session.commit()
+
+        # Check successful jobs
+        db_job = db_session.query(FetchCompleted)
+        assert db_job.count() == 0
+
+        # Process the jobs in parallel
+        worker_pool.process_next_jobs()
+
+        assert db_job.count() == 2
+        assert db_session.query(FetchQueue).count() == 0
+
+    @staticmethod
+    def test_worker_pool_no_job_in_queue(config, db_session):
+        worker_pool = WorkerPool(
+            worker_id="0",
+            config=config,
+            db_session=db_session,
+            loop=False,
+        )
+
+        # Process the jobs, shouldn't rise any errors
+        worker_pool.process_next_jobs()
+
+    @staticmethod
+    def test_worker_pool_separate_tor_launchers(config, db_session):
+        worker_pool = WorkerPool(
+            worker_id="0",
+            config=config,
+            db_session=db_session,
+            fetcher_methods=[
+                TorBrowser.method_name_in_db,
+                FirefoxBrowser.method_name_in_db,
+            ],
+            loop=False,
+        )
+
+        # Every slot should get its own socks endpoint
+        tor_launchers = worker_pool._WorkerPool__tor_launchers
+        endpoints = {(t.ip_address, t.socks_port) for t in tor_launchers}
+        assert len(endpoints) == 2
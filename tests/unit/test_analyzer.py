@@ -0,0 +1,69 @@
+# pylint: disable=C0115,C0116,W0212
+
+import json
+
+from captchamonitor.core.analyzer import Analyzer, ComparisonGroup
+
+
+class TestAnalyzer:
+    @classmethod
+    def setup_class(cls):
+        cls.match_list = ["error", "forbidden", "tor", "denied", "sorry"]
+        cls.har = json.dumps(
+            {
+                "log": {
+                    "entries": [{"request": {"url": "u"}, "response": {"status": 200}}]
+                }
+            }
+        )
+
+    def test_analyze_comparison_group_same_page(self):
+        html_data = "<html><body><p>Hello</p></body></html>"
+        group = ComparisonGroup(
+            fetch_completed_id=1,
+            tor_html_data=html_data,
+            tor_http_requests=self.har,
+            non_tor_html_data=html_data,
+            non_tor_http_requests=self.har,
+            proxy_countries_html_data=[html_data],
+        )
+
+        result = Analyzer.analyze_comparison_group(self.match_list, group)
+
+        assert result.fetch_completed_id == 1
+        assert result.captcha_checker == 0
+        assert result.dom_analyze == 4
+        assert result.status_check is None
+
+    def test_analyze_comparison_group_captcha(self):
+        group = ComparisonGroup(
+            fetch_completed_id=2,
+            tor_html_data="<html><body><div id='captcha'></div></body></html>",
+            tor_http_requests=self.har,
+            non_tor_html_data="<html><body><p>Hello</p></body></html>",
+            non_tor_http_requests=self.har,
+            proxy_countries_html_data=[],
+        )
+
+        result = Analyzer.analyze_comparison_group(self.match_list, group)
+
+        assert result.captcha_checker == 1
+
+    def test_analyze_comparison_group_unanalyzable(self):
+        html_data = "<html><body><p>Hello</p></body></html>"
+        groups = [
+            # The HAR isn't valid JSON
+            ComparisonGroup(3, html_data, "{", html_data, self.har, []),
+            # The HAR has no entries
+            ComparisonGroup(4, html_data, json.dumps({}), html_data, self.har, []),
+            # The payload wasn't stored
+            ComparisonGroup(5, html_data, None, html_data, self.har, [None]),
+        ]
+
+        for group in groups:
+            result = Analyzer.analyze_comparison_group(self.match_list, group)
+
+            assert result.fetch_completed_id == group.fetch_completed_id
+            assert result.captcha_checker is None
+            assert result.status_check is None
+            assert result.dom_analyze is None
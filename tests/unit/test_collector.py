@@ -1,7 +1,10 @@
 # pylint: disable=C0115,C0116,W0212
 
+import io
 import os
+import time
 import shutil
+import tarfile
 from datetime import datetime, timedelta
 
 from captchamonitor.utils.collector import Collector
@@ -58,3 +61,157 @@ class TestCollector:
         file = self.collector.get_consensus(self.recent_datetime)
 
         assert file.split("/")[-1] == self.recent_consensus_str
+
+    def test_extract_from_archive(self):
+        archive_path = os.path.join(
+            self.collector._Collector__archive_dir, "consensuses-2000-01.tar.xz"
+        )
+        date_strs = [f"2000-01-01-0{hour}-00-00" for hour in range(4)]
+
+        # Build a small archive with the same layout as the ones on Collector
+        with tarfile.open(archive_path, "w:xz") as archive:
+            for date_str in date_strs:
+                data = f"valid-after {date_str}\n".encode("utf-8")
+                member = tarfile.TarInfo(f"consensuses-2000-01/01/{date_str}-consensus")
+                member.size = len(data)
+                archive.addfile(member, io.BytesIO(data))
+
+        # Only the requested consensus is extracted
+        extracted = self.collector._Collector__extract_from_archive(
+            archive_path, {date_strs[1]}
+        )
+        assert extracted == {date_strs[1]}
+        assert f"{date_strs[1]}-consensus" in os.listdir(self.consensus_dir)
+        assert f"{date_strs[2]}-consensus" not in os.listdir(self.consensus_dir)
+
+        # Members that were passed before are read using the index
+        extracted = self.collector._Collector__extract_from_archive(
+            archive_path, {date_strs[0], date_strs[3]}
+        )
+        assert extracted == {date_strs[0], date_strs[3]}
+        with open(
+            os.path.join(self.consensus_dir, f"{date_strs[0]}-consensus"), "rb"
+        ) as file:
+            assert file.read() == f"valid-after {date_strs[0]}\n".encode("utf-8")
+
+        for date_str in date_strs:
+            self.collector._Collector__consensus_store.remove(date_str)
+        os.remove(archive_path)
+        os.remove(f"{archive_path}.index")
+
+    def test_iterate_consensuses(self):
+        archive_path = os.path.join(
+            self.collector._Collector__archive_dir, "consensuses-2000-02.tar.xz"
+        )
+        date_strs = [f"2000-02-01-0{hour}-00-00" for hour in (0, 1, 2, 4)]
+
+        with tarfile.open(archive_path, "w:xz") as archive:
+            for date_str in date_strs:
+                data = f"valid-after {date_str}\n".encode("utf-8")
+                member = tarfile.TarInfo(f"consensuses-2000-02/01/{date_str}-consensus")
+                member.size = len(data)
+                archive.addfile(member, io.BytesIO(data))
+
+        # None of these hours are on the recent page
+        self.collector._Collector__get_recent_consensuses = lambda: ""
+
+        # Cached consensuses are used as they are
+        self.collector._Collector__consensus_store.put(
+            date_strs[1], io.BytesIO(b"cached\n")
+        )
+
+        consensuses = list(
+            self.collector.iterate_consensuses(
+                datetime(2000, 2, 1, 0, 30), datetime(2000, 2, 1, 4)
+            )
+        )
+
+        # The missing hour is skipped
+        assert [date.hour for date, _ in consensuses] == [0, 1, 2, 4]
+        with open(consensuses[1][1], "rb") as file:
+            assert file.read() == b"cached\n"
+        with open(consensuses[3][1], "rb") as file:
+            assert file.read() == f"valid-after {date_strs[3]}\n".encode("utf-8")
+
+        del self.collector._Collector__get_recent_consensuses
+        for date_str in date_strs:
+            self.collector._Collector__consensus_store.remove(date_str)
+        os.remove(archive_path)
+        os.remove(f"{archive_path}.index")
+
+    def test_download_archive_keeps_other_archives(self):
+        archive_dir = self.collector._Collector__archive_dir
+        archive_names = [f"consensuses-1999-0{month}.tar.xz" for month in (1, 2, 3)]
+        for archive_name in archive_names:
+            with open(os.path.join(archive_dir, archive_name), "wb"):
+                pass
+
+        # Only the archive of the previous month used by this instance is removed
+        collector = Collector()
+        collector._Collector__download_archive(archive_names[0])
+        collector._Collector__download_archive(archive_names[1])
+
+        assert archive_names[0] not in os.listdir(archive_dir)
+        assert archive_names[1] in os.listdir(archive_dir)
+        assert archive_names[2] in os.listdir(archive_dir)
+
+        for archive_name in archive_names[1:]:
+            os.remove(os.path.join(archive_dir, archive_name))
+
+    def test_iterate_consensuses_unsorted_archive(self):
+        archive_path = os.path.join(
+            self.collector._Collector__archive_dir, "consensuses-2000-03.tar.xz"
+        )
+        date_strs = [f"2000-03-01-0{hour}-00-00" for hour in (2, 0, 1)]
+
+        with tarfile.open(archive_path, "w:xz") as archive:
+            for date_str in date_strs:
+                data = f"valid-after {date_str}\n".encode("utf-8")
+                member = tarfile.TarInfo(f"consensuses-2000-03/01/{date_str}-consensus")
+                member.size = len(data)
+                archive.addfile(member, io.BytesIO(data))
+
+        self.collector._Collector__get_recent_consensuses = lambda: ""
+
+        consensuses = list(
+            self.collector.iterate_consensuses(
+                datetime(2000, 3, 1, 0), datetime(2000, 3, 1, 2)
+            )
+        )
+
+        # Hours that come later in the archive aren't skipped
+        assert [date.hour for date, _ in consensuses] == [0, 1, 2]
+
+        del self.collector._Collector__get_recent_consensuses
+        for date_str in date_strs:
+            self.collector._Collector__consensus_store.remove(date_str)
+        os.remove(archive_path)
+        os.remove(f"{archive_path}.index")
+
+    def test_remove_expired_archives(self):
+        archive_dir = self.collector._Collector__archive_dir
+        expired_path = os.path.join(archive_dir, "consensuses-1998-01.tar.xz")
+        recent_path = os.path.join(archive_dir, "consensuses-1998-02.tar.xz")
+        file_paths = [
+            expired_path,
+            f"{expired_path}.index",
+            recent_path,
+            f"{recent_path}.index",
+        ]
+        for file_path in file_paths:
+            with open(file_path, "wb"):
+                pass
+
+        expired = time.time() - 2 * 24 * 3600
+        os.utime(expired_path, (expired, expired))
+
+        # Archives left behind by earlier instances are removed once expired
+        Collector(max_archive_age=24 * 3600)
+
+        assert not os.path.exists(expired_path)
+        assert not os.path.exists(f"{expired_path}.index")
+        assert os.path.exists(recent_path)
+        assert os.path.exists(f"{recent_path}.index")
+
+        for file_path in file_paths[2:]:
+            os.remove(file_path)
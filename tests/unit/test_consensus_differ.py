@@ -0,0 +1,64 @@
+# pylint: disable=C0115,C0116,W0212
+
+from datetime import datetime
+
+from captchamonitor.utils.consensus_differ import ConsensusDiffer
+from captchamonitor.utils.consensus_parser import ConsensusRelayEntry
+
+
+class TestConsensusDiffer:
+    @staticmethod
+    def create_relay_entry(identity, digest="digest", IP="10.0.0.1"):
+        # pylint: disable=C0103
+        return ConsensusRelayEntry(
+            nickname="relay",
+            identity=identity,
+            digest=digest,
+            publication=datetime(2021, 6, 1),
+            IP=IP,
+            IPv6=None,
+            IPv6ORPort=None,
+            is_exit=True,
+            ORPort=9001,
+            DirPort=0,
+            bandwidth=100,
+            flags=["Exit", "Running"],
+        )
+
+    def test_diff(self):
+        kept, changed, removed, added = [
+            self.create_relay_entry(letter * 27) for letter in "ABCD"
+        ]
+        previous = ConsensusDiffer.get_signatures([kept, changed, removed])
+
+        changed.digest = "new"
+        current = ConsensusDiffer.get_signatures([kept, changed, added])
+
+        consensus_diff = ConsensusDiffer.diff(previous, current)
+
+        assert consensus_diff.added == [added.fingerprint]
+        assert consensus_diff.removed == [removed.fingerprint]
+        assert consensus_diff.changed == [changed.fingerprint]
+
+    def test_diff_address_change(self):
+        previous = ConsensusDiffer.get_signatures(
+            [self.create_relay_entry("AAAAAAAAAAAAAAAAAAAAAAAAAAA")]
+        )
+        current = ConsensusDiffer.get_signatures(
+            [self.create_relay_entry("AAAAAAAAAAAAAAAAAAAAAAAAAAA", IP="10.0.0.2")]
+        )
+
+        consensus_diff = ConsensusDiffer.diff(previous, current)
+
+        assert consensus_diff.changed == list(current.keys())
+        assert consensus_diff.added == consensus_diff.removed == []
+
+    def test_diff_without_previous(self):
+        current = ConsensusDiffer.get_signatures(
+            [self.create_relay_entry("AAAAAAAAAAAAAAAAAAAAAAAAAAA")]
+        )
+
+        consensus_diff = ConsensusDiffer.diff({}, current)
+
+        assert consensus_diff.added == list(current.keys())
+        assert consensus_diff.changed == consensus_diff.removed == []
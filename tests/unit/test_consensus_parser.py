@@ -1,8 +1,12 @@
 # pylint: disable=C0115,C0116,W0212
 
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
 
 from captchamonitor.utils.collector import Collector
+from captchamonitor.utils.exceptions import ConsensusParserFileNotFoundError
 from captchamonitor.utils.consensus_parser import ConsensusV3Parser, ConsensusRelayEntry
 
 
@@ -27,3 +31,80 @@ class TestConsensusParser:
                 assert relay.is_exit is True
 
         assert found is True
+
+
+class TestConsensusParserStreaming:
+    @classmethod
+    def setup_class(cls):
+        cls.consensus = "\n".join(
+            [
+                "network-status-version 3",
+                "valid-after 2021-06-01 12:00:00",
+                "fresh-until 2021-06-01 13:00:00",
+                "r relay1 pTxG9bFX3YM2bUWo6ZokSTShTEY digest 2021-06-01 01:02:03 10.0.0.1 9001 0",
+                "a [2001:db8::1]:9001",
+                "s Exit Fast Running Valid",
+                "w Bandwidth=100",
+                "r relay2 lxXIG6jFsMaYiCA19Vxn1tZD2+M digest 2021-06-01 04:05:06 10.0.0.2 9001 9030",
+                "s Fast Guard Running Valid",
+                "w Bandwidth=300 Unmeasured=1",
+                "directory-footer",
+                "bandwidth-weights Wed=10000 Wee=10000 Wgd=0 Wgg=5857 Wmd=0 Wme=0 Wmg=4143 Wmm=10000",
+            ]
+        )
+
+    def test_iterate_relay_entries(self, tmp_path):
+        consensus_file = tmp_path / "2021-06-01-12-00-00-consensus"
+        consensus_file.write_text(self.consensus)
+
+        parser = ConsensusV3Parser(str(consensus_file), lazy=True)
+        relays = list(parser.iterate_relay_entries())
+
+        assert [relay.nickname for relay in relays] == ["relay1", "relay2"]
+        assert relays[0].fingerprint == "A53C46F5B157DD83366D45A8E99A244934A14C46"
+        assert relays[0].IPv6 == "[2001:db8::1]"
+        assert relays[0].is_exit is True
+        assert relays[1].is_exit is False
+        assert relays[1].publication == datetime(2021, 6, 1, 4, 5, 6)
+        assert relays[1].bandwidth == 300.0
+        assert parser.valid_after == datetime(2021, 6, 1, 12, 0, 0)
+        assert parser.bandwidth_weights["Wgg"] == 5857.0
+
+    def test_path_selection_probabilities(self, tmp_path):
+        consensus_file = tmp_path / "2021-06-01-12-00-00-consensus"
+        consensus_file.write_text(self.consensus)
+
+        relays = ConsensusV3Parser(str(consensus_file)).relay_entries
+
+        assert relays[0].exit_probability == 1.0
+        assert relays[1].guard_probability == 1.0
+        assert relays[0].consensus_weight_fraction == 0.25
+
+    @staticmethod
+    def test_missing_file_lazy(tmp_path):
+        with pytest.raises(ConsensusParserFileNotFoundError):
+            ConsensusV3Parser(str(tmp_path / "missing-consensus"), lazy=True)
+
+    def test_flags_in_worker_process(self, tmp_path):
+        consensus_file = tmp_path / "2021-06-01-12-00-00-consensus"
+        consensus_file.write_text(
+            self.consensus.replace("s Fast Guard", "s Fast Guard Named Unnamed Future")
+        )
+
+        # Flags must survive being parsed in another process
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            parser = executor.submit(ConsensusV3Parser, str(consensus_file)).result()
+
+        relay = parser.relay_entries[1]
+        assert relay.flags == [
+            "Fast",
+            "Future",
+            "Guard",
+            "Named",
+            "Running",
+            "Unnamed",
+            "Valid",
+        ]
+        assert relay.has_flag("Named")
+        assert relay.has_flag("Future")
+        assert not parser.relay_entries[0].has_flag("Future")
@@ -0,0 +1,62 @@
+# pylint: disable=C0115,C0116,W0212
+
+import io
+from datetime import datetime
+
+from captchamonitor.utils.collector import Collector
+from captchamonitor.utils.consensus_range_loader import ConsensusRangeLoader
+
+
+class TestConsensusRangeLoader:
+    @classmethod
+    def setup_class(cls):
+        cls.collector = Collector()
+        cls.dates = [datetime(2000, 3, 1, hour) for hour in range(6)]
+
+        # Cache the consensuses, so that nothing is downloaded
+        for date in cls.dates:
+            consensus = "\n".join(
+                [
+                    "network-status-version 3",
+                    f"valid-after {date}",
+                    "fresh-until 2000-03-01 23:00:00",
+                    "r relay1 pTxG9bFX3YM2bUWo6ZokSTShTEY digest 2000-03-01 01:02:03 10.0.0.1 9001 0",
+                    "s Exit Fast Running Valid",
+                    "w Bandwidth=100",
+                    "directory-footer",
+                    "bandwidth-weights Wed=10000 Wee=10000 Wgd=0 Wgg=5857 Wmd=0 Wme=0 Wmg=4143 Wmm=10000",
+                ]
+            )
+            cls.collector._Collector__consensus_store.put(
+                date.strftime("%Y-%m-%d-%H-00-00"), io.BytesIO(consensus.encode())
+            )
+
+    @classmethod
+    def teardown_class(cls):
+        for date in cls.dates:
+            cls.collector.remove_consensus_file(date)
+
+    def test_iterate_in_parallel(self):
+        loader = ConsensusRangeLoader(self.collector, max_workers=2, read_ahead=2)
+
+        consensuses = list(loader.iterate(self.dates[0], self.dates[-1]))
+
+        assert [date for date, _ in consensuses] == self.dates
+        assert [parser.valid_after for _, parser in consensuses] == self.dates
+        assert consensuses[0][1].relay_entries[0].exit_probability == 1.0
+
+    def test_iterate_in_process(self):
+        loader = ConsensusRangeLoader(self.collector, max_workers=1)
+
+        consensuses = list(loader.iterate(self.dates[1], self.dates[2]))
+
+        assert [parser.valid_after for _, parser in consensuses] == self.dates[1:3]
+
+    def test_stop_early(self):
+        loader = ConsensusRangeLoader(self.collector, max_workers=2, read_ahead=4)
+
+        consensuses = loader.iterate(self.dates[0], self.dates[-1])
+        date, parser = next(consensuses)
+        consensuses.close()
+
+        assert parser.valid_after == date == self.dates[0]
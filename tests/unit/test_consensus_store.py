@@ -0,0 +1,82 @@
+# pylint: disable=C0115,C0116,W0212
+
+import io
+import os
+
+from captchamonitor.utils.consensus_store import ConsensusStore, open_consensus_file
+
+
+class TestConsensusStore:
+    @classmethod
+    def setup_class(cls):
+        cls.date_str = "2021-01-01-00-00-00"
+        cls.consensus = b"network-status-version 3\nvalid-after 2021-01-01 00:00:00\n"
+
+    def test_put_and_get(self, tmp_path):
+        store = ConsensusStore(str(tmp_path))
+        file_path = store.put(self.date_str, io.BytesIO(self.consensus))
+
+        assert store.get(self.date_str) == file_path
+        assert os.path.basename(file_path) == f"{self.date_str}-consensus"
+        assert store.get("2021-01-01-01-00-00") is None
+
+    def test_index_existing_files(self, tmp_path):
+        ConsensusStore(str(tmp_path)).put(self.date_str, io.BytesIO(self.consensus))
+
+        # A new store finds the files stored earlier
+        store = ConsensusStore(str(tmp_path))
+
+        assert store.get(self.date_str) is not None
+
+    def test_contains(self, tmp_path):
+        store = ConsensusStore(str(tmp_path))
+        store.put(self.date_str, io.BytesIO(self.consensus))
+
+        assert self.date_str in store
+        assert "2021-01-01-01-00-00" not in store
+
+        # Files stored by another process are found on disk
+        ConsensusStore(str(tmp_path)).put(
+            "2021-01-01-02-00-00", io.BytesIO(self.consensus)
+        )
+
+        assert "2021-01-01-02-00-00" in store
+
+    def test_compressed_storage(self, tmp_path):
+        store = ConsensusStore(str(tmp_path), compress=True)
+        file_path = store.put(self.date_str, io.BytesIO(self.consensus))
+
+        assert file_path.endswith(".zst")
+        with open_consensus_file(file_path) as file:
+            assert file.read() == self.consensus.decode("utf-8")
+
+    def test_remove(self, tmp_path):
+        store = ConsensusStore(str(tmp_path))
+        store.put(self.date_str, io.BytesIO(self.consensus))
+        store.remove(self.date_str)
+
+        assert store.get(self.date_str) is None
+        assert len(os.listdir(tmp_path)) == 0
+
+    def test_evict_by_size(self, tmp_path):
+        store = ConsensusStore(str(tmp_path), max_size=len(self.consensus) * 2)
+        date_strs = [f"2021-01-01-0{hour}-00-00" for hour in range(4)]
+
+        for date_str in date_strs:
+            store.put(date_str, io.BytesIO(self.consensus))
+
+        # Only the two most recently used files fit
+        assert store.get(date_strs[0]) is None
+        assert store.get(date_strs[1]) is None
+        assert store.get(date_strs[2]) is not None
+        assert store.get(date_strs[3]) is not None
+
+    def test_evict_by_age(self, tmp_path):
+        store = ConsensusStore(str(tmp_path), max_age=60)
+        file_path = store.put(self.date_str, io.BytesIO(self.consensus))
+        os.utime(file_path, (0, 0))
+
+        store = ConsensusStore(str(tmp_path), max_age=60)
+        store.evict()
+
+        assert store.get(self.date_str) is None
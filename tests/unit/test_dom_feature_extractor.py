@@ -0,0 +1,56 @@
+# pylint: disable=C0115,C0116,W0212
+
+from captchamonitor.utils.dom_feature_extractor import DomFeatureExtractor
+
+
+class TestDomFeatureExtractor:
+    @classmethod
+    def setup_class(cls):
+        cls.html_data = (
+            "<!DOCTYPE html><html><head><title>Title</title>"
+            "<script>var a = 'captcha';</script></head>"
+            "<body><div class='g-recaptcha'><br/><p>Access Denied</p></div>"
+            "<!-- sorry --></body></html>"
+        )
+
+    def test_extract_tag_count(self):
+        features = DomFeatureExtractor([]).extract(self.html_data)
+
+        assert features.tag_count == 8
+        assert features.tag_histogram["div"] == 1
+        assert features.tag_histogram["br"] == 1
+
+    def test_extract_visible_text_length(self):
+        features = DomFeatureExtractor([]).extract(self.html_data)
+
+        # Script contents shouldn't be counted
+        assert features.text_length == len("Title") + len("Access Denied")
+
+    def test_extract_keywords(self):
+        extractor = DomFeatureExtractor(["captcha", "denied", "sorry", "error"])
+        features = extractor.extract(self.html_data)
+
+        assert features.keyword_hits["captcha"] == 2
+        assert features.contains("denied")
+        assert features.contains("sorry")
+        assert not features.contains("error")
+
+    def test_contains_case_insensitive(self):
+        features = DomFeatureExtractor(["Denied"]).extract(self.html_data)
+
+        assert features.contains("DENIED")
+        assert features.contains("denied")
+
+    def test_extract_reuse(self):
+        extractor = DomFeatureExtractor(["captcha"])
+        extractor.extract(self.html_data)
+        features = extractor.extract("<p>Hello</p>")
+
+        assert features.tag_count == 1
+        assert not features.contains("captcha")
+
+    def test_extract_empty(self):
+        features = DomFeatureExtractor(["captcha"]).extract(None)
+
+        assert features.tag_count == 0
+        assert not features.contains("captcha")
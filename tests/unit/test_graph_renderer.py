@@ -0,0 +1,68 @@
+# pylint: disable=C0115,C0116,W0212
+
+import json
+
+import pytest
+import matplotlib.pyplot as plt
+
+from captchamonitor.dashboard.graph_renderer import Graph, GraphRenderer
+
+
+class TestGraphRenderer:
+    @classmethod
+    def setup_class(cls):
+        cls.graph = Graph(
+            name="relay_A_tor_blocked",
+            data_for_graph=[
+                [10.0, 20.0, 30.0],
+                ["2021-1-1", "2021-1-2", "2021-1-3"],
+                [10, 10, 10],
+                [1, 2, 3],
+                "A",
+            ],
+            ylabel="Percentage",
+            title="Title",
+            color="maroon",
+        )
+
+    def test_render_png(self):
+        image = GraphRenderer.render(self.graph, "png")
+
+        assert image.startswith(b"\x89PNG")
+        # The figure shouldn't be left in the pyplot state
+        assert plt.get_fignums() == []
+
+    def test_render_svg(self):
+        image = GraphRenderer.render(self.graph, "svg")
+
+        assert b"<svg" in image
+
+    def test_render_json(self):
+        series = json.loads(GraphRenderer.render(self.graph, "json"))
+
+        assert series["relay"] == "A"
+        assert series["scores"] == [10.0, 20.0, 30.0]
+        assert series["timestamps"][0] == "2021-1-1"
+
+    def test_render_unsupported_format(self):
+        with pytest.raises(ValueError):
+            GraphRenderer.render(self.graph, "gif")
+
+    def test_render_short_series(self):
+        # Relays seen for less than three days used to crash the renderer
+        for length in (0, 1):
+            graph = Graph(
+                name="relay_B_tor_blocked",
+                data_for_graph=[
+                    [10.0] * length,
+                    ["2021-1-1"] * length,
+                    [10] * length,
+                    [1] * length,
+                    "B",
+                ],
+                ylabel="Percentage",
+                title="Title",
+                color="maroon",
+            )
+
+            assert GraphRenderer.render(graph, "png").startswith(b"\x89PNG")
@@ -1,6 +1,135 @@
 # pylint: disable=C0115,C0116,W0212
 
-from captchamonitor.utils.onionoo import Onionoo
+import os
+import json
+import time
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+from captchamonitor.utils.onionoo import Onionoo, OnionooClient
+
+
+class OnionooRequestHandler(BaseHTTPRequestHandler):
+    last_modified = "Mon, 01 Jan 2021 00:00:00 GMT"
+    etag = '"details-1"'
+    relays = [{"fingerprint": f"{i:040X}", "nickname": f"relay{i}"} for i in range(10)]
+    requests = []
+
+    def do_GET(self):  # pylint: disable=C0103
+        query = parse_qs(urlparse(self.path).query)
+        self.requests.append(query)
+
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        if "lookup" in query:
+            fingerprints = query["lookup"][0].split(",")
+            relays = [
+                relay for relay in self.relays if relay["fingerprint"] in fingerprints
+            ]
+        else:
+            relays = self.relays
+
+        body = json.dumps({"relays": relays}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Last-Modified", self.last_modified)
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=W0221
+        pass
+
+
+class TestOnionooClient:
+    @classmethod
+    def setup_class(cls):
+        cls.server = HTTPServer(("127.0.0.1", 0), OnionooRequestHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.fingerprints = [
+            relay["fingerprint"] for relay in OnionooRequestHandler.relays
+        ]
+
+    @classmethod
+    def teardown_class(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setup_method(self):
+        OnionooRequestHandler.requests.clear()
+
+    def get_client(self, tmp_path, **kwargs):
+        return OnionooClient(
+            base_url=self.base_url, cache_location=str(tmp_path), **kwargs
+        )
+
+    def test_get_details_in_batches(self, tmp_path):
+        client = self.get_client(tmp_path, lookup_batch_size=3, bulk_threshold=100)
+        relays = client.get_details(self.fingerprints[:8])
+
+        assert [relay["fingerprint"] for relay in relays] == self.fingerprints[:8]
+        assert len(OnionooRequestHandler.requests) == 3
+
+    def test_get_details_in_bulk(self, tmp_path):
+        client = self.get_client(tmp_path, bulk_threshold=2)
+        relays = client.get_details(self.fingerprints[:5])
+
+        assert [relay["fingerprint"] for relay in relays] == self.fingerprints[:5]
+        assert len(OnionooRequestHandler.requests) == 1
+        assert "lookup" not in OnionooRequestHandler.requests[0]
+
+    def test_get_details_from_fresh_cache(self, tmp_path):
+        first_relays = self.get_client(tmp_path).get_details(self.fingerprints[:3])
+
+        # A new client reads the same cache from the disk
+        second_relays = self.get_client(tmp_path).get_details(
+            list(reversed(self.fingerprints[:3]))
+        )
+
+        assert first_relays == second_relays
+        assert len(OnionooRequestHandler.requests) == 1
+
+    def test_get_details_not_modified(self, tmp_path):
+        client = self.get_client(tmp_path, bulk_threshold=2, max_age=0)
+        first_relays = client.get_details(self.fingerprints)
+        second_relays = client.get_details(self.fingerprints)
+
+        # The second request is answered with 304 and the cached details are used
+        assert first_relays == second_relays
+        assert len(OnionooRequestHandler.requests) == 2
+
+    def test_get_details_corrupt_cache(self, tmp_path):
+        client = self.get_client(tmp_path)
+        client.get_details(self.fingerprints[:3])
+
+        for cache_file in tmp_path.iterdir():
+            cache_file.write_text("{")
+
+        relays = client.get_details(self.fingerprints[:3])
+
+        assert [relay["fingerprint"] for relay in relays] == self.fingerprints[:3]
+        assert len(OnionooRequestHandler.requests) == 2
+
+    def test_remove_expired_cache_files(self, tmp_path):
+        self.get_client(tmp_path).get_details(self.fingerprints[:3])
+        self.get_client(tmp_path).get_details(self.fingerprints[3:6])
+        assert len(list(tmp_path.iterdir())) == 2
+
+        # Make the first entry look like it wasn't updated for two days
+        expired_file = sorted(tmp_path.iterdir())[0]
+        expired_at = time.time() - 2 * 86400
+        os.utime(expired_file, (expired_at, expired_at))
+
+        self.get_client(tmp_path)
+
+        assert not expired_file.exists()
+        assert len(list(tmp_path.iterdir())) == 1
 
 
 class TestOnionoo:
@@ -0,0 +1,44 @@
+# pylint: disable=C0115,C0116,W0212
+
+import logging
+from datetime import date
+from collections import namedtuple
+
+from captchamonitor.dashboard.render_dashboard import RenderDashboard
+
+
+class TestRenderDashboard:
+    @classmethod
+    def setup_class(cls):
+        # Only the parts prepare_data_for_graph depends on are set up, so that
+        # no database is needed
+        cls.render_dashboard = object.__new__(RenderDashboard)
+        cls.render_dashboard._RenderDashboard__logger = logging.getLogger(__name__)
+        cls.render_dashboard._RenderDashboard__days = [
+            date(2021, 1, day) for day in range(1, 6)
+        ]
+        cls.row = namedtuple("Row", ["day", "total", "tor_blocked"])
+
+    def test_prepare_data_for_graph_relay_appears_late(self):
+        relay_rows = [
+            self.row(date(2021, 1, 3), 10, 5),
+            self.row(date(2021, 1, 5), 4, 1),
+        ]
+
+        data_for_graph = self.render_dashboard.prepare_data_for_graph(
+            "tor_blocked", "A", relay_rows
+        )
+
+        # Starts at the relay's first day, the gap is filled with zeros
+        assert data_for_graph[0] == [50.0, 0.0, 25.0]
+        assert data_for_graph[1] == ["2021-1-3", "2021-1-4", "2021-1-5"]
+        assert data_for_graph[2] == [10, 0, 4]
+        assert data_for_graph[3] == [5, 0, 1]
+        assert data_for_graph[4] == "A"
+
+    def test_prepare_data_for_graph_without_rows(self):
+        data_for_graph = self.render_dashboard.prepare_data_for_graph(
+            "tor_blocked", "A", []
+        )
+
+        assert data_for_graph == [[], [], [], [], "A"]
@@ -0,0 +1,66 @@
+# pylint: disable=C0115,C0116,W0212
+
+import logging
+import threading
+from collections import namedtuple
+
+from stem import CircStatus
+
+from captchamonitor.utils.tor_launcher import TorLauncher
+
+
+class FakeController:
+    """
+    Builds every circuit before new_circuit returns, like a fast Tor would
+    """
+
+    circuit = namedtuple("Circuit", ["id", "status"])
+
+    def __init__(self):
+        self.circuits = {}
+
+    # pylint: disable=E1101,W0613
+    def new_circuit(self, path, await_build):
+        circuit_id = str(len(self.circuits) + 1)
+        self.circuits[circuit_id] = self.circuit(circuit_id, CircStatus.BUILT)
+        return circuit_id
+
+    def get_circuit(self, circuit_id, default):
+        return self.circuits.get(circuit_id, default)
+
+
+class TestTorLauncher:
+    @staticmethod
+    def create_tor_launcher():
+        # Only the parts prebuild_circuits_to depends on are set up, so that no
+        # Tor container is needed
+        tor_launcher = object.__new__(TorLauncher)
+        tor_launcher.circuit_build_stats = {}
+        tor_launcher._TorLauncher__logger = logging.getLogger(__name__)
+        tor_launcher._TorLauncher__controller = FakeController()
+        tor_launcher._TorLauncher__circuit_build_timeout = 0
+        tor_launcher._TorLauncher__max_prebuilt_circuits = 10
+        tor_launcher._TorLauncher__prebuilt_circuits = {}
+        tor_launcher._TorLauncher__prebuilt_circuit_max_age = 600
+        tor_launcher._TorLauncher__circuits_lock = threading.Lock()
+        tor_launcher._TorLauncher__choose_guard_relay = lambda exit_relay: "G"
+        return tor_launcher
+
+    def test_prebuilt_circuit_built_before_registered(self):
+        tor_launcher = self.create_tor_launcher()
+        tor_launcher.prebuild_circuits_to(["A"])
+
+        # The BUILT event was missed, the circuit is still ready without waiting
+        assert tor_launcher._TorLauncher__take_prebuilt_circuit("A") == "1"
+        assert tor_launcher.circuit_build_stats["A"].built == 1
+
+    def test_prebuilt_circuit_closed_before_registered(self):
+        tor_launcher = self.create_tor_launcher()
+        tor_launcher._TorLauncher__controller.get_circuit = (
+            lambda circuit_id, default: default
+        )
+
+        tor_launcher.prebuild_circuits_to(["A"])
+
+        assert "A" not in tor_launcher._TorLauncher__prebuilt_circuits
+        assert tor_launcher.circuit_build_stats["A"].failed == 1